@@ -1,202 +1,297 @@
-from flask import Flask, request, jsonify, send_from_directory
-from SPARQLWrapper import SPARQLWrapper, JSON
+from flask import Flask, Response, g, request, jsonify, send_file, stream_with_context
 import os
 import requests
 from flask_cors import CORS
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+import assets
+from backends import BackendClient, SparqlClient
+from cache import SnapshotCache
+import encoding
+import facets
+from health import HealthProber, describe
+import images
+import ingredient_index
+import kg_queries
+import local_graph
+import metrics
+import traversal
 
-# Paths and environment variables
-APP_DIR = os.path.dirname(os.path.abspath(__file__))
-FOODS_DIR = os.path.join(APP_DIR, "assets", "images")
-DISEASES_DIR = os.path.join(APP_DIR, "assets", "documents")
-SPARQL_URL = os.getenv("SPARQL_URL", "http://fuseki:3030/food_disease_kg/sparql")
-SOLR_URL = os.getenv("FOOD_SOLR_SELECT", "http://solr:8983/solr/food_collection/select")
+from settings import (
+    CACHE_TTL, CACHE_VERSION_INTERVAL, DISEASE_FACETS, DISEASE_SOLR_URL, DISEASES_DIR,
+    FOODS_DIR, FUSEKI_DATA_URL, GRAPH_BACKEND, GRAPH_SOURCE, HEALTH_INTERVAL, HEALTH_TIMEOUT, MAX_PAGE_SIZE,
+    SEARCH_LIMIT, SOLR_URL, SPARQL_URL
+)
+import shaping
+from views import ViewStore
 
 app = Flask(__name__)
-CORS(app)
+app.json = encoding.OrjsonProvider(app)
+CORS(app, expose_headers=["ETag"])
+
+# Shared keep-alive clients; one connection pool and circuit breaker per backend
+fuseki = SparqlClient(SPARQL_URL, query_name=kg_queries.query_name)
+solr = BackendClient("solr")
+
+def load_local_graph():
+    """N-Triples for the local graph: GRAPH_SOURCE files, or a dump of Fuseki's default graph"""
+    if GRAPH_SOURCE:
+        return local_graph.read_files(GRAPH_SOURCE.split(","))
+    return local_graph.read_graph_store(fuseki, FUSEKI_DATA_URL)
+
+def fetch_store_version():
+    """The dataset version in Fuseki, which a local copy loaded from it must match"""
+    return kg_queries.fetch_data_version(fuseki.select)
+
+# Knowledge-graph reads go through `graph`, backed by Fuseki or by an in-process copy
+if GRAPH_BACKEND == "local":
+    graph = local_graph.LocalGraph(load_local_graph, version_fn=None if GRAPH_SOURCE else fetch_store_version)
+else:
+    graph = kg_queries.SparqlGraph(fuseki.select)
+
+def fetch_data_version():
+    """Read the dataset version marker written by load_data.sh"""
+    return graph.data_version()
+
+snapshot_cache = SnapshotCache(ttl=CACHE_TTL, version_fn=fetch_data_version, version_interval=CACHE_VERSION_INTERVAL)
+
+def load_views():
+    return graph.fetch_foods(), graph.fetch_diseases()
+
+# Food and disease endpoints are served from views materialized once per dataset version
+views = ViewStore(load_views, version_fn=snapshot_cache.current_version, ttl=CACHE_TTL)
+
+def cached_json_response(key, builder):
+    """Serve a cached snapshot, answering 304 when the client already has it"""
+    snapshot = snapshot_cache.get(key, builder)
+    coding, body, etag = encoding.representation(snapshot, request.accept_encodings)
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers=headers)
+    if coding:
+        headers["Content-Encoding"] = coding
+    return Response(body, mimetype="application/json", headers=headers)
+
+@app.before_request
+def start_timing():
+    g.request_start = metrics.begin_request()
+
+# Registered first so it runs after every other after_request hook, compression included
+@app.after_request
+def finish_timing(response):
+    """Record the request's latency and send its per-span breakdown as Server-Timing"""
+    start = g.pop("request_start", None)
+    if start is not None:
+        response.headers["Server-Timing"] = metrics.end_request(start, request.endpoint, request.method, response.status_code)
+    return response
+
+@app.after_request
+def compress_response(response):
+    """Compress buffered JSON responses that aren't pre-compressed snapshots"""
+    if not response.is_streamed and not response.direct_passthrough and encoding.should_compress(response):
+        response.vary.add("Accept-Encoding")
+        coding = encoding.negotiate(request.accept_encodings)
+        if coding:
+            encoding.encode_response(response, coding, response.get_data())
+    return response
+
+def failure(message, e):
+    """500 response for an unexpected error, logged with its traceback and counted by exception type"""
+    app.logger.exception(message)
+    metrics.record_error(request.endpoint, e)
+    return jsonify({"error": message, "details": str(e), "type": type(e).__name__}), 500
+
+def check_fuseki():
+    # Lightweight query with a short timeout so a hung Fuseki can't stall the prober
+    fuseki.ask("ASK {}", timeout=HEALTH_TIMEOUT)
+
+def check_solr():
+    response = solr.get(SOLR_URL, params={"q": "*:*", "rows": 0, "wt": "json"}, timeout=HEALTH_TIMEOUT)
+    if response.status_code != 200:
+        raise RuntimeError(f"Solr error: {response.status_code}")
+
+prober = HealthProber({"fuseki": check_fuseki, "solr": check_solr}, interval=HEALTH_INTERVAL)
+
+def health_response(healthy, results):
+    if healthy is None:
+        return jsonify({"status": "starting", "details": "first backend check in progress", "backends": {}}), 503
+    return jsonify({
+        "status": "healthy" if healthy else "unhealthy",
+        "details": describe(results),
+        "backends": results
+    }), 200 if healthy else 503
 
 @app.route('/api/health')
 def health():
-    try:
-        # Check Fuseki connectivity with a lightweight query
-        sparql = SPARQLWrapper(SPARQL_URL)
-        sparql.setQuery("ASK {}")
-        sparql.setReturnFormat(JSON)
-        sparql.query()
-        
-        # Check Solr connectivity
-        response = requests.get(SOLR_URL, params={"q": "*:*", "rows": 0, "wt": "json"})
-        if response.status_code != 200:
-            return jsonify({"status": "unhealthy", "details": f"Solr error: {response.text}"}), 503
-        
-        return jsonify({"status": "healthy"}), 200
-    except Exception as e:
-        return jsonify({"status": "unhealthy", "details": str(e)}), 503
+    # Answered from the prober's last result; no backend call on the request path
+    prober.ensure_started()
+    return health_response(*prober.status())
+
+@app.route('/api/health/deep')
+def health_deep():
+    results = prober.probe_once()
+    return health_response(all(r["status"] == "up" for r in results.values()), results)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Request, span, slow-query and error metrics of this worker in the Prometheus text format"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/api/backends/stats')
+def backend_stats():
+    return jsonify({
+        "fuseki": fuseki.stats(), "solr": solr.stats(), "graph": graph.stats(), "views": views.stats(),
+        "assets": asset_manifest.stats()
+    })
+
+# Content-hash ETags of the served images and documents
+asset_manifest = assets.AssetManifest()
+
+def send_asset(directory, filename):
+    """Serve a file with its content-hash ETag and cache headers; 304, 206 or offloaded as the request allows"""
+    path = safe_join(directory, filename)
+    asset = asset_manifest.lookup(path) if path else None
+    if asset is None:
+        raise NotFound()
+    offload = assets.offload_headers(asset)
+    if offload:
+        response = Response(mimetype=asset.mimetype, headers=offload)
+    else:
+        response = send_file(path, mimetype=asset.mimetype, conditional=False, etag=False)
+    assets.apply_cache_headers(response, asset, request.args.get('v'))
+    # Ranges of offloaded files are answered by the front server
+    response = response.make_conditional(request, accept_ranges=not offload,
+                                         complete_length=None if offload else asset.size)
+    assets.drop_offload(response)
+    return response
 
 @app.route('/images/<food>/<filename>')
 def serve_image(food, filename):
-    path = os.path.join(FOODS_DIR, food, filename)
-    if not os.path.exists(path):
+    """An original food image, or with `?size=` its pre-generated derivative (WebP when accepted)"""
+    try:
+        derivative = images.derivative_request(filename, request.args, request.accept_mimetypes)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        try:
+            response = send_asset(FOODS_DIR, f"{food}/{derivative or filename}")
+        except NotFound:
+            if not derivative:
+                raise
+            response = send_asset(FOODS_DIR, f"{food}/{filename}")  # Not generated (yet): serve the original
+    except NotFound:
         return jsonify({"error": "Image not found"}), 404
-    return send_from_directory(os.path.join(FOODS_DIR, food), filename)
+    if derivative:
+        response.vary.add("Accept")
+    return response
 
 @app.route('/documents/<path:filepath>')
 def serve_document(filepath):
-    path = os.path.join(DISEASES_DIR, filepath)
-    if not os.path.exists(path):
+    try:
+        return send_asset(DISEASES_DIR, filepath)
+    except NotFound:
         return jsonify({"error": "Document not found"}), 404
-    return send_from_directory(DISEASES_DIR, filepath)
+
+@app.route('/api/admin/cache', methods=['GET', 'DELETE'])
+def admin_cache():
+    if not shaping.is_admin(request.headers.get("X-Admin-Token")):
+        return jsonify({"error": "Forbidden"}), 403
+    if request.method == 'DELETE':
+        key = request.args.get('key') or None
+        if key is None and isinstance(graph, local_graph.LocalGraph):
+            # A full invalidation (sent by load_data.sh) also picks up the newly loaded data
+            try:
+                graph.reload()
+            except Exception as e:
+                return failure("Failed to reload local graph", e)
+        if key is None:
+            views.invalidate()
+        snapshot_cache.invalidate(key)
+        return jsonify({"status": "invalidated"})
+    return jsonify(snapshot_cache.stats())
+
+def page_limit(default):
+    """Read and bound the `limit` query parameter, returning (limit, error_response)"""
+    limit = shaping.parse_limit(request.args.get('limit'), default)
+    if limit is None or limit < 1:
+        return None, (jsonify({"error": "Query parameter 'limit' must be a positive integer"}), 400)
+    return min(limit, MAX_PAGE_SIZE), None
+
+def build_foods():
+    """Food cards from the materialized views"""
+    return views.get().food_cards()
+
+def stream_foods():
+    """Stream every food as NDJSON, one view at a time"""
+    def generate():
+        try:
+            for food in views.get().foods:
+                yield encoding.dumps(food.card()) + b"\n"
+        except Exception as e:
+            # Headers are already sent, so report the failure in-band
+            app.logger.exception("Failed to stream foods")
+            metrics.record_error(request.endpoint, e)
+            yield encoding.dumps({"error": "Failed to fetch foods", "details": str(e), "type": type(e).__name__}) + b"\n"
+    
+    # Compressed as it goes, with periodic flushes, when the client accepts it
+    coding = encoding.negotiate(request.accept_encodings)
+    body = generate() if coding is None else encoding.compress_chunks(generate(), coding)
+    response = Response(stream_with_context(body), mimetype="application/x-ndjson")
+    response.vary.add("Accept-Encoding")
+    if coding:
+        response.headers["Content-Encoding"] = coding
+    return response
+
+def paged_foods():
+    """Return one page of foods addressed by cursor or offset"""
+    limit, error = page_limit(default=50)
+    if error:
+        return error
+    cursor = request.args.get('cursor')
+    offset = max(request.args.get('offset', 0, type=int) or 0, 0)
+    try:
+        after = shaping.decode_cursor(cursor) if cursor else None
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+    
+    return jsonify(views.get().food_page(limit, after=after, offset=None if after else offset))
 
 @app.route('/api/foods')
 def api_foods():
     try:
-        sparql = SPARQLWrapper(SPARQL_URL)
-        sparql.setQuery("""
-            PREFIX ex: <http://www.semanticweb.org/gedeon/ontologies/2025/4/foods-diseases/>
-            SELECT ?food ?foodName ?imageUrl ?ingredients ?recipe ?calories ?eatingTime ?foodLocationArea ?isRawOrCooked ?disease ?diseaseName
-            WHERE {
-                ?food a ex:Food ;
-                      ex:foodName ?foodName .
-                OPTIONAL { 
-                    ?imageObj ex:isImageOf ?food ;
-                             ex:imageUrl ?imageUrl .
-                }
-                OPTIONAL { ?food ex:ingredients ?ingredients . }
-                OPTIONAL { ?food ex:recipe ?recipe . }
-                OPTIONAL { ?food ex:calorieIntake ?calories . }
-                OPTIONAL { ?food ex:eatingTime ?eatingTime . }
-                OPTIONAL { ?food ex:foodLocationArea ?foodLocationArea . }
-                OPTIONAL { ?food ex:isRawOrCooked ?isRawOrCooked . }
-                OPTIONAL { 
-                    ?food ex:isRelatedTo ?disease .
-                    ?disease ex:diseaseName ?diseaseName .
-                }
-            }
-        """)
-        sparql.setReturnFormat(JSON)
-        results = sparql.query().convert()
-        
-        food_data = {}
-        for b in results['results']['bindings']:
-            food_uri = b.get('food', {}).get('value')
-            if not food_uri or food_uri in food_data:
-                continue
-            food_data[food_uri] = {
-                'uri': food_uri,
-                'name': b.get('foodName', {}).get('value', 'Unknown'),
-                'images': [],
-                'relatedDiseases': []
-            }
-            for field in ['ingredients', 'recipe', 'eatingTime', 'foodLocationArea', 'isRawOrCooked']:
-                if field in b and b[field].get('value'):
-                    food_data[food_uri][field] = b[field]['value']
-            if 'calories' in b and b['calories'].get('value'):
-                try:
-                    food_data[food_uri]['calories'] = int(b['calories']['value'])
-                except ValueError:
-                    food_data[food_uri]['calories'] = 0
-            
-            if 'imageUrl' in b and b['imageUrl'].get('value'):
-                image_url = b['imageUrl']['value']
-                if image_url not in food_data[food_uri]['images'] and len(food_data[food_uri]['images']) < 5:
-                    food_data[food_uri]['images'].append(image_url)
-            
-            if 'disease' in b and 'diseaseName' in b and b['disease'].get('value') and b['diseaseName'].get('value'):
-                disease_info = {
-                    'uri': b['disease']['value'],
-                    'name': b['diseaseName']['value']
-                }
-                if disease_info not in food_data[food_uri]['relatedDiseases']:
-                    food_data[food_uri]['relatedDiseases'].append(disease_info)
-        
-        return jsonify(list(food_data.values()))
-        
+        wants_ndjson = request.accept_mimetypes.best_match(["application/json", "application/x-ndjson"]) == "application/x-ndjson"
+        if request.args.get('format') == 'ndjson' or wants_ndjson:
+            return stream_foods()
+        if any(arg in request.args for arg in ('limit', 'offset', 'cursor')):
+            return paged_foods()
+        return cached_json_response('foods', build_foods)
     except Exception as e:
-        return jsonify({"error": "Failed to fetch foods", "details": str(e)}), 500
+        return failure("Failed to fetch foods", e)
 
 @app.route('/api/foods/distinct')
 def api_foods_distinct():
     try:
-        response = requests.get(SOLR_URL, params={"q": "*:*", "rows": 0, "wt": "json"})
-        if response.status_code != 200:
-            return jsonify({"error": "Failed to connect to Solr", "details": response.text}), 500
-
-        solr_data = response.json()
-        total_docs = solr_data["response"].get("numFound", 0)
+        limit, error = page_limit(default=10)
+        if error:
+            return error
+        cursor = request.args.get('cursor', '*')
         
-        if total_docs == 0:
-            return jsonify({"error": "No data found in Solr. Run indexing script."}), 404
-
-        response = requests.get(SOLR_URL, params={
-            "q": "*:*", "rows": 1000, "wt": "json"
-        })
-        if response.status_code != 200:
-            return jsonify({"error": "Failed to query Solr", "details": response.text}), 500
-
-        solr_data = response.json()
-        docs = solr_data["response"].get("docs", [])
-
-        unique_foods = {}
-        for doc in docs:
-            # Handle food_uri: if it's a list, take the first element
-            food_uri = doc.get("food_uri", "")
-            if isinstance(food_uri, list):
-                food_uri = food_uri[0] if food_uri else ""
-            if not food_uri or food_uri in unique_foods:
-                continue
-            
-            # Safely handle string fields that might be lists
-            def safe_string_field(field_value):
-                if isinstance(field_value, list):
-                    return ", ".join(str(item) for item in field_value if item)
-                return str(field_value) if field_value else ""
-            
-            is_raw_or_cooked = safe_string_field(doc.get("isRawOrCooked", ""))
-            food_location_area = safe_string_field(doc.get("foodLocationArea", ""))
-            eating_time = safe_string_field(doc.get("eatingTime", ""))
-            ingredients = safe_string_field(doc.get("ingredients", ""))
-            recipe = safe_string_field(doc.get("recipe", ""))
-            
-            images = doc.get("images", [])
-            if isinstance(images, list):
-                images = images[:5]  # Limit to 5 images
-            else:
-                images = [images] if images else []
-            
-            related_diseases = doc.get("diseaseNames", [])
-            if not isinstance(related_diseases, list):
-                related_diseases = [related_diseases] if related_diseases else []
-            
-            # Create a categories list for better filtering
-            categories = []
-            if eating_time:
-                categories.append(f"Meal: {eating_time}")
-            if is_raw_or_cooked:
-                categories.append(f"Prep: {is_raw_or_cooked}")
-            if food_location_area:
-                categories.append(f"Origin: {food_location_area}")
-            
-            # Build the food entry
-            unique_foods[food_uri] = {
-                "name": doc.get("foodName", food_uri.split('/')[-1] or "Unknown"),
-                "images": images,
-                "calories": int(doc.get("calories", 0)) if str(doc.get("calories", "")).isdigit() else 0,
-                "type": eating_time,
-                "tags": [tag for tag in [is_raw_or_cooked, food_location_area] if tag],
-                "categories": categories,
-                "ingredients": ingredients,
-                "recipe": recipe,
-                "relatedDiseases": related_diseases
-            }
-
-        items = list(unique_foods.values())[:10]
-        return jsonify({
-            "data": items,
-            "total": len(unique_foods),
-            "date": "June 3, 2025"
-        })
+        catalog = views.get()
+        if not catalog.foods:
+            return jsonify({"error": "No food data found. Load the knowledge graph first."}), 404
+        try:
+            return jsonify(catalog.distinct_page(limit, cursor))
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
         
     except Exception as e:
-        return jsonify({"error": "Internal server error", "details": str(e)}), 500
+        return failure("Internal server error", e)
+
+def search_foods_solr(query, limit):
+    """Full-text food search served from food_collection"""
+    response = solr.get(SOLR_URL, params=shaping.food_search_params(query, limit))
+    response.raise_for_status()
+    return shaping.food_search_results(response.json())
 
 @app.route('/api/search/foods')
 def search_foods():
@@ -205,121 +300,150 @@ def search_foods():
         if not query:
             return jsonify({"error": "Query parameter 'q' is required"}), 400
         
-        query = query.replace('"', '\\"').replace('\n', ' ').replace('\r', ' ')
-        
-        sparql = SPARQLWrapper(SPARQL_URL)
-        sparql.setQuery(f"""
-            PREFIX ex: <http://www.semanticweb.org/gedeon/ontologies/2025/4/foods-diseases/>
-            SELECT DISTINCT ?food ?foodName ?imageUrl ?ingredients ?calories
-            WHERE {{
-                ?food a ex:Food ;
-                      ex:foodName ?foodName .
-                OPTIONAL {{ 
-                    ?imageObj ex:isImageOf ?food ;
-                             ex:imageUrl ?imageUrl .
-                }}
-                OPTIONAL {{ ?food ex:ingredients ?ingredients . }}
-                OPTIONAL {{ ?food ex:calorieIntake ?calories . }}
-                OPTIONAL {{ 
-                    ?food ex:isRelatedTo ?disease .
-                    ?disease ex:diseaseName ?diseaseName .
-                }}
-                FILTER (
-                    CONTAINS(LCASE(?foodName), LCASE("{query}")) ||
-                    (BOUND(?ingredients) && CONTAINS(LCASE(?ingredients), LCASE("{query}"))) ||
-                    (BOUND(?diseaseName) && CONTAINS(LCASE(?diseaseName), LCASE("{query}")))
-                )
-            }}
-            ORDER BY ?foodName
-            LIMIT 20
-        """)
-        sparql.setReturnFormat(JSON)
-        results = sparql.query().convert()
-
-        food_results = {}
-        for b in results['results']['bindings']:
-            food_uri = b.get('food', {}).get('value')
-            if not food_uri or food_uri in food_results:
-                continue
-            food_results[food_uri] = {
-                'uri': food_uri,
-                'name': b.get('foodName', {}).get('value', 'Unknown'),
-                'images': [],
-                'ingredients': b.get('ingredients', {}).get('value', ''),
-                'calories': int(b['calories']['value']) if b.get('calories', {}).get('value') else 0
-            }
-            
-            if 'imageUrl' in b and b['imageUrl'].get('value'):
-                image_url = b['imageUrl']['value']
-                if image_url not in food_results[food_uri]['images'] and len(food_results[food_uri]['images']) < 5:
-                    food_results[food_uri]['images'].append(image_url)
+        try:
+            return jsonify(search_foods_solr(query, SEARCH_LIMIT))
+        except (requests.RequestException, ValueError, KeyError) as e:
+            app.logger.warning("Solr food search failed, falling back to the food views: %s", e)
         
-        return jsonify(list(food_results.values()))
+        return jsonify(views.get().search(query, SEARCH_LIMIT))
         
     except Exception as e:
-        return jsonify({"error": "Search failed", "details": str(e)}), 500
+        return failure("Search failed", e)
 
-@app.route('/api/diseases')
-def api_diseases():
+def build_disease_facets():
+    """Facet counts over the whole disease collection"""
+    response = solr.get(DISEASE_SOLR_URL, params={"q": "*:*", "rows": 0, "wt": "json", **shaping.disease_facet_params()})
+    response.raise_for_status()
+    return shaping.disease_facets_summary(response.json())
+
+@app.route('/api/diseases/facets')
+def api_disease_facets():
+    try:
+        return cached_json_response('disease_facets', build_disease_facets)
+    except Exception as e:
+        return failure("Failed to fetch disease facets", e)
+
+@app.route('/api/search/diseases')
+def search_diseases():
     try:
-        sparql = SPARQLWrapper(SPARQL_URL)
-        sparql.setQuery("""
-            PREFIX ex: <http://www.semanticweb.org/gedeon/ontologies/2025/4/foods-diseases/>
-            SELECT ?disease ?name ?symptoms ?sex ?subjectKind ?family ?familyName ?doc ?docUrl ?treatment ?treatmentUrl
-            WHERE {
-                ?disease a ex:Disease ;
-                         ex:diseaseName ?name ;
-                         ex:symptoms ?symptoms ;
-                         ex:sex ?sex ;
-                         ex:mostCommonSubjectKind ?subjectKind ;
-                         ex:belongTo ?family .
-                ?family ex:diseaseFamilyName ?familyName .
-                OPTIONAL { 
-                    ?disease ex:isDocumentedBy ?doc . 
-                    ?doc ex:documentUrl ?docUrl . 
-                }
-                OPTIONAL { 
-                    ?disease ex:hasTreatmentProtocol ?treatment .
-                    ?treatment ex:documentUrl ?treatmentUrl .
-                }
-            }
-        """)
-        sparql.setReturnFormat(JSON)
-        res = sparql.query().convert()
+        query = request.args.get('q', '').strip()
+        filters = {name: request.args.get(name, '').strip() for name in DISEASE_FACETS}
+        if not query and not any(filters.values()):
+            return jsonify({"error": "Query parameter 'q' or a facet filter is required"}), 400
+        with_facets = request.args.get('facets', '').lower() in ('1', 'true', 'yes')
         
-        disease_data = {}
-        for b in res['results']['bindings']:
-            disease_uri = b['disease']['value']
-            
-            if disease_uri not in disease_data:
-                disease_data[disease_uri] = {
-                    'uri': disease_uri,
-                    'name': b['name']['value'],
-                    'symptoms': b['symptoms']['value'],
-                    'sex': b['sex']['value'],
-                    'mostCommonSubjectKind': b['subjectKind']['value'],
-                    'family': b['family']['value'],
-                    'familyName': b.get('familyName', {'value': 'Unknown'})['value'],
-                    'documents': [],
-                    'treatmentProtocols': []
-                }
-            
-            # Modify document and treatment URLs to use BASE_URL
-            if 'docUrl' in b:
-                doc_url = b['docUrl']['value']
-                if doc_url not in disease_data[disease_uri]['documents']:
-                    disease_data[disease_uri]['documents'].append(doc_url)
-            
-            if 'treatmentUrl' in b:
-                treatment_url = b['treatmentUrl']['value']
-                if treatment_url not in disease_data[disease_uri]['treatmentProtocols']:
-                    disease_data[disease_uri]['treatmentProtocols'].append(treatment_url)
+        params = shaping.disease_search_params(query, filters, SEARCH_LIMIT, with_facets)
+        response = solr.get(DISEASE_SOLR_URL, params=params)
+        if response.status_code != 200:
+            return jsonify({"error": "Failed to query Solr", "details": response.text}), 500
         
-        items = list(disease_data.values())
-        return jsonify(items)
+        return jsonify(shaping.disease_search_results(response.json(), with_facets))
         
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return failure("Search failed", e)
+
+def build_diseases():
+    """Disease records from the materialized views"""
+    return views.get().disease_records()
+
+@app.route('/api/diseases')
+def api_diseases():
+    try:
+        return cached_json_response('diseases', build_diseases)
+    except Exception as e:
+        return failure("Failed to fetch diseases", e)
+
+@app.route('/api/diseases/<disease_id>/foods')
+def api_disease_foods(disease_id):
+    try:
+        payload = views.get().foods_of_disease(disease_id)
+        if payload is None:
+            return jsonify({"error": "Disease not found"}), 404
+        return jsonify(payload)
+    except Exception as e:
+        return failure("Failed to fetch related foods", e)
+
+@app.route('/api/foods/<food_id>/diseases')
+def api_food_diseases(food_id):
+    try:
+        payload = views.get().diseases_of_food(food_id)
+        if payload is None:
+            return jsonify({"error": "Food not found"}), 404
+        return jsonify(payload)
+    except Exception as e:
+        return failure("Failed to fetch related diseases", e)
+
+@app.route('/api/families/<family_id>/foods')
+def api_family_foods(family_id):
+    try:
+        payload = views.get().foods_of_family(family_id)
+        if payload is None:
+            return jsonify({"error": "Disease family not found"}), 404
+        return jsonify(payload)
+    except Exception as e:
+        return failure("Failed to fetch family foods", e)
+
+@app.route('/api/foods/facets')
+def api_food_facets():
+    try:
+        limit, error = page_limit(default=20)
+        if error:
+            return error
+        offset = max(request.args.get('offset', 0, type=int) or 0, 0)
+        engine = facets.for_catalog(views.get())
+        try:
+            return jsonify(engine.search(request.args, limit, offset))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return failure("Failed to fetch food facets", e)
+
+@app.route('/api/ingredients')
+def api_ingredients():
+    try:
+        counts = ingredient_index.for_catalog(views.get()).counts()
+        return jsonify({"total": len(counts), "data": [{"name": name, "foods": n} for name, n in counts]})
+    except Exception as e:
+        return failure("Failed to fetch ingredients", e)
+
+@app.route('/api/ingredients/foods')
+def api_ingredient_foods():
+    try:
+        limit, error = page_limit(default=50)
+        if error:
+            return error
+        offset = max(request.args.get('offset', 0, type=int) or 0, 0)
+        index = ingredient_index.for_catalog(views.get())
+        try:
+            return jsonify(index.search(request.args, limit, offset))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return failure("Ingredient query failed", e)
+
+@app.route('/api/traverse/<kind>/<node_id>')
+def api_traverse(kind, node_id):
+    try:
+        traverser = traversal.for_catalog(views.get())
+        try:
+            options = traversal.parse_options(request.args)
+            position = traverser.position(kind, node_id)
+            if position is None:
+                return jsonify({"error": f"Unknown {kind} '{node_id}'"}), 404
+            return jsonify(traverser.traverse(kind, position, **options))
+        except ValueError as e:
+            return jsonify({"error": "Invalid traversal", "details": str(e)}), 400
+    except Exception as e:
+        return failure("Traversal failed", e)
+
+def warm_caches():
+    """Build the cached snapshots up front, e.g. in the gunicorn master before it forks"""
+    for key, builder in (('foods', build_foods), ('diseases', build_diseases), ('disease_facets', build_disease_facets)):
+        try:
+            snapshot_cache.get(key, builder)
+        except Exception as e:
+            app.logger.warning("Could not warm %s cache: %s", key, e)
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    # Development server only; production runs gunicorn with gunicorn.conf.py
+    app.run(host='0.0.0.0', port=5000, debug=os.getenv("FLASK_DEBUG", "1") == "1")
\ No newline at end of file
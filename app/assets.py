@@ -0,0 +1,119 @@
+"""Static asset serving: content-hash validators, cache headers and sendfile offload.
+
+Food images and disease documents are served from `ASSETS_DIR`. Each file's
+ETag is the SHA-1 of its content, computed once and kept in an in-memory
+manifest until the file's size or mtime changes, so a revalidation costs a
+stat instead of a read. Responses are cacheable for ASSET_MAX_AGE seconds;
+a URL carrying the file's hash as `?v=` names exactly that content and is
+marked immutable for a year. With ASSET_OFFLOAD set, the API only checks
+the validators and hands the body to the front server ("sendfile":
+X-Sendfile for Apache/lighttpd, "accel": X-Accel-Redirect for nginx), which
+also answers byte ranges; otherwise range requests are answered in Python.
+"""
+import hashlib
+import mimetypes
+import os
+import threading
+from dataclasses import dataclass
+from urllib.parse import quote
+
+from settings import ASSET_ACCEL_PREFIX, ASSET_MAX_AGE, ASSET_OFFLOAD, ASSETS_DIR
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+OFFLOAD_HEADERS = {"sendfile": "X-Sendfile", "accel": "X-Accel-Redirect"}
+_CHUNK = 1 << 20
+
+
+@dataclass(frozen=True, slots=True)
+class Asset:
+    path: str
+    etag: str
+    size: int
+    mtime: float
+    mtime_ns: int
+    mimetype: str
+
+
+class AssetManifest:
+    """Content-hash ETags of served files, keyed by path and revalidated by (size, mtime)"""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.hashed_bytes = 0
+
+    def peek(self, path):
+        """The cached entry of `path` if it is still current, without reading the file"""
+        entry = self._entries.get(path)
+        if entry is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if (stat.st_size, stat.st_mtime_ns) != (entry.size, entry.mtime_ns):
+            return None
+        self.hits += 1
+        return entry
+
+    def lookup(self, path):
+        """The Asset for a regular file at `path`, hashing it if it is new or changed; None if there is none"""
+        entry = self.peek(path)
+        if entry is not None:
+            return entry
+        try:
+            stat = os.stat(path)
+            if not os.path.isfile(path):
+                return None
+            digest = hashlib.sha1()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(_CHUNK), b""):
+                    digest.update(chunk)
+        except OSError:
+            return None
+        entry = Asset(
+            path=path, etag=digest.hexdigest(), size=stat.st_size, mtime=stat.st_mtime, mtime_ns=stat.st_mtime_ns,
+            mimetype=mimetypes.guess_type(path)[0] or "application/octet-stream"
+        )
+        with self._lock:
+            self._entries[path] = entry
+            self.misses += 1
+            self.hashed_bytes += stat.st_size
+        return entry
+
+    def stats(self):
+        return {"files": len(self._entries), "hits": self.hits, "misses": self.misses, "hashedBytes": self.hashed_bytes}
+
+
+def apply_cache_headers(response, asset, version=None):
+    """Set the validators and Cache-Control of an asset response (Flask or Quart)"""
+    response.set_etag(asset.etag)
+    response.last_modified = asset.mtime
+    # Assigning `expires = None` would write `Expires: <now>`; the max-age below is the only freshness rule
+    response.headers.pop("Expires", None)
+    response.cache_control.no_cache = None
+    response.cache_control.public = True
+    if version == asset.etag:
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.max_age = ASSET_MAX_AGE
+
+
+def offload_headers(asset):
+    """Headers handing the body of `asset` to the front server, or {} when offload is off"""
+    if ASSET_OFFLOAD == "sendfile":
+        return {"X-Sendfile": asset.path}
+    if ASSET_OFFLOAD == "accel":
+        relative = os.path.relpath(asset.path, ASSETS_DIR).replace(os.sep, "/")
+        return {"X-Accel-Redirect": f"{ASSET_ACCEL_PREFIX.rstrip('/')}/{quote(relative)}"}
+    return {}
+
+
+def drop_offload(response):
+    """Remove the offload header from a 304/412, which some front servers would still fill in"""
+    if response.status_code != 200:
+        for header in OFFLOAD_HEADERS.values():
+            response.headers.pop(header, None)
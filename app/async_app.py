@@ -0,0 +1,477 @@
+"""Async (Quart/ASGI) variant of the API in app.py.
+
+Same routes and payloads, but backend I/O goes through httpx so a slow Fuseki
+query parks a coroutine instead of a worker thread, and independent backend
+calls (the per-relation food/disease queries, the health checks) run
+concurrently. Serve it with:
+
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker async_app:app
+"""
+import asyncio
+
+import httpx
+from quart import Quart, Response, g, jsonify, request, send_file
+from quart.wrappers.response import DataBody
+from quart_cors import cors
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+
+import assets
+import encoding
+import facets
+import images
+import ingredient_index
+import kg_queries
+import metrics
+import shaping
+import traversal
+from async_backends import AsyncBackendClient, AsyncSparqlClient
+from backends import CircuitOpenError
+from cache import AsyncSnapshotCache
+from health import AsyncHealthProber, describe
+from settings import (
+    CACHE_TTL, CACHE_VERSION_INTERVAL, DISEASE_FACETS, DISEASE_SOLR_URL, DISEASES_DIR,
+    FOODS_DIR, HEALTH_INTERVAL, HEALTH_TIMEOUT, MAX_PAGE_SIZE, PRELOAD_CACHES, SEARCH_LIMIT, SOLR_URL,
+    SPARQL_URL
+)
+from views import AsyncViewStore
+
+app = Quart(__name__)
+app.json = encoding.OrjsonProvider(app)
+app = cors(app, allow_origin="*", expose_headers=["ETag"])
+
+fuseki = AsyncSparqlClient(SPARQL_URL, query_name=kg_queries.query_name)
+solr = AsyncBackendClient("solr")
+
+
+async def fetch_data_version():
+    """Read the dataset version marker written by load_data.sh"""
+    bindings = await fuseki.select(kg_queries.DATA_VERSION_QUERY)
+    return bindings[0]['version']['value'] if bindings else None
+
+snapshot_cache = AsyncSnapshotCache(ttl=CACHE_TTL, version_fn=fetch_data_version, version_interval=CACHE_VERSION_INTERVAL)
+
+
+async def load_views():
+    return await asyncio.gather(kg_queries.fetch_foods_async(fuseki.select), kg_queries.fetch_diseases_async(fuseki.select))
+
+views = AsyncViewStore(load_views, version_fn=snapshot_cache.current_version, ttl=CACHE_TTL)
+
+
+async def cached_json_response(key, builder):
+    """Serve a cached snapshot, answering 304 when the client already has it"""
+    snapshot = await snapshot_cache.get(key, builder)
+    coding, body, etag = encoding.representation(snapshot, request.accept_encodings)
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if request.if_none_match.contains(etag):
+        return Response("", status=304, headers=headers)
+    if coding:
+        headers["Content-Encoding"] = coding
+    return Response(body, mimetype="application/json", headers=headers)
+
+
+@app.before_request
+async def start_timing():
+    g.request_start = metrics.begin_request()
+
+
+# Registered first so it runs after every other after_request hook, compression included
+@app.after_request
+async def finish_timing(response):
+    """Record the request's latency and send its per-span breakdown as Server-Timing"""
+    start = g.pop("request_start", None)
+    if start is not None:
+        response.headers["Server-Timing"] = metrics.end_request(start, request.endpoint, request.method, response.status_code)
+    return response
+
+
+@app.after_request
+async def compress_response(response):
+    """Compress buffered JSON responses that aren't pre-compressed snapshots"""
+    if isinstance(response.response, DataBody) and encoding.should_compress(response):
+        response.vary.add("Accept-Encoding")
+        coding = encoding.negotiate(request.accept_encodings)
+        if coding:
+            encoding.encode_response(response, coding, await response.get_data())
+    return response
+
+
+def failure(message, e):
+    """500 response for an unexpected error, logged with its traceback and counted by exception type"""
+    app.logger.exception(message)
+    metrics.record_error(request.endpoint, e)
+    return jsonify({"error": message, "details": str(e), "type": type(e).__name__}), 500
+
+
+async def check_fuseki():
+    await fuseki.ask("ASK {}", timeout=HEALTH_TIMEOUT)
+
+
+async def check_solr():
+    response = await solr.get(SOLR_URL, params={"q": "*:*", "rows": 0, "wt": "json"}, timeout=HEALTH_TIMEOUT)
+    if response.status_code != 200:
+        raise RuntimeError(f"Solr error: {response.status_code}")
+
+prober = AsyncHealthProber({"fuseki": check_fuseki, "solr": check_solr}, interval=HEALTH_INTERVAL)
+background_tasks = []
+
+
+@app.before_serving
+async def start_background_tasks():
+    background_tasks.append(asyncio.create_task(prober.run()))
+    if PRELOAD_CACHES:
+        await warm_caches()
+
+
+@app.after_serving
+async def close_clients():
+    for task in background_tasks:
+        task.cancel()
+    await fuseki.aclose()
+    await solr.aclose()
+
+
+def health_response(healthy, results):
+    if healthy is None:
+        return jsonify({"status": "starting", "details": "first backend check in progress", "backends": {}}), 503
+    return jsonify({
+        "status": "healthy" if healthy else "unhealthy",
+        "details": describe(results),
+        "backends": results
+    }), 200 if healthy else 503
+
+
+@app.route('/api/health')
+async def health():
+    return health_response(*await prober.status())
+
+
+@app.route('/api/health/deep')
+async def health_deep():
+    results = await prober.probe_once()
+    return health_response(all(r["status"] == "up" for r in results.values()), results)
+
+
+@app.route('/metrics')
+async def metrics_endpoint():
+    """Request, span, slow-query and error metrics of this worker in the Prometheus text format"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route('/api/backends/stats')
+async def backend_stats():
+    return jsonify({
+        "fuseki": fuseki.stats(), "solr": solr.stats(), "views": views.stats(), "assets": asset_manifest.stats()
+    })
+
+
+asset_manifest = assets.AssetManifest()
+
+
+async def send_asset(directory, filename):
+    """Serve a file with its content-hash ETag and cache headers; 304, 206 or offloaded as the request allows"""
+    path = safe_join(directory, filename)
+    if path is None:
+        raise NotFound()
+    # A new or changed file is hashed off the event loop
+    asset = asset_manifest.peek(path) or await asyncio.to_thread(asset_manifest.lookup, path)
+    if asset is None:
+        raise NotFound()
+    offload = assets.offload_headers(asset)
+    if offload:
+        response = Response("", mimetype=asset.mimetype, headers=offload)
+    else:
+        response = await send_file(path, mimetype=asset.mimetype, add_etags=False)
+        response.accept_ranges = "bytes"
+    assets.apply_cache_headers(response, asset, request.args.get('v'))
+    # Ranges of offloaded files are answered by the front server
+    await response.make_conditional(request, accept_ranges=not offload, complete_length=None if offload else asset.size)
+    assets.drop_offload(response)
+    return response
+
+
+@app.route('/images/<food>/<filename>')
+async def serve_image(food, filename):
+    try:
+        derivative = images.derivative_request(filename, request.args, request.accept_mimetypes)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        try:
+            response = await send_asset(FOODS_DIR, f"{food}/{derivative or filename}")
+        except NotFound:
+            if not derivative:
+                raise
+            response = await send_asset(FOODS_DIR, f"{food}/{filename}")  # Not generated (yet): serve the original
+    except NotFound:
+        return jsonify({"error": "Image not found"}), 404
+    if derivative:
+        response.vary.add("Accept")
+    return response
+
+
+@app.route('/documents/<path:filepath>')
+async def serve_document(filepath):
+    try:
+        return await send_asset(DISEASES_DIR, filepath)
+    except NotFound:
+        return jsonify({"error": "Document not found"}), 404
+
+
+@app.route('/api/admin/cache', methods=['GET', 'DELETE'])
+async def admin_cache():
+    if not shaping.is_admin(request.headers.get("X-Admin-Token")):
+        return jsonify({"error": "Forbidden"}), 403
+    if request.method == 'DELETE':
+        key = request.args.get('key') or None
+        if key is None:
+            views.invalidate()
+        snapshot_cache.invalidate(key)
+        return jsonify({"status": "invalidated"})
+    return jsonify(snapshot_cache.stats())
+
+
+def page_limit(default):
+    """Read and bound the `limit` query parameter, returning (limit, error_response)"""
+    limit = shaping.parse_limit(request.args.get('limit'), default)
+    if limit is None or limit < 1:
+        return None, (jsonify({"error": "Query parameter 'limit' must be a positive integer"}), 400)
+    return min(limit, MAX_PAGE_SIZE), None
+
+
+async def build_foods():
+    return (await views.get()).food_cards()
+
+
+async def build_diseases():
+    return (await views.get()).disease_records()
+
+
+async def build_disease_facets():
+    response = await solr.get(DISEASE_SOLR_URL, params={"q": "*:*", "rows": 0, "wt": "json", **shaping.disease_facet_params()})
+    response.raise_for_status()
+    return shaping.disease_facets_summary(response.json())
+
+
+def stream_foods():
+    """Stream every food as NDJSON, one view at a time"""
+    endpoint = request.endpoint  # The body is generated after the request context is gone
+
+    async def generate():
+        try:
+            for food in (await views.get()).foods:
+                yield encoding.dumps(food.card()) + b"\n"
+        except Exception as e:
+            app.logger.exception("Failed to stream foods")
+            metrics.record_error(endpoint, e)
+            yield encoding.dumps({"error": "Failed to fetch foods", "details": str(e), "type": type(e).__name__}) + b"\n"
+
+    # Compressed as it goes, with periodic flushes, when the client accepts it
+    coding = encoding.negotiate(request.accept_encodings)
+    body = generate() if coding is None else encoding.compress_chunks_async(generate(), coding)
+    response = Response(body, mimetype="application/x-ndjson")
+    response.vary.add("Accept-Encoding")
+    if coding:
+        response.headers["Content-Encoding"] = coding
+    return response
+
+
+async def paged_foods():
+    limit, error = page_limit(default=50)
+    if error:
+        return error
+    cursor = request.args.get('cursor')
+    offset = max(request.args.get('offset', 0, type=int) or 0, 0)
+    try:
+        after = shaping.decode_cursor(cursor) if cursor else None
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+    return jsonify((await views.get()).food_page(limit, after=after, offset=None if after else offset))
+
+
+@app.route('/api/foods')
+async def api_foods():
+    try:
+        wants_ndjson = request.accept_mimetypes.best_match(["application/json", "application/x-ndjson"]) == "application/x-ndjson"
+        if request.args.get('format') == 'ndjson' or wants_ndjson:
+            return stream_foods()
+        if any(arg in request.args for arg in ('limit', 'offset', 'cursor')):
+            return await paged_foods()
+        return await cached_json_response('foods', build_foods)
+    except Exception as e:
+        return failure("Failed to fetch foods", e)
+
+
+@app.route('/api/foods/distinct')
+async def api_foods_distinct():
+    try:
+        limit, error = page_limit(default=10)
+        if error:
+            return error
+        cursor = request.args.get('cursor', '*')
+        catalog = await views.get()
+        if not catalog.foods:
+            return jsonify({"error": "No food data found. Load the knowledge graph first."}), 404
+        try:
+            return jsonify(catalog.distinct_page(limit, cursor))
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+    except Exception as e:
+        return failure("Internal server error", e)
+
+
+@app.route('/api/search/foods')
+async def search_foods():
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({"error": "Query parameter 'q' is required"}), 400
+        try:
+            response = await solr.get(SOLR_URL, params=shaping.food_search_params(query, SEARCH_LIMIT))
+            response.raise_for_status()
+            return jsonify(shaping.food_search_results(response.json()))
+        except (httpx.HTTPError, CircuitOpenError, ValueError, KeyError) as e:
+            app.logger.warning("Solr food search failed, falling back to the food views: %s", e)
+        return jsonify((await views.get()).search(query, SEARCH_LIMIT))
+    except Exception as e:
+        return failure("Search failed", e)
+
+
+@app.route('/api/diseases/facets')
+async def api_disease_facets():
+    try:
+        return await cached_json_response('disease_facets', build_disease_facets)
+    except Exception as e:
+        return failure("Failed to fetch disease facets", e)
+
+
+@app.route('/api/search/diseases')
+async def search_diseases():
+    try:
+        query = request.args.get('q', '').strip()
+        filters = {name: request.args.get(name, '').strip() for name in DISEASE_FACETS}
+        if not query and not any(filters.values()):
+            return jsonify({"error": "Query parameter 'q' or a facet filter is required"}), 400
+        with_facets = request.args.get('facets', '').lower() in ('1', 'true', 'yes')
+        params = shaping.disease_search_params(query, filters, SEARCH_LIMIT, with_facets)
+        response = await solr.get(DISEASE_SOLR_URL, params=params)
+        if response.status_code != 200:
+            return jsonify({"error": "Failed to query Solr", "details": response.text}), 500
+        return jsonify(shaping.disease_search_results(response.json(), with_facets))
+    except Exception as e:
+        return failure("Search failed", e)
+
+
+@app.route('/api/diseases')
+async def api_diseases():
+    try:
+        return await cached_json_response('diseases', build_diseases)
+    except Exception as e:
+        return failure("Failed to fetch diseases", e)
+
+
+@app.route('/api/diseases/<disease_id>/foods')
+async def api_disease_foods(disease_id):
+    try:
+        payload = (await views.get()).foods_of_disease(disease_id)
+        if payload is None:
+            return jsonify({"error": "Disease not found"}), 404
+        return jsonify(payload)
+    except Exception as e:
+        return failure("Failed to fetch related foods", e)
+
+
+@app.route('/api/foods/<food_id>/diseases')
+async def api_food_diseases(food_id):
+    try:
+        payload = (await views.get()).diseases_of_food(food_id)
+        if payload is None:
+            return jsonify({"error": "Food not found"}), 404
+        return jsonify(payload)
+    except Exception as e:
+        return failure("Failed to fetch related diseases", e)
+
+
+@app.route('/api/families/<family_id>/foods')
+async def api_family_foods(family_id):
+    try:
+        payload = (await views.get()).foods_of_family(family_id)
+        if payload is None:
+            return jsonify({"error": "Disease family not found"}), 404
+        return jsonify(payload)
+    except Exception as e:
+        return failure("Failed to fetch family foods", e)
+
+
+@app.route('/api/foods/facets')
+async def api_food_facets():
+    try:
+        limit, error = page_limit(default=20)
+        if error:
+            return error
+        offset = max(request.args.get('offset', 0, type=int) or 0, 0)
+        engine = facets.for_catalog(await views.get())
+        try:
+            return jsonify(engine.search(request.args, limit, offset))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return failure("Failed to fetch food facets", e)
+
+
+@app.route('/api/ingredients')
+async def api_ingredients():
+    try:
+        counts = ingredient_index.for_catalog(await views.get()).counts()
+        return jsonify({"total": len(counts), "data": [{"name": name, "foods": n} for name, n in counts]})
+    except Exception as e:
+        return failure("Failed to fetch ingredients", e)
+
+
+@app.route('/api/ingredients/foods')
+async def api_ingredient_foods():
+    try:
+        limit, error = page_limit(default=50)
+        if error:
+            return error
+        offset = max(request.args.get('offset', 0, type=int) or 0, 0)
+        index = ingredient_index.for_catalog(await views.get())
+        try:
+            return jsonify(index.search(request.args, limit, offset))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return failure("Ingredient query failed", e)
+
+
+@app.route('/api/traverse/<kind>/<node_id>')
+async def api_traverse(kind, node_id):
+    try:
+        traverser = traversal.for_catalog(await views.get())
+        try:
+            options = traversal.parse_options(request.args)
+            position = traverser.position(kind, node_id)
+            if position is None:
+                return jsonify({"error": f"Unknown {kind} '{node_id}'"}), 404
+            return jsonify(traverser.traverse(kind, position, **options))
+        except ValueError as e:
+            return jsonify({"error": "Invalid traversal", "details": str(e)}), 400
+    except Exception as e:
+        return failure("Traversal failed", e)
+
+
+async def warm_caches():
+    """Build the cached snapshots concurrently"""
+    results = await asyncio.gather(
+        snapshot_cache.get('foods', build_foods),
+        snapshot_cache.get('diseases', build_diseases),
+        snapshot_cache.get('disease_facets', build_disease_facets),
+        return_exceptions=True
+    )
+    for key, result in zip(('foods', 'diseases', 'disease_facets'), results):
+        if isinstance(result, Exception):
+            app.logger.warning("Could not warm %s cache: %s", key, result)
+
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=5000)
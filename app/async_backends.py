@@ -0,0 +1,116 @@
+"""httpx-based async counterparts of the clients in backends.py, used by async_app.py.
+
+Same timeouts, connection-level retries and circuit breaker as the sync
+clients; the connection pool is sized for many concurrent requests per
+process (ASYNC_POOL_SIZE).
+"""
+import os
+
+import httpx
+
+import metrics
+from backends import CONNECT_TIMEOUT, READ_TIMEOUT, RETRIES, CircuitBreaker, CircuitOpenError, url_op
+
+ASYNC_POOL_SIZE = int(os.getenv("ASYNC_POOL_SIZE", "100"))
+
+
+class AsyncBackendClient:
+    """Async HTTP client for one backend service"""
+
+    def __init__(self, name, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                 retries=RETRIES, pool_size=ASYNC_POOL_SIZE, breaker=None):
+        self.name = name
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.retries = retries
+        self.pool_size = pool_size
+        self.breaker = breaker or CircuitBreaker()
+        self.client = None
+        self.requests = 0
+        self.failures = 0
+        self.rejected = 0
+
+    def _client(self):
+        # Created lazily so the client binds to the event loop serving requests
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                transport=httpx.AsyncHTTPTransport(retries=self.retries)
+            )
+        return self.client
+
+    async def request(self, method, url, op=None, statement=None, **kwargs):
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise CircuitOpenError(f"{self.name} circuit is open, not calling {url}")
+        self.requests += 1
+        with metrics.span(self.name, op or url_op(url), statement) as span:
+            try:
+                response = await self._client().request(method, url, **kwargs)
+            except httpx.HTTPError:
+                self.failures += 1
+                self.breaker.record_failure()
+                raise
+            except BaseException:
+                # Cancelled by the caller: the half-open trial must not stay pending
+                self.breaker.release()
+                raise
+            span.bytes = len(response.content)
+        if response.status_code >= 500:
+            self.failures += 1
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "circuit": self.breaker.state,
+            "timeout": {"connect": self.timeout.connect, "read": self.timeout.read},
+            "pools": {"max_connections": self.pool_size}
+        }
+
+
+class AsyncSparqlClient(AsyncBackendClient):
+    """AsyncBackendClient bound to a SPARQL query endpoint"""
+
+    def __init__(self, endpoint, name="fuseki", query_name=None, **kwargs):
+        super().__init__(name, **kwargs)
+        self.endpoint = endpoint
+        self.query_name = query_name or (lambda query: "query")
+
+    async def _query(self, query, op, **kwargs):
+        response = await self.post(
+            self.endpoint,
+            data={"query": query},
+            headers={"Accept": "application/sparql-results+json"},
+            op=op,
+            statement=query,
+            **kwargs
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def select(self, query, **kwargs):
+        """Run a SELECT query and return its bindings"""
+        op = self.query_name(query)
+        bindings = (await self._query(query, op, **kwargs))['results']['bindings']
+        metrics.SPAN_ROWS.observe(len(bindings), span=self.name, op=op)
+        return bindings
+
+    async def ask(self, query, **kwargs):
+        return bool((await self._query(query, self.query_name(query), **kwargs)).get('boolean'))
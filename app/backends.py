@@ -0,0 +1,215 @@
+"""Pooled, timeout-bounded HTTP clients for Fuseki and Solr.
+
+Shared by the Flask API and data_indexation.py. Each backend gets one
+requests.Session with a keep-alive connection pool, bounded retries with
+exponential backoff on connection errors and 502/503/504 (never on read
+timeouts), and a circuit breaker that fails fast while the backend is down.
+"""
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import metrics
+
+CONNECT_TIMEOUT = float(os.getenv("BACKEND_CONNECT_TIMEOUT", "3.05"))
+READ_TIMEOUT = float(os.getenv("BACKEND_READ_TIMEOUT", "30"))
+RETRIES = int(os.getenv("BACKEND_RETRIES", "2"))
+BACKOFF = float(os.getenv("BACKEND_BACKOFF", "0.3"))
+POOL_SIZE = int(os.getenv("BACKEND_POOL_SIZE", "10"))
+FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+
+
+def url_op(url):
+    """Metric label of a backend URL: its last two path segments, e.g. "food_collection/select" """
+    return "/".join(urlsplit(url).path.rstrip("/").split("/")[-2:])
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of calling a backend whose circuit is open"""
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures, then lets a single
+    trial request through every `reset_timeout` seconds until one succeeds.
+
+    A trial that never reports back (cancelled, or failed with an unexpected
+    error) doesn't keep the circuit half-open: another trial is let through
+    once `reset_timeout` has passed since it started.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            if self.state != self.CLOSED and now - self.opened_at >= self.reset_timeout:
+                # opened_at now marks the trial's start
+                self.state = self.HALF_OPEN
+                self.opened_at = now
+                return True
+            return False
+
+    def release(self):
+        """Give up a call that ended without telling anything about the backend's health"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                # Let the next request be the trial instead
+                self.state = self.OPEN
+                self.opened_at = time.monotonic() - self.reset_timeout
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class BackendClient:
+    """HTTP client for one backend service"""
+
+    def __init__(self, name, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                 retries=RETRIES, backoff=BACKOFF, pool_size=POOL_SIZE, breaker=None):
+        self.name = name
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = breaker or CircuitBreaker()
+        # A read timeout is not retried: a hung backend would otherwise hold the
+        # worker for (retries + 1) x read_timeout, past gunicorn's worker timeout
+        self.retry = Retry(
+            total=retries,
+            read=0,
+            backoff_factor=backoff,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET", "POST", "HEAD"}),
+            raise_on_status=False
+        )
+        self.pool_size = pool_size
+        self.session = None
+        self.adapter = None
+        self.reset()
+        self.requests = 0
+        self.failures = 0
+        self.rejected = 0
+
+    def reset(self):
+        """Drop pooled connections and start a fresh session.
+
+        Called in forked workers: sockets opened by the parent process must not
+        be shared between processes.
+        """
+        if self.session is not None:
+            self.session.close()
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=self.retry)
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+
+    def request(self, method, url, op=None, statement=None, **kwargs):
+        """Send a request, timed as a metrics span named after the backend.
+
+        `op` labels the span (default: from the URL) and `statement`, the
+        query text, is logged if the call is slow.
+        """
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise CircuitOpenError(f"{self.name} circuit is open, not calling {url}")
+        kwargs.setdefault("timeout", self.timeout)
+        self.requests += 1
+        with metrics.span(self.name, op or url_op(url), statement) as span:
+            try:
+                response = self.session.request(method, url, **kwargs)
+                if not kwargs.get("stream"):
+                    span.bytes = len(response.content)
+            except requests.RequestException:
+                self.failures += 1
+                self.breaker.record_failure()
+                raise
+            except BaseException:
+                self.breaker.release()
+                raise
+        if response.status_code >= 500:
+            self.failures += 1
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def stats(self):
+        pools = {}
+        for key in list(self.adapter.poolmanager.pools.keys()):
+            pool = self.adapter.poolmanager.pools.get(key)
+            if pool is None:
+                continue
+            pools[f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+                "connections_opened": pool.num_connections,
+                "requests": pool.num_requests,
+                "idle": pool.pool.qsize() if pool.pool is not None else 0,
+                "maxsize": pool.pool.maxsize if pool.pool is not None else 0
+            }
+        return {
+            "requests": self.requests,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "circuit": self.breaker.state,
+            "timeout": {"connect": self.timeout[0], "read": self.timeout[1]},
+            "pools": pools
+        }
+
+
+class SparqlClient(BackendClient):
+    """BackendClient bound to a SPARQL query endpoint"""
+
+    def __init__(self, endpoint, name="fuseki", query_name=None, **kwargs):
+        super().__init__(name, **kwargs)
+        self.endpoint = endpoint
+        # Maps a query's text to its metric label, e.g. kg_queries.query_name
+        self.query_name = query_name or (lambda query: "query")
+
+    def _query(self, query, op, **kwargs):
+        response = self.post(
+            self.endpoint,
+            data={"query": query},
+            headers={"Accept": "application/sparql-results+json"},
+            op=op,
+            statement=query,
+            **kwargs
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def select(self, query, **kwargs):
+        """Run a SELECT query and return its bindings"""
+        op = self.query_name(query)
+        bindings = self._query(query, op, **kwargs)['results']['bindings']
+        metrics.SPAN_ROWS.observe(len(bindings), span=self.name, op=op)
+        return bindings
+
+    def ask(self, query, **kwargs):
+        return bool(self._query(query, self.query_name(query), **kwargs).get('boolean'))
@@ -0,0 +1,188 @@
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import encoding
+import metrics
+
+
+class Snapshot:
+    """Serialized response body kept in memory together with its validator and compressed forms"""
+    __slots__ = ('body', 'etag', 'encoded', 'created_at', 'version')
+
+    def __init__(self, body, version):
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()
+        # {content coding: compressed body}, built once so requests never re-encode
+        self.encoded = encoding.precompress(body)
+        self.created_at = time.monotonic()
+        self.version = version
+
+
+class SnapshotCache:
+    """In-process cache of grouped, serialized API responses.
+
+    An entry is rebuilt when its TTL expires, when the dataset version reported
+    by `version_fn` changes (checked at most every `version_interval` seconds),
+    or when `invalidate()` is called. Builds are single-flight per key so a burst
+    of requests on a cold cache only hits the backend once.
+    """
+
+    def __init__(self, ttl=300, version_fn=None, version_interval=10):
+        self.ttl = ttl
+        self.version_fn = version_fn
+        self.version_interval = version_interval
+        self._entries = {}
+        self._build_locks = {}
+        self._lock = threading.Lock()
+        self._version = None
+        self._version_checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def current_version(self):
+        """Return the last known dataset version, refreshing it if it is stale"""
+        if self.version_fn is None:
+            return None
+        now = time.monotonic()
+        if now - self._version_checked_at >= self.version_interval:
+            self._version_checked_at = now
+            try:
+                self._version = self.version_fn()
+            except Exception:
+                # Keep serving the previous version if the backend can't answer
+                pass
+        return self._version
+
+    def _is_fresh(self, entry, version):
+        if entry is None:
+            return False
+        if self.ttl and time.monotonic() - entry.created_at > self.ttl:
+            return False
+        return entry.version == version
+
+    def _lookup(self, key, version):
+        entry = self._entries.get(key)
+        if self._is_fresh(entry, version):
+            self.hits += 1
+            return entry
+        return None
+
+    def _store(self, key, payload, version):
+        self.misses += 1
+        with metrics.span("encode", key) as span:
+            body = encoding.dumps(payload)
+            span.bytes = len(body)
+        with metrics.span("compress", key) as span:
+            entry = Snapshot(body, version)
+            span.bytes = sum(len(encoded) for encoded in entry.encoded.values())
+        self._entries[key] = entry
+        return entry
+
+    def get(self, key, builder):
+        """Return the snapshot for `key`, building it with `builder()` if needed"""
+        version = self.current_version()
+        entry = self._lookup(key, version)
+        if entry is not None:
+            return entry
+
+        with self._lock:
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+
+        with build_lock:
+            # Another thread may have rebuilt the entry while we were waiting
+            entry = self._lookup(key, version)
+            if entry is not None:
+                return entry
+            return self._store(key, builder(), version)
+
+    def invalidate(self, key=None):
+        """Drop one entry, or every entry when no key is given"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+            self._version_checked_at = 0.0
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            "ttl": self.ttl,
+            "version": self._version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": {
+                key: {
+                    "etag": entry.etag, "bytes": len(entry.body), "age": round(now - entry.created_at, 3),
+                    "encodedBytes": {coding: len(body) for coding, body in entry.encoded.items()}
+                }
+                for key, entry in list(self._entries.items())
+            }
+        }
+
+
+class AsyncSnapshotCache(SnapshotCache):
+    """SnapshotCache for asyncio handlers: `version_fn` and builders are coroutines"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._async_build_locks = {}
+
+    async def current_version(self):
+        if self.version_fn is None:
+            return None
+        now = time.monotonic()
+        if now - self._version_checked_at >= self.version_interval:
+            self._version_checked_at = now
+            try:
+                self._version = await self.version_fn()
+            except Exception:
+                pass
+        return self._version
+
+    async def get(self, key, builder):
+        version = await self.current_version()
+        entry = self._lookup(key, version)
+        if entry is not None:
+            return entry
+        build_lock = self._async_build_locks.setdefault(key, asyncio.Lock())
+        async with build_lock:
+            entry = self._lookup(key, version)
+            if entry is not None:
+                return entry
+            # Encoding and compressing a large payload would otherwise block the event loop
+            return await asyncio.to_thread(self._store, key, await builder(), version)
+
+
+class LruCache:
+    """Thread-safe mapping that keeps the `max_size` most recently used entries"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        return {"cached": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,191 @@
+"""Food and disease records and the JSON documents derived from them.
+
+FoodView and DiseaseView hold one grouped record each and build every payload
+shape (card, distinct entry, search result, Solr document). `dumps` encodes
+with orjson when it is installed (several times faster than the json module,
+and straight to UTF-8 bytes). Nothing here needs Flask or NumPy, so
+data_indexation.py can import it on the host.
+"""
+import json
+from dataclasses import dataclass
+
+from ingredients import ingredient_names
+from kg_queries import FOOD_TEXT_FIELDS
+
+try:
+    import orjson
+except ImportError:  # Falls back to the json module
+    orjson = None
+
+
+def dumps(obj, sort_keys=False):
+    """UTF-8 JSON bytes of `obj`, non-ASCII characters kept as is"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0))
+    return json.dumps(obj, ensure_ascii=False, sort_keys=sort_keys, separators=(",", ":")).encode("utf-8")
+
+
+CARD_IMAGES = 5
+
+
+def local_name(uri):
+    """The last path segment of a URI, used as the id in /api/<kind>/<id> routes"""
+    return uri.rstrip('/').rsplit('/', 1)[-1].rsplit('#', 1)[-1]
+
+
+@dataclass(frozen=True, slots=True)
+class FoodView:
+    uri: str
+    name: str
+    # Sorted by URL, so the first CARD_IMAGES are the same whatever order the graph returned them in
+    images: tuple
+    # One per image: its thumbnail derivative URL, or the image URL when it has none
+    thumbnails: tuple
+    # (uri, name) pairs in graph order; diseases that aren't in the disease view are kept too
+    related: tuple
+    calories: int | None = None
+    ingredients: str | None = None
+    recipe: str | None = None
+    eatingTime: str | None = None
+    foodLocationArea: str | None = None
+    isRawOrCooked: str | None = None
+
+    @classmethod
+    def from_record(cls, record):
+        """Build a view from a kg_queries.group_foods record"""
+        images = sorted(zip(record['images'], record.get('thumbnails') or record['images']))
+        return cls(
+            uri=record['uri'],
+            name=record['name'],
+            images=tuple(image for image, _ in images),
+            thumbnails=tuple(thumbnail for _, thumbnail in images),
+            related=tuple((d['uri'], d['name']) for d in record['relatedDiseases']),
+            calories=record.get('calories'),
+            **{field: record.get(field) for field in FOOD_TEXT_FIELDS}
+        )
+
+    def text(self, field):
+        return getattr(self, field) or ''
+
+    def disease_names(self):
+        return list(dict.fromkeys(name for _, name in self.related))
+
+    def card(self):
+        """The /api/foods record: the grouped record with at most CARD_IMAGES images"""
+        record = {
+            'uri': self.uri,
+            'name': self.name,
+            'images': list(self.images[:CARD_IMAGES]),
+            'thumbnails': list(self.thumbnails[:CARD_IMAGES]),
+            'relatedDiseases': [{'uri': uri, 'name': name} for uri, name in self.related]
+        }
+        for field in FOOD_TEXT_FIELDS:
+            if getattr(self, field):
+                record[field] = getattr(self, field)
+        if self.calories is not None:
+            record['calories'] = self.calories
+        return record
+
+    def entry(self):
+        """The /api/foods/distinct entry"""
+        categories = [f"{label}: {value}" for label, value in (
+            ("Meal", self.eatingTime), ("Prep", self.isRawOrCooked), ("Origin", self.foodLocationArea)
+        ) if value]
+        return {
+            "name": self.name or self.uri.split('/')[-1] or "Unknown",
+            "images": list(self.images[:CARD_IMAGES]),
+            "thumbnails": list(self.thumbnails[:CARD_IMAGES]),
+            "calories": self.calories or 0,
+            "type": self.text('eatingTime'),
+            "tags": [tag for tag in (self.isRawOrCooked, self.foodLocationArea) if tag],
+            "categories": categories,
+            "ingredients": self.text('ingredients'),
+            "recipe": self.text('recipe'),
+            "relatedDiseases": self.disease_names()
+        }
+
+    def search_result(self):
+        """A /api/search/foods result when Solr is unavailable"""
+        return {
+            'uri': self.uri,
+            'name': self.name,
+            'images': list(self.images[:CARD_IMAGES]),
+            'thumbnails': list(self.thumbnails[:CARD_IMAGES]),
+            'ingredients': self.text('ingredients'),
+            'calories': self.calories or 0
+        }
+
+    def solr_doc(self):
+        """The food_collection document"""
+        doc = {
+            "id": self.uri,
+            "food_uri": self.uri,
+            "foodName": self.name,
+            "images": list(self.images),
+            "thumbnails": list(self.thumbnails),
+            "diseases": [uri for uri, _ in self.related],
+            "diseaseNames": self.disease_names(),
+            "ingredientNames": ingredient_names(self.ingredients)
+        }
+        for field in FOOD_TEXT_FIELDS:
+            doc[field] = self.text(field)
+        if self.calories is not None:
+            doc['calories'] = self.calories
+        return doc
+
+
+@dataclass(frozen=True, slots=True)
+class DiseaseView:
+    uri: str
+    name: str
+    symptoms: str
+    sex: str
+    mostCommonSubjectKind: str
+    family: str | None
+    familyName: str
+    documents: tuple
+    treatmentProtocols: tuple
+
+    @classmethod
+    def from_record(cls, record):
+        """Build a view from a kg_queries.group_diseases record"""
+        return cls(
+            uri=record['uri'],
+            name=record['name'],
+            symptoms=record['symptoms'],
+            sex=record['sex'],
+            mostCommonSubjectKind=record['mostCommonSubjectKind'],
+            family=record['family'],
+            familyName=record['familyName'],
+            documents=tuple(record['documents']),
+            treatmentProtocols=tuple(record['treatmentProtocols'])
+        )
+
+    def record(self):
+        """The /api/diseases record"""
+        return {
+            'uri': self.uri,
+            'name': self.name,
+            'symptoms': self.symptoms,
+            'sex': self.sex,
+            'mostCommonSubjectKind': self.mostCommonSubjectKind,
+            'family': self.family,
+            'familyName': self.familyName,
+            'documents': list(self.documents),
+            'treatmentProtocols': list(self.treatmentProtocols)
+        }
+
+    def solr_doc(self):
+        """The disease_collection document"""
+        return {
+            "id": f"disease_{self.uri.split('/')[-1]}",
+            "type": "disease",
+            "disease_uri": self.uri,
+            "diseaseName": self.name,
+            "symptoms": self.symptoms,
+            "sex": self.sex,
+            "mostCommonSubjectKind": self.mostCommonSubjectKind,
+            "familyName": self.familyName,
+            "documents": list(self.documents),
+            "treatmentProtocols": list(self.treatmentProtocols)
+        }
@@ -0,0 +1,155 @@
+"""JSON encoding and HTTP response compression shared by both APIs.
+
+`dumps` (defined in documents.py, which the indexer imports without Flask)
+encodes with orjson when it is installed, and OrjsonProvider makes orjson
+Flask's and Quart's `jsonify` encoder. Responses are compressed with brotli
+(when the brotli package is installed) or gzip, as negotiated from
+Accept-Encoding. Cached snapshots are compressed once when they are built
+(`precompress`), and each request just picks the stored bytes. Other JSON
+responses are compressed per request.
+"""
+import gzip
+import zlib
+
+from flask.json.provider import DefaultJSONProvider
+
+import documents
+import metrics
+from settings import BROTLI_QUALITY, COMPRESS_MIN_SIZE, GZIP_LEVEL, SNAPSHOT_BROTLI_QUALITY, SNAPSHOT_GZIP_LEVEL
+
+try:
+    import orjson
+except ImportError:  # Falls back to the json module
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Content codings in order of preference when the client accepts several equally
+CODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson")
+
+
+dumps = documents.dumps
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask/Quart JSON provider encoding responses with orjson; pretty-printing falls back to json"""
+
+    def _pretty(self):
+        return (self.compact is None and self._app.debug) or self.compact is False
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._options()).decode("utf-8")
+
+    def _options(self):
+        return orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if self.sort_keys else 0)
+
+    def response(self, *args, **kwargs):
+        with metrics.span("encode", "jsonify") as span:
+            if orjson is None or self._pretty():
+                response = super().response(*args, **kwargs)
+            else:
+                obj = self._prepare_response_obj(args, kwargs)
+                body = orjson.dumps(obj, default=self.default, option=self._options() | orjson.OPT_APPEND_NEWLINE)
+                response = self._app.response_class(body, mimetype=self.mimetype)
+            span.bytes = response.content_length
+        return response
+
+
+def compress(body, coding, precompressed=False):
+    """`body` compressed with a content coding ("br" or "gzip")"""
+    if coding == "br":
+        return brotli.compress(body, quality=SNAPSHOT_BROTLI_QUALITY if precompressed else BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=SNAPSHOT_GZIP_LEVEL if precompressed else GZIP_LEVEL, mtime=0)
+
+
+def precompress(body):
+    """{coding: compressed body} for every supported coding; empty when `body` is too small to bother"""
+    if len(body) < COMPRESS_MIN_SIZE:
+        return {}
+    return {coding: compress(body, coding, precompressed=True) for coding in CODINGS}
+
+
+def negotiate(accept_encodings, available=CODINGS):
+    """The preferred coding among `available` that the request's Accept-Encoding allows, or None"""
+    return accept_encodings.best_match(available)
+
+
+def representation(snapshot, accept_encodings):
+    """(content coding or None, body, ETag) of the cache.Snapshot form to send for the request's Accept-Encoding"""
+    coding = negotiate(accept_encodings, tuple(snapshot.encoded)) if snapshot.encoded else None
+    if coding is None:
+        return None, snapshot.body, snapshot.etag
+    # Each coding is a different representation, so it gets its own strong validator
+    return coding, snapshot.encoded[coding], f"{snapshot.etag}-{coding}"
+
+
+class StreamCompressor:
+    """Incremental compression of a streamed body, flushed every `flush_every` chunks so clients can decode as it arrives"""
+
+    def __init__(self, coding, flush_every=64):
+        self.flush_every = flush_every
+        self._chunks = 0
+        if coding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._process, self._flush = self._compressor.process, self._compressor.flush
+            self._finish = self._compressor.finish
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits 31: gzip container
+            self._process, self._finish = self._compressor.compress, self._compressor.flush
+            self._flush = lambda: self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def feed(self, chunk):
+        self._chunks += 1
+        out = self._process(chunk)
+        if self._chunks % self.flush_every == 0:
+            out += self._flush()
+        return out
+
+    def finish(self):
+        return self._finish()
+
+
+def compress_chunks(chunks, coding):
+    """Compress an iterable of byte chunks with a content coding, yielding compressed chunks"""
+    compressor = StreamCompressor(coding)
+    for chunk in chunks:
+        out = compressor.feed(chunk)
+        if out:
+            yield out
+    yield compressor.finish()
+
+
+async def compress_chunks_async(chunks, coding):
+    """compress_chunks for an async iterable"""
+    compressor = StreamCompressor(coding)
+    async for chunk in chunks:
+        out = compressor.feed(chunk)
+        if out:
+            yield out
+    yield compressor.finish()
+
+
+def should_compress(response):
+    """Whether a buffered response is a not yet encoded JSON body worth compressing"""
+    return (
+        response.status_code == 200
+        and response.mimetype in COMPRESSIBLE_TYPES
+        and "Content-Encoding" not in response.headers
+        and (response.content_length or 0) >= COMPRESS_MIN_SIZE
+    )
+
+
+def encode_response(response, coding, body):
+    """Replace a response body by its `coding`-compressed form"""
+    with metrics.span("compress", "response") as span:
+        response.set_data(compress(body, coding))
+        span.bytes = response.content_length
+    response.headers["Content-Encoding"] = coding
+    response.vary.add("Accept-Encoding")
+    return response
@@ -0,0 +1,187 @@
+"""Columnar facet engine over the catalog's foods.
+
+Each food attribute is held as a column aligned with `catalog.foods`:
+calories as a float array (NaN when unknown), and eatingTime,
+foodLocationArea and isRawOrCooked as boolean matrices with one row per food
+and one column per distinct value (a food can have several, e.g. "Snack,
+Dessert"). A query turns every filter into a row mask, ANDs them, and counts
+each facet with a single column sum over the rows matching the other filters
+(multi-select faceting). Counts are cached per filter combination.
+"""
+import math
+import threading
+
+import numpy as np
+
+from cache import LruCache
+from ingredients import split_list
+from settings import CALORIE_BUCKET, FACET_CACHE_SIZE
+
+FACET_FIELDS = ("eatingTime", "foodLocationArea", "isRawOrCooked")
+
+
+def facet_values(text):
+    """Distinct values of a multi-valued text attribute, in their first spelling"""
+    values = {}
+    for part in split_list(text):
+        part = part.strip()
+        if part:
+            values.setdefault(part.lower(), part)
+    return list(values.values())
+
+
+class Column:
+    """One categorical attribute: its distinct values and a (foods x values) boolean matrix"""
+    __slots__ = ('values', 'codes', 'matrix')
+
+    def __init__(self, rows):
+        spellings = {}
+        for row in rows:
+            for value in row:
+                spellings.setdefault(value.lower(), value)
+        self.values = sorted(spellings.values(), key=str.lower)
+        self.codes = {value.lower(): code for code, value in enumerate(self.values)}
+        self.matrix = np.zeros((len(rows), len(self.values)), dtype=bool)
+        foods = np.repeat(np.arange(len(rows)), [len(row) for row in rows])
+        codes = [self.codes[value.lower()] for row in rows for value in row]
+        self.matrix[foods, codes] = True
+
+    def mask(self, selected):
+        """Rows having any of the `selected` values, and the selected values that don't exist"""
+        codes = [self.codes[value.lower()] for value in selected if value.lower() in self.codes]
+        unknown = [value for value in selected if value.lower() not in self.codes]
+        return self.matrix[:, codes].any(axis=1), unknown
+
+    def counts(self, rows):
+        totals = self.matrix[rows].sum(axis=0)
+        return {self.values[code]: int(totals[code]) for code in np.flatnonzero(totals)}
+
+
+def parse_filters(args):
+    """Facet filters and the calorie range from request arguments; raises ValueError on bad input"""
+    filters = {}
+    for field in FACET_FIELDS:
+        selected = [value for raw in args.getlist(field) for value in facet_values(raw)]
+        if selected:
+            filters[field] = selected
+    bounds = []
+    for name in ('minCalories', 'maxCalories'):
+        raw = args.get(name)
+        try:
+            bound = float(raw) if raw not in (None, '') else None
+        except ValueError:
+            bound = math.nan
+        if bound is not None and not math.isfinite(bound):
+            raise ValueError(f"'{name}' must be a number")
+        bounds.append(bound)
+    return filters, tuple(bounds)
+
+
+class FacetEngine:
+    """Range filters, facet intersections and facet counts over one catalog"""
+
+    def __init__(self, catalog, bucket=CALORIE_BUCKET, cache_size=FACET_CACHE_SIZE):
+        self.catalog = catalog
+        self.size = len(catalog.foods)
+        self.bucket = bucket
+        self.calories = np.array(
+            [food.calories if food.calories is not None else np.nan for food in catalog.foods], dtype=float
+        )
+        self.columns = {field: Column([facet_values(getattr(food, field)) for food in catalog.foods])
+                        for field in FACET_FIELDS}
+        self.cache = LruCache(cache_size)
+
+    def calorie_mask(self, low, high):
+        mask = ~np.isnan(self.calories)
+        if low is not None:
+            mask &= self.calories >= low
+        if high is not None:
+            mask &= self.calories <= high
+        return mask
+
+    def calorie_summary(self, rows):
+        values = self.calories[rows & ~np.isnan(self.calories)]
+        if not values.size:
+            return {"min": None, "max": None, "mean": None, "buckets": {}}
+        first = int(values.min() // self.bucket)
+        buckets = np.bincount((values // self.bucket).astype(np.int64) - first)
+        return {
+            "min": float(values.min()),
+            "max": float(values.max()),
+            "mean": round(float(values.mean()), 1),
+            "buckets": {
+                f"{(first + k) * self.bucket}-{(first + k + 1) * self.bucket - 1}": int(count)
+                for k, count in enumerate(buckets) if count
+            }
+        }
+
+    def _evaluate(self, filters, bounds):
+        masks, unknown = {}, []
+        for field, selected in filters.items():
+            masks[field], missing = self.columns[field].mask(selected)
+            unknown += [f"{field}:{value}" for value in missing]
+        if bounds != (None, None):
+            masks['calories'] = self.calorie_mask(*bounds)
+
+        everything = np.ones(self.size, dtype=bool)
+
+        def matching(excluded=None):
+            rows = everything.copy()
+            for name, mask in masks.items():
+                if name != excluded:
+                    rows &= mask
+            return rows
+
+        rows = matching()
+        return {
+            "positions": np.flatnonzero(rows),
+            "unknown": unknown,
+            # Each facet is counted over the foods matching every *other* filter, so the
+            # alternatives to a selected value keep their counts
+            "facets": {field: self.columns[field].counts(matching(field)) for field in FACET_FIELDS},
+            "calories": self.calorie_summary(matching('calories'))
+        }
+
+    def query(self, filters, bounds=(None, None)):
+        """Matching food positions, unknown filter values, facet counts and the calorie summary (cached)"""
+        key = (tuple((field, tuple(v.lower() for v in filters[field])) for field in sorted(filters)), bounds)
+        result = self.cache.get(key)
+        if result is None:
+            result = self._evaluate(filters, bounds)
+            self.cache.put(key, result)
+        return result
+
+    def search(self, args, limit, offset=0):
+        """The /api/foods/facets response"""
+        filters, bounds = parse_filters(args)
+        result = self.query(filters, bounds)
+        positions = result["positions"]
+        return {
+            "filters": {**filters, "minCalories": _number(bounds[0]), "maxCalories": _number(bounds[1])},
+            "unknown": result["unknown"],
+            "total": int(positions.size),
+            "facets": result["facets"],
+            "calories": result["calories"],
+            "data": [self.catalog.foods[i].card() for i in positions[offset:offset + limit].tolist()]
+        }
+
+    def stats(self):
+        return {**self.cache.stats(), "values": {field: len(column.values) for field, column in self.columns.items()}}
+
+
+def _number(value):
+    return int(value) if value is not None and value.is_integer() else value
+
+
+_memo_lock = threading.Lock()
+
+
+def for_catalog(catalog):
+    """The FacetEngine of `catalog`, built on first use and dropped with the catalog"""
+    engine = catalog.memo.get('facets')
+    if engine is None:
+        with _memo_lock:
+            engine = catalog.memo.get('facets')
+            if engine is None:
+                engine = catalog.memo['facets'] = FacetEngine(catalog)
+    return engine
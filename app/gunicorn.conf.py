@@ -0,0 +1,48 @@
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+
+# Handlers mostly wait on Fuseki/Solr, so each worker runs a thread pool.
+# The async app passes `-k uvicorn.workers.UvicornWorker` instead.
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+
+# Import the app (and warm its caches) once in the master before forking
+preload_app = os.getenv("PRELOAD_CACHES", "1") == "1"
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "0"))
+
+accesslog = os.getenv("GUNICORN_ACCESSLOG", "-")
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOGLEVEL", "info")
+
+# Workers write their metrics here and /metrics sums them (see metrics.py). Set
+# before the app is imported, so the workers inherit it
+os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), "fdkg-metrics"))
+
+
+def on_starting(server):
+    # Counts of a previous run of the server must not add up with this one's
+    shutil.rmtree(os.environ["METRICS_DIR"], ignore_errors=True)
+    os.makedirs(os.environ["METRICS_DIR"], exist_ok=True)
+
+
+def post_fork(server, worker):
+    # Connections opened while warming caches in the master belong to it.
+    # The async app (async_app:app) opens its clients per worker, so skip it.
+    if "app" in sys.modules:
+        from app import fuseki, solr
+        fuseki.reset()
+        solr.reset()
+        # Each worker reports its own requests; the master's cache warm-up isn't repeated in all of them
+        import metrics
+        metrics.reset()
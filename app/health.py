@@ -0,0 +1,114 @@
+import asyncio
+import os
+import threading
+import time
+
+
+class HealthProber:
+    """Checks each backend on an interval in a daemon thread and keeps the
+    latest status and latency in memory, so health endpoints never block on
+    a backend round trip."""
+
+    def __init__(self, checks, interval=15):
+        self.checks = checks
+        self.interval = interval
+        self.results = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def probe_once(self):
+        """Run every check now and store the results"""
+        results = {}
+        for name, check in self.checks.items():
+            start = time.perf_counter()
+            try:
+                check()
+                result = {"status": "up"}
+            except Exception as e:
+                result = {"status": "down", "error": str(e)}
+            result["latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            result["checked_at"] = time.time()
+            results[name] = result
+        with self._lock:
+            self.results = results
+        return results
+
+    def _run(self):
+        while True:
+            self.probe_once()
+            time.sleep(self.interval)
+
+    def ensure_started(self):
+        """Start the probe thread, restarting it in a forked worker where it did not survive"""
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="health-prober", daemon=True)
+            self._thread.start()
+
+    def status(self):
+        """Summarize the last probe; results older than three intervals count as down.
+
+        Healthy is None until the prober's first probe has finished.
+        """
+        with self._lock:
+            results = dict(self.results)
+        if not results:
+            return None, {}
+        now = time.time()
+        healthy = True
+        for result in results.values():
+            if result["status"] != "up" or now - result["checked_at"] > 3 * self.interval:
+                healthy = False
+        return healthy, results
+
+
+def describe(results):
+    """One-line summary of probe results, e.g. 'fuseki: up (3.1 ms), solr: down (...)'"""
+    parts = []
+    for name, result in results.items():
+        detail = result.get("error") or f"{result['latency_ms']} ms"
+        parts.append(f"{name}: {result['status']} ({detail})")
+    return ", ".join(parts)
+
+
+class AsyncHealthProber(HealthProber):
+    """HealthProber for asyncio apps: checks are coroutines and run concurrently"""
+
+    async def _check(self, check):
+        start = time.perf_counter()
+        try:
+            await check()
+            result = {"status": "up"}
+        except Exception as e:
+            result = {"status": "down", "error": str(e)}
+        result["latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        result["checked_at"] = time.time()
+        return result
+
+    async def probe_once(self):
+        names = list(self.checks)
+        results = await asyncio.gather(*(self._check(self.checks[name]) for name in names))
+        self.results = dict(zip(names, results))
+        return self.results
+
+    async def run(self):
+        """Probe loop, started as a background task when the app starts serving"""
+        while True:
+            await self.probe_once()
+            await asyncio.sleep(self.interval)
+
+    async def status(self):
+        results = dict(self.results)
+        if not results:
+            return None, {}
+        now = time.time()
+        healthy = all(
+            r["status"] == "up" and now - r["checked_at"] <= 3 * self.interval
+            for r in results.values()
+        )
+        return healthy, results
@@ -0,0 +1,43 @@
+"""Food image derivatives: the fixed sizes, their file layout and format negotiation.
+
+rdf_triple/script/image_derivatives.py writes, for every original
+`<FOODS_DIR>/<food>/<file>`, a WebP and a JPEG copy per size under
+`<FOODS_DIR>/<food>/derived/<stem>-<size>.<ext>`. `/images/<food>/<file>?size=`
+serves one of them, WebP when the client accepts it. The generator and the
+API share this module so the names can't drift apart.
+"""
+import os
+
+# Size name -> maximum width in pixels; images are never upscaled
+IMAGE_SIZES = {"thumb": 320, "medium": 640, "large": 1280}
+DERIVED_DIR = "derived"
+# Format -> file extension; JPEG is the fallback for clients without WebP support
+FORMATS = {"webp": "webp", "jpeg": "jpg"}
+
+
+def derivative_name(filename, size, fmt):
+    """Path of a derivative relative to the food's image directory"""
+    stem = os.path.splitext(filename)[0]
+    return f"{DERIVED_DIR}/{stem}-{size}.{FORMATS[fmt]}"
+
+
+def negotiate_format(accept_mimetypes, requested=None):
+    """The derivative format to serve: an explicit `format` argument, else WebP if the client accepts it"""
+    if requested:
+        if requested not in FORMATS:
+            raise ValueError(f"Unknown image format '{requested}', expected one of {', '.join(FORMATS)}")
+        return requested
+    return "webp" if accept_mimetypes["image/webp"] else "jpeg"
+
+
+def derivative_request(filename, args, accept_mimetypes):
+    """The derivative asked for by `?size=` (and optionally `?format=`), or None for the original.
+
+    Raises ValueError on an unknown size or format.
+    """
+    size = args.get('size')
+    if not size or size == "original":
+        return None
+    if size not in IMAGE_SIZES:
+        raise ValueError(f"Unknown image size '{size}', expected one of original, {', '.join(IMAGE_SIZES)}")
+    return derivative_name(filename, size, negotiate_format(accept_mimetypes, args.get('format')))
@@ -0,0 +1,105 @@
+"""AND/OR/NOT queries over a catalog's ingredient -> food inverted index, with NumPy.
+
+The ingredient names are normalized by ingredients.py; this module only works
+on the catalog's `ingredient_foods` CSR relation built from them.
+"""
+import threading
+
+import numpy as np
+
+from ingredients import query_terms
+
+
+class IngredientIndex:
+    """AND/OR/NOT queries over a catalog's ingredient -> food inverted index.
+
+    Each posting list is a sorted NumPy view (no copy) of one row of
+    `catalog.ingredient_foods`. Intersections start from the shortest list
+    and stop as soon as the result is empty, so a query costs time in the
+    size of the lists it touches, not in the number of foods.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        adjacency = catalog.ingredient_foods
+        self.offsets = np.frombuffer(adjacency.offsets, dtype=adjacency.offsets.typecode)
+        self.targets = np.frombuffer(adjacency.targets, dtype=adjacency.targets.typecode)
+
+    def postings(self, name):
+        """Sorted food positions of an ingredient, or None if it is unknown"""
+        n = self.catalog.ingredient_ids.get(name)
+        if n is None:
+            return None
+        return self.targets[self.offsets[n]:self.offsets[n + 1]]
+
+    def query(self, all_of=(), any_of=(), none_of=()):
+        """Food positions (ascending) having every `all_of`, at least one `any_of` and no `none_of` ingredient.
+
+        Returns (positions, unknown names). An unknown `all_of` name matches
+        nothing; unknown `any_of`/`none_of` names are ignored.
+        """
+        lists = {name: self.postings(name) for name in (*all_of, *any_of, *none_of)}
+        unknown = [name for name, postings in lists.items() if postings is None]
+        empty = self.targets[:0]
+
+        required = sorted((lists[name] for name in all_of), key=lambda p: -1 if p is None else len(p))
+        if any_of:
+            required.append(union([lists[name] for name in any_of if lists[name] is not None]))
+        if required:
+            result = required[0] if required[0] is not None else empty
+            for postings in required[1:]:
+                if not len(result):
+                    break
+                result = np.intersect1d(result, postings, assume_unique=True)
+        else:
+            result = np.arange(len(self.catalog.foods))
+
+        excluded = union([lists[name] for name in none_of if lists[name] is not None])
+        if len(excluded) and len(result):
+            result = np.setdiff1d(result, excluded, assume_unique=True)
+        return result, unknown
+
+    def search(self, args, limit, offset=0):
+        """The /api/ingredients/foods response for request arguments `all`, `any` and `not`"""
+        terms = {key: query_terms(args.getlist(key)) for key in ('all', 'any', 'not')}
+        if not any(terms.values()):
+            raise ValueError("At least one of 'all', 'any' or 'not' is required")
+        positions, unknown = self.query(terms['all'], terms['any'], terms['not'])
+        foods = self.catalog.foods
+        return {
+            "query": terms,
+            "unknown": unknown,
+            "total": int(len(positions)),
+            "data": [foods[i].card() for i in positions[offset:offset + limit].tolist()]
+        }
+
+    def counts(self):
+        """(name, number of foods) for every ingredient, most common first"""
+        sizes = np.diff(self.offsets)
+        return sorted(zip(self.catalog.ingredients, sizes.tolist()), key=lambda item: (-item[1], item[0]))
+
+    def stats(self):
+        return {"ingredients": len(self.catalog.ingredients), "postings": len(self.targets)}
+
+
+def union(lists):
+    """Sorted union of sorted posting lists"""
+    if not lists:
+        return np.empty(0, dtype=np.int64)
+    if len(lists) == 1:
+        return lists[0]
+    return np.unique(np.concatenate(lists))
+
+
+_memo_lock = threading.Lock()
+
+
+def for_catalog(catalog):
+    """The IngredientIndex of `catalog`, built on first use and dropped with the catalog"""
+    index = catalog.memo.get('ingredient_index')
+    if index is None:
+        with _memo_lock:
+            index = catalog.memo.get('ingredient_index')
+            if index is None:
+                index = catalog.memo['ingredient_index'] = IngredientIndex(catalog)
+    return index
@@ -0,0 +1,72 @@
+"""Ingredient normalization and the ingredient -> food inverted index.
+
+`ex:ingredients` is a free-text list ("Wheat flour, eggs, spices (cumin,
+salt)"). `ingredient_names` splits it on top-level commas and normalizes each
+entry (Unicode NFKC, lower case, parenthetical notes and punctuation removed,
+plural last word made singular), so "Eggs" and "egg" are the same
+ingredient. The catalog interns these names and keeps the inverted index as
+its `ingredient_foods` CSR relation (sorted food positions per ingredient);
+ingredient_index.IngredientIndex answers AND/OR/NOT queries over those
+posting lists. This module has no NumPy dependency, so data_indexation.py can
+use it on the host.
+"""
+import re
+import unicodedata
+
+_PARENTHETICAL = re.compile(r'\([^()]*\)')
+_NON_WORD = re.compile(r"[^\w\s'-]+")
+_SPACES = re.compile(r'\s+')
+# Endings and words whose trailing "s" isn't a plural
+_KEEP_S = ('ss', 'us', 'is')
+_SINGULAR_ALREADY = {'molasses', 'swiss', 'brussels', 'lens'}
+
+
+def split_list(text):
+    """Split a comma-separated list on commas that aren't inside parentheses"""
+    parts, depth, current = [], 0, []
+    for char in text or '':
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth = max(depth - 1, 0)
+        elif char == ',' and depth == 0:
+            parts.append(''.join(current))
+            current = []
+            continue
+        current.append(char)
+    parts.append(''.join(current))
+    return parts
+
+
+def singular(word):
+    if word in _SINGULAR_ALREADY:
+        return word
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 4 and word.endswith('oes'):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith(_KEEP_S):
+        return word[:-1]
+    return word
+
+
+def normalize(name):
+    """Canonical form of one ingredient name, or '' if nothing is left"""
+    name = unicodedata.normalize('NFKC', name).lower()
+    while _PARENTHETICAL.search(name):
+        name = _PARENTHETICAL.sub(' ', name)
+    words = _SPACES.sub(' ', _NON_WORD.sub(' ', name)).strip(" '-").split(' ')
+    if not words[-1]:
+        return ''
+    words[-1] = singular(words[-1])
+    return ' '.join(words)
+
+
+def ingredient_names(text):
+    """Normalized, de-duplicated ingredient names of a free-text ingredient list"""
+    return list(dict.fromkeys(name for name in (normalize(part) for part in split_list(text)) if name))
+
+
+def query_terms(values):
+    """Normalized names from repeated and/or comma-separated query parameters"""
+    return list(dict.fromkeys(name for value in values for name in ingredient_names(value)))
@@ -0,0 +1,511 @@
+"""SPARQL query shapes and binding grouping shared by the API and the Solr indexer.
+
+Each multi-valued relation (images, related diseases, documents, treatment
+protocols) is fetched with its own query instead of being OPTIONAL-joined onto
+the entity row, so the result size is the sum of the relations rather than
+their product. Grouping is a single pass with set-based de-duplication.
+"""
+import asyncio
+import string
+
+import metrics
+
+EX = "http://www.semanticweb.org/gedeon/ontologies/2025/4/foods-diseases/"
+PREFIX = f"PREFIX ex: <{EX}>\n"
+
+FOOD_TEXT_FIELDS = ['ingredients', 'recipe', 'eatingTime', 'foodLocationArea', 'isRawOrCooked']
+
+# Written by load_data.sh after each load; the API's snapshot cache keys on it
+DATA_VERSION_QUERY = PREFIX + "SELECT ?version WHERE { ex:dataset_meta ex:dataVersion ?version } LIMIT 1"
+
+FOOD_PROPERTIES_QUERY = PREFIX + """
+SELECT ?food ?foodName ?ingredients ?recipe ?calories ?eatingTime ?foodLocationArea ?isRawOrCooked
+WHERE {
+    ?food a ex:Food ;
+          ex:foodName ?foodName .
+    OPTIONAL { ?food ex:ingredients ?ingredients . }
+    OPTIONAL { ?food ex:recipe ?recipe . }
+    OPTIONAL { ?food ex:calorieIntake ?calories . }
+    OPTIONAL { ?food ex:eatingTime ?eatingTime . }
+    OPTIONAL { ?food ex:foodLocationArea ?foodLocationArea . }
+    OPTIONAL { ?food ex:isRawOrCooked ?isRawOrCooked . }
+}
+"""
+
+FOOD_IMAGES_QUERY = PREFIX + """
+SELECT ?food ?imageUrl ?thumbnailUrl
+WHERE {
+    ?food a ex:Food .
+    ?imageObj ex:isImageOf ?food ;
+              ex:imageUrl ?imageUrl .
+    OPTIONAL { ?imageObj ex:thumbnailUrl ?thumbnailUrl . }
+}
+"""
+
+FOOD_DISEASES_QUERY = PREFIX + """
+SELECT ?food ?disease ?diseaseName
+WHERE {
+    ?food a ex:Food ;
+          ex:isRelatedTo ?disease .
+    ?disease ex:diseaseName ?diseaseName .
+}
+"""
+
+DISEASE_PROPERTIES_QUERY = PREFIX + """
+SELECT ?disease ?name ?symptoms ?sex ?subjectKind ?family ?familyName
+WHERE {
+    ?disease a ex:Disease ;
+             ex:diseaseName ?name ;
+             ex:symptoms ?symptoms ;
+             ex:sex ?sex ;
+             ex:mostCommonSubjectKind ?subjectKind ;
+             ex:belongTo ?family .
+    ?family ex:diseaseFamilyName ?familyName .
+}
+"""
+
+DISEASE_DOCUMENTS_QUERY = PREFIX + """
+SELECT ?disease ?docUrl
+WHERE {
+    ?disease a ex:Disease ;
+             ex:isDocumentedBy ?doc .
+    ?doc ex:documentUrl ?docUrl .
+}
+"""
+
+DISEASE_TREATMENTS_QUERY = PREFIX + """
+SELECT ?disease ?treatmentUrl
+WHERE {
+    ?disease a ex:Disease ;
+             ex:hasTreatmentProtocol ?treatment .
+    ?treatment ex:documentUrl ?treatmentUrl .
+}
+"""
+
+FOOD_PAGE_QUERY = PREFIX + """
+SELECT ?food ?foodName ?ingredients ?recipe ?calories ?eatingTime ?foodLocationArea ?isRawOrCooked
+WHERE {{
+    ?food a ex:Food ;
+          ex:foodName ?foodName .
+    OPTIONAL {{ ?food ex:ingredients ?ingredients . }}
+    OPTIONAL {{ ?food ex:recipe ?recipe . }}
+    OPTIONAL {{ ?food ex:calorieIntake ?calories . }}
+    OPTIONAL {{ ?food ex:eatingTime ?eatingTime . }}
+    OPTIONAL {{ ?food ex:foodLocationArea ?foodLocationArea . }}
+    OPTIONAL {{ ?food ex:isRawOrCooked ?isRawOrCooked . }}
+    {filter}
+}}
+ORDER BY ?food
+LIMIT {limit}
+{offset}
+"""
+
+FOOD_IMAGES_FOR_QUERY = PREFIX + """
+SELECT ?food ?imageUrl ?thumbnailUrl
+WHERE {{
+    VALUES ?food {{ {foods} }}
+    ?imageObj ex:isImageOf ?food ;
+              ex:imageUrl ?imageUrl .
+    OPTIONAL {{ ?imageObj ex:thumbnailUrl ?thumbnailUrl . }}
+}}
+"""
+
+FOOD_DISEASES_FOR_QUERY = PREFIX + """
+SELECT ?food ?disease ?diseaseName
+WHERE {{
+    VALUES ?food {{ {foods} }}
+    ?food ex:isRelatedTo ?disease .
+    ?disease ex:diseaseName ?diseaseName .
+}}
+"""
+
+FOOD_SEARCH_QUERY = PREFIX + """
+SELECT ?food ?foodName ?ingredients ?calories
+WHERE {{
+    ?food a ex:Food ;
+          ex:foodName ?foodName .
+    OPTIONAL {{ ?food ex:ingredients ?ingredients . }}
+    OPTIONAL {{ ?food ex:calorieIntake ?calories . }}
+    FILTER (
+        CONTAINS(LCASE(?foodName), {term}) ||
+        (BOUND(?ingredients) && CONTAINS(LCASE(?ingredients), {term})) ||
+        EXISTS {{
+            ?food ex:isRelatedTo ?disease .
+            ?disease ex:diseaseName ?diseaseName .
+            FILTER(CONTAINS(LCASE(?diseaseName), {term}))
+        }}
+    )
+}}
+ORDER BY ?foodName
+LIMIT {limit}
+"""
+
+DISEASE_PAGE_QUERY = PREFIX + """
+SELECT ?disease ?name ?symptoms ?sex ?subjectKind ?family ?familyName
+WHERE {{
+    ?disease a ex:Disease ;
+             ex:diseaseName ?name ;
+             ex:symptoms ?symptoms ;
+             ex:sex ?sex ;
+             ex:mostCommonSubjectKind ?subjectKind ;
+             ex:belongTo ?family .
+    ?family ex:diseaseFamilyName ?familyName .
+    {filter}
+}}
+ORDER BY ?disease
+LIMIT {limit}
+"""
+
+DISEASE_DOCUMENTS_FOR_QUERY = PREFIX + """
+SELECT ?disease ?docUrl
+WHERE {{
+    VALUES ?disease {{ {diseases} }}
+    ?disease ex:isDocumentedBy ?doc .
+    ?doc ex:documentUrl ?docUrl .
+}}
+"""
+
+DISEASE_TREATMENTS_FOR_QUERY = PREFIX + """
+SELECT ?disease ?treatmentUrl
+WHERE {{
+    VALUES ?disease {{ {diseases} }}
+    ?disease ex:hasTreatmentProtocol ?treatment .
+    ?treatment ex:documentUrl ?treatmentUrl .
+}}
+"""
+
+
+def _literal_prefix(template):
+    """The text of a str.format template up to its first replacement field"""
+    prefix = []
+    for literal, field, _, _ in string.Formatter().parse(template):
+        prefix.append(literal)
+        if field is not None:
+            break
+    return "".join(prefix)
+
+
+# Metric labels of the queries above; templates are recognised by their text before the first field
+_QUERY_NAMES = {
+    DATA_VERSION_QUERY: "data_version",
+    FOOD_PROPERTIES_QUERY: "food_properties",
+    FOOD_IMAGES_QUERY: "food_images",
+    FOOD_DISEASES_QUERY: "food_diseases",
+    DISEASE_PROPERTIES_QUERY: "disease_properties",
+    DISEASE_DOCUMENTS_QUERY: "disease_documents",
+    DISEASE_TREATMENTS_QUERY: "disease_treatments",
+}
+_TEMPLATE_NAMES = [
+    (_literal_prefix(FOOD_PAGE_QUERY), "food_page"),
+    (_literal_prefix(FOOD_IMAGES_FOR_QUERY), "food_images_for"),
+    (_literal_prefix(FOOD_DISEASES_FOR_QUERY), "food_diseases_for"),
+    (_literal_prefix(FOOD_SEARCH_QUERY), "food_search"),
+    (_literal_prefix(DISEASE_PAGE_QUERY), "disease_page"),
+    (_literal_prefix(DISEASE_DOCUMENTS_FOR_QUERY), "disease_documents_for"),
+    (_literal_prefix(DISEASE_TREATMENTS_FOR_QUERY), "disease_treatments_for"),
+]
+
+
+def query_name(query):
+    """Short, stable name of one of this module's queries (for metrics), or "other" """
+    name = _QUERY_NAMES.get(query)
+    if name is not None:
+        return name
+    for prefix, name in _TEMPLATE_NAMES:
+        if query.startswith(prefix):
+            return name
+    return "other"
+
+
+_STRING_ESCAPES = {
+    '\\': '\\\\', '"': '\\"', "'": "\\'",
+    '\n': '\\n', '\r': '\\r', '\t': '\\t', '\b': '\\b', '\f': '\\f'
+}
+_IRI_FORBIDDEN = set('<>"{}|^`\\ ')
+
+
+def sparql_string(text):
+    """Quote `text` as a SPARQL string literal, escaping per the SPARQL 1.1 grammar"""
+    return '"' + ''.join(_STRING_ESCAPES.get(ch, ch) for ch in text) + '"'
+
+
+def sparql_iri(iri):
+    """Wrap `iri` in angle brackets, rejecting characters IRIREF does not allow"""
+    if not iri or any(ch in _IRI_FORBIDDEN or ord(ch) <= 0x20 for ch in iri):
+        raise ValueError(f"Invalid IRI: {iri!r}")
+    return f"<{iri}>"
+
+
+def value(binding, name, default=None):
+    """Return the plain value of a SPARQL JSON binding variable"""
+    term = binding.get(name)
+    if term is None:
+        return default
+    return term.get('value', default)
+
+
+def _append_unique(record, key, item, seen):
+    marker = (record['uri'], key, item if not isinstance(item, dict) else item['uri'])
+    if marker not in seen:
+        seen.add(marker)
+        record[key].append(item)
+
+
+def group_foods(property_rows, image_rows, disease_rows):
+    """Group per-relation food bindings into records keyed by food URI.
+
+    Optional text fields are only present when they have a value, `calories`
+    is an int, `images` keeps every image URL in result order, `thumbnails`
+    the matching thumbnail URLs (the image URL itself when the image has no
+    derivatives) and `relatedDiseases` is a list of {'uri', 'name'} dicts.
+    """
+    with metrics.span("group", "foods") as span:
+        foods = _group_foods(property_rows, image_rows, disease_rows)
+        span.rows = len(property_rows) + len(image_rows) + len(disease_rows)
+    return foods
+
+
+def _group_foods(property_rows, image_rows, disease_rows):
+    foods = {}
+    for b in property_rows:
+        food_uri = value(b, 'food')
+        if not food_uri or food_uri in foods:
+            continue
+        record = {
+            'uri': food_uri,
+            'name': value(b, 'foodName', 'Unknown'),
+            'images': [],
+            'thumbnails': [],
+            'relatedDiseases': []
+        }
+        for field in FOOD_TEXT_FIELDS:
+            field_value = value(b, field)
+            if field_value:
+                record[field] = field_value
+        calories = value(b, 'calories')
+        if calories:
+            try:
+                record['calories'] = int(calories)
+            except ValueError:
+                record['calories'] = 0
+        foods[food_uri] = record
+
+    seen = set()
+    for b in image_rows:
+        record = foods.get(value(b, 'food'))
+        image_url = value(b, 'imageUrl')
+        if record is not None and image_url and (record['uri'], 'images', image_url) not in seen:
+            _append_unique(record, 'images', image_url, seen)
+            record['thumbnails'].append(value(b, 'thumbnailUrl') or image_url)
+
+    for b in disease_rows:
+        record = foods.get(value(b, 'food'))
+        disease_uri = value(b, 'disease')
+        disease_name = value(b, 'diseaseName')
+        if record is not None and disease_uri and disease_name:
+            _append_unique(record, 'relatedDiseases', {'uri': disease_uri, 'name': disease_name}, seen)
+
+    return foods
+
+
+def group_diseases(property_rows, document_rows, treatment_rows):
+    """Group per-relation disease bindings into records keyed by disease URI"""
+    with metrics.span("group", "diseases") as span:
+        diseases = _group_diseases(property_rows, document_rows, treatment_rows)
+        span.rows = len(property_rows) + len(document_rows) + len(treatment_rows)
+    return diseases
+
+
+def _group_diseases(property_rows, document_rows, treatment_rows):
+    diseases = {}
+    for b in property_rows:
+        disease_uri = value(b, 'disease')
+        if not disease_uri or disease_uri in diseases:
+            continue
+        diseases[disease_uri] = {
+            'uri': disease_uri,
+            'name': value(b, 'name'),
+            'symptoms': value(b, 'symptoms'),
+            'sex': value(b, 'sex'),
+            'mostCommonSubjectKind': value(b, 'subjectKind'),
+            'family': value(b, 'family'),
+            'familyName': value(b, 'familyName', 'Unknown'),
+            'documents': [],
+            'treatmentProtocols': []
+        }
+
+    seen = set()
+    for key, rows, var in (('documents', document_rows, 'docUrl'), ('treatmentProtocols', treatment_rows, 'treatmentUrl')):
+        for b in rows:
+            record = diseases.get(value(b, 'disease'))
+            url = value(b, var)
+            if record is not None and url:
+                _append_unique(record, key, url, seen)
+
+    return diseases
+
+
+def fetch_foods(select):
+    """Run the food queries through `select(query) -> bindings` and group them"""
+    return group_foods(
+        select(FOOD_PROPERTIES_QUERY),
+        select(FOOD_IMAGES_QUERY),
+        select(FOOD_DISEASES_QUERY)
+    )
+
+
+def fetch_diseases(select):
+    """Run the disease queries through `select(query) -> bindings` and group them"""
+    return group_diseases(
+        select(DISEASE_PROPERTIES_QUERY),
+        select(DISEASE_DOCUMENTS_QUERY),
+        select(DISEASE_TREATMENTS_QUERY)
+    )
+
+
+def food_page_query(limit, after=None, offset=None):
+    """Query for one page of foods ordered by URI.
+
+    Pages are addressed either by keyset (`after`, the last food URI of the
+    previous page) or by `offset`.
+    """
+    return FOOD_PAGE_QUERY.format(
+        filter=f"FILTER(STR(?food) > {sparql_string(after)})" if after else "",
+        limit=int(limit),
+        offset=f"OFFSET {int(offset)}" if offset and int(offset) > 0 else ""
+    )
+
+
+def food_search_query(text, limit):
+    return FOOD_SEARCH_QUERY.format(term=sparql_string(text.lower()), limit=int(limit))
+
+
+def uri_values(rows, var):
+    """VALUES block content for the distinct `var` URIs in `rows`, or '' if there are none"""
+    uris = dict.fromkeys(value(b, var) for b in rows if value(b, var))
+    return ' '.join(sparql_iri(uri) for uri in uris)
+
+
+def food_values(property_rows):
+    return uri_values(property_rows, 'food')
+
+
+def fetch_food_page(select, limit, after=None, offset=None):
+    """Fetch one page of foods; images and diseases are only fetched for the
+    foods on the page, so the work per call is bounded by `limit`."""
+    property_rows = select(food_page_query(limit, after, offset))
+    foods = food_values(property_rows)
+    if not foods:
+        return []
+    return list(group_foods(
+        property_rows,
+        select(FOOD_IMAGES_FOR_QUERY.format(foods=foods)),
+        select(FOOD_DISEASES_FOR_QUERY.format(foods=foods))
+    ).values())
+
+
+def iter_foods(select, page_size=500):
+    """Yield every food record, one keyset page at a time"""
+    after = None
+    while True:
+        page = fetch_food_page(select, page_size, after=after)
+        # A food with repeated properties spans several rows, so a short page
+        # does not mean the last one; only an empty page does
+        if not page:
+            return
+        yield from page
+        after = page[-1]['uri']
+
+
+def disease_page_query(limit, after=None):
+    return DISEASE_PAGE_QUERY.format(
+        filter=f"FILTER(STR(?disease) > {sparql_string(after)})" if after else "",
+        limit=int(limit)
+    )
+
+
+def fetch_disease_page(select, limit, after=None):
+    """Fetch one keyset page of diseases with their documents and treatment protocols"""
+    property_rows = select(disease_page_query(limit, after))
+    diseases = uri_values(property_rows, 'disease')
+    if not diseases:
+        return []
+    return list(group_diseases(
+        property_rows,
+        select(DISEASE_DOCUMENTS_FOR_QUERY.format(diseases=diseases)),
+        select(DISEASE_TREATMENTS_FOR_QUERY.format(diseases=diseases))
+    ).values())
+
+
+def iter_diseases(select, page_size=500):
+    """Yield every disease record, one keyset page at a time"""
+    after = None
+    while True:
+        page = fetch_disease_page(select, page_size, after=after)
+        if not page:
+            return
+        yield from page
+        after = page[-1]['uri']
+
+
+def search_foods(select, text, limit=20):
+    """Substring search over food names, ingredients and related disease names"""
+    property_rows = select(food_search_query(text, limit))
+    foods = food_values(property_rows)
+    if not foods:
+        return []
+    return list(group_foods(property_rows, select(FOOD_IMAGES_FOR_QUERY.format(foods=foods)), []).values())
+
+
+def fetch_data_version(select):
+    bindings = select(DATA_VERSION_QUERY)
+    return value(bindings[0], 'version') if bindings else None
+
+
+class SparqlGraph:
+    """The API's knowledge-graph reads, answered by a SPARQL endpoint.
+
+    local_graph.LocalGraph implements the same methods in process.
+    """
+
+    def __init__(self, select):
+        self.select = select
+
+    def data_version(self):
+        return fetch_data_version(self.select)
+
+    def fetch_foods(self):
+        return fetch_foods(self.select)
+
+    def fetch_diseases(self):
+        return fetch_diseases(self.select)
+
+    def fetch_food_page(self, limit, after=None, offset=None):
+        return fetch_food_page(self.select, limit, after, offset)
+
+    def iter_foods(self, page_size=500):
+        return iter_foods(self.select, page_size)
+
+    def search_foods(self, text, limit=20):
+        return search_foods(self.select, text, limit)
+
+    def stats(self):
+        return {"backend": "sparql"}
+
+
+# Async variants: `select` is a coroutine function and independent queries run concurrently
+
+async def fetch_foods_async(select):
+    return group_foods(*await asyncio.gather(
+        select(FOOD_PROPERTIES_QUERY),
+        select(FOOD_IMAGES_QUERY),
+        select(FOOD_DISEASES_QUERY)
+    ))
+
+
+async def fetch_diseases_async(select):
+    return group_diseases(*await asyncio.gather(
+        select(DISEASE_PROPERTIES_QUERY),
+        select(DISEASE_DOCUMENTS_QUERY),
+        select(DISEASE_TREATMENTS_QUERY)
+    ))
@@ -0,0 +1,331 @@
+"""In-process knowledge graph answering the API's fixed query shapes without Fuseki.
+
+Selected with GRAPH_BACKEND=local. The graph is read once (from Fuseki's Graph
+Store endpoint as N-Triples, or from GRAPH_SOURCE files), every RDF term is
+interned to an integer, and triples are kept in three nested indexes:
+
+    spo[s][p] -> objects    pos[p][o] -> subjects    osp[o][s] -> predicates
+
+Each method builds the same binding rows the corresponding SPARQL query in
+kg_queries would return and groups them with the same functions, so payloads
+match the Fuseki-backed ones (benchmarks/compare_graph_backends.py checks this).
+"""
+import bisect
+import gzip
+import re
+import threading
+import time
+from array import array
+
+import kg_queries
+import metrics
+from kg_queries import EX
+
+RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+
+_TERM = r'(<[^>]*>|_:\S+|"(?:[^"\\]|\\.)*"(?:\^\^<[^>]*>|@[A-Za-z0-9-]+)?)'
+_LINE = re.compile(rf'^\s*{_TERM}\s+{_TERM}\s+{_TERM}\s*\.\s*$')
+_ESCAPE = re.compile(r'\\(u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|.)')
+_ESCAPES = {'t': '\t', 'b': '\b', 'n': '\n', 'r': '\r', 'f': '\f', '"': '"', "'": "'", '\\': '\\'}
+
+
+def _unescape(match):
+    code = match.group(1)
+    if code[0] in 'uU' and len(code) > 1:
+        return chr(int(code[1:], 16))
+    return _ESCAPES.get(code, code)
+
+
+def term_value(term):
+    """Plain value of an N-Triples term: the IRI, blank node label or literal lexical form"""
+    if term[0] == '<':
+        return term[1:-1]
+    if term[0] == '"':
+        return _ESCAPE.sub(_unescape, term[1:term.rindex('"')])
+    return term
+
+
+def parse_ntriples(lines):
+    """Yield (s, p, o) term strings from N-Triples lines, skipping blanks and comments"""
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        match = _LINE.match(line)
+        if match is None:
+            raise ValueError(f"Line {number} is not a valid N-Triples statement: {line[:120]}")
+        yield match.groups()
+
+
+def read_files(paths):
+    """N-Triples lines from .nt/.nt.gz files; other RDF syntaxes are converted with rdflib"""
+    for path in paths:
+        if path.endswith(('.nt', '.nt.gz')):
+            opener = gzip.open if path.endswith('.gz') else open
+            with opener(path, 'rt', encoding='utf-8') as f:
+                yield from f
+        else:
+            from rdflib import Graph
+            graph = Graph()
+            graph.parse(path)
+            yield from graph.serialize(format='nt').splitlines()
+
+
+def read_graph_store(client, data_url):
+    """N-Triples lines of the default graph, streamed from a Graph Store Protocol endpoint"""
+    response = client.get(data_url, params={"default": ""}, headers={"Accept": "application/n-triples"}, stream=True)
+    response.raise_for_status()
+    response.encoding = 'utf-8'
+    yield from response.iter_lines(decode_unicode=True)
+
+
+class _Index:
+    """Interned terms and the SPO/POS/OSP indexes of one loaded graph"""
+
+    def __init__(self, triples):
+        self.ids = {}
+        self.values = []
+        self.spo, self.pos, self.osp = {}, {}, {}
+        self.triples = 0
+        # Derived, query-independent lists (e.g. foods in URI order), built on first use
+        self.memo = {}
+        seen = set()
+        for s, p, o in triples:
+            key = (self.intern(s), self.intern(p), self.intern(o))
+            if key in seen:
+                continue
+            seen.add(key)
+            s, p, o = key
+            self.spo.setdefault(s, {}).setdefault(p, array('l')).append(o)
+            self.pos.setdefault(p, {}).setdefault(o, array('l')).append(s)
+            self.osp.setdefault(o, {}).setdefault(s, array('l')).append(p)
+            self.triples += 1
+
+    def intern(self, term):
+        term_id = self.ids.get(term)
+        if term_id is None:
+            term_id = self.ids[term] = len(self.values)
+            self.values.append(term_value(term))
+        return term_id
+
+    def iri(self, uri):
+        return self.ids.get(f"<{uri}>")
+
+    def objects(self, s, p):
+        return self.spo.get(s, {}).get(p, ())
+
+    def subjects(self, p, o):
+        return self.pos.get(p, {}).get(o, ())
+
+    def first(self, s, p):
+        objects = self.objects(s, p)
+        return self.values[objects[0]] if objects else None
+
+
+def _row(**values):
+    """A SPARQL JSON binding row; unbound variables are left out like in a real result"""
+    return {name: {'value': v} for name, v in values.items() if v is not None}
+
+
+class LocalGraph:
+    """Same interface as kg_queries.SparqlGraph, answered from in-memory indexes.
+
+    `loader()` returns an iterable of N-Triples lines. The graph is loaded on
+    first use and swapped atomically by `reload()`. When `version_fn` is given
+    it reads the dataset version from the source store, and `data_version()`
+    reloads the graph once that no longer matches the loaded copy, so every
+    worker picks up a new load, not only the one that received the invalidation.
+    """
+
+    FOOD_FIELDS = {
+        'ingredients': 'ingredients', 'recipe': 'recipe', 'calories': 'calorieIntake',
+        'eatingTime': 'eatingTime', 'foodLocationArea': 'foodLocationArea', 'isRawOrCooked': 'isRawOrCooked'
+    }
+
+    def __init__(self, loader, version_fn=None):
+        self.loader = loader
+        self.version_fn = version_fn
+        self._index = None
+        self._lock = threading.Lock()
+        self.loaded_at = None
+        self.load_seconds = None
+
+    def reload(self):
+        """Load the graph again and swap it in; requests keep using the old one until then"""
+        start = time.perf_counter()
+        with metrics.span("graph", "load") as span:
+            index = _Index(parse_ntriples(self.loader()))
+            span.rows = index.triples
+        self.load_seconds = round(time.perf_counter() - start, 3)
+        self.loaded_at = time.time()
+        self._index = index
+        return index
+
+    def index(self):
+        index = self._index
+        if index is None:
+            with self._lock:
+                index = self._index or self.reload()
+        return index
+
+    # Query shapes
+
+    def _ids(self, index, names):
+        return {name: index.iri(EX + name) for name in names}
+
+    def _foods(self, index):
+        """Food ids sorted by URI, i.e. `?food a ex:Food ; ex:foodName ?foodName` in ORDER BY ?food order"""
+        foods = index.memo.get('foods')
+        if foods is None:
+            rdf_type, food, food_name = index.iri(RDF_TYPE), index.iri(EX + "Food"), index.iri(EX + "foodName")
+            foods = [f for f in index.subjects(rdf_type, food) if index.objects(f, food_name)]
+            foods = index.memo['foods'] = sorted(foods, key=index.values.__getitem__)
+        return foods
+
+    def _food_property_rows(self, index, foods):
+        food_name = index.iri(EX + "foodName")
+        fields = self._ids(index, self.FOOD_FIELDS.values())
+        return [
+            _row(food=index.values[f], foodName=index.first(f, food_name),
+                 **{var: index.first(f, fields[prop]) for var, prop in self.FOOD_FIELDS.items()})
+            for f in foods
+        ]
+
+    def _food_image_rows(self, index, foods):
+        """Image rows per food in image URL order; triple order depends on how the source was parsed"""
+        ids = self._ids(index, ("isImageOf", "imageUrl", "thumbnailUrl"))
+        return [
+            _row(food=index.values[f], imageUrl=index.values[url], thumbnailUrl=index.first(image, ids["thumbnailUrl"]))
+            for f in foods
+            for url, image in sorted(
+                ((url, image) for image in index.subjects(ids["isImageOf"], f)
+                 for url in index.objects(image, ids["imageUrl"])),
+                key=lambda pair: index.values[pair[0]]
+            )
+        ]
+
+    def _food_disease_rows(self, index, foods):
+        ids = self._ids(index, ("isRelatedTo", "diseaseName"))
+        return [
+            _row(food=index.values[f], disease=index.values[d], diseaseName=index.values[name])
+            for f in foods
+            for d in index.objects(f, ids["isRelatedTo"])
+            for name in index.objects(d, ids["diseaseName"])
+        ]
+
+    def _group_foods(self, index, foods):
+        return kg_queries.group_foods(
+            self._food_property_rows(index, foods),
+            self._food_image_rows(index, foods),
+            self._food_disease_rows(index, foods)
+        )
+
+    def _loaded_version(self, index):
+        meta, version = index.iri(EX + "dataset_meta"), index.iri(EX + "dataVersion")
+        return index.first(meta, version) if meta is not None else None
+
+    def data_version(self):
+        index = self.index()
+        if self.version_fn is None:
+            return self._loaded_version(index)
+        version = self.version_fn()
+        if version != self._loaded_version(index):
+            with self._lock:
+                # Another request may have reloaded while this one waited
+                if self._index is index:
+                    index = self.reload()
+                else:
+                    index = self._index
+        return self._loaded_version(index)
+
+    def fetch_foods(self):
+        index = self.index()
+        return self._group_foods(index, self._foods(index))
+
+    def fetch_food_page(self, limit, after=None, offset=None):
+        index = self.index()
+        foods = self._foods(index)
+        start = bisect.bisect_right(foods, after, key=index.values.__getitem__) if after else 0
+        if offset:
+            start += max(int(offset), 0)
+        return list(self._group_foods(index, foods[start:start + int(limit)]).values())
+
+    def iter_foods(self, page_size=500):
+        after = None
+        while True:
+            page = self.fetch_food_page(page_size, after=after)
+            if not page:
+                return
+            yield from page
+            after = page[-1]['uri']
+
+    def search_foods(self, text, limit=20):
+        index = self.index()
+        term = text.lower()
+        ids = self._ids(index, ("foodName", "ingredients", "isRelatedTo", "diseaseName"))
+
+        def matches(f):
+            if term in (index.first(f, ids["foodName"]) or '').lower():
+                return True
+            if term in (index.first(f, ids["ingredients"]) or '').lower():
+                return True
+            return any(
+                term in index.values[name].lower()
+                for d in index.objects(f, ids["isRelatedTo"])
+                for name in index.objects(d, ids["diseaseName"])
+            )
+
+        found = sorted((f for f in self._foods(index) if matches(f)), key=lambda f: index.first(f, ids["foodName"]))
+        found = found[:int(limit)]
+        rows = [
+            _row(food=index.values[f], foodName=index.first(f, ids["foodName"]),
+                 ingredients=index.first(f, ids["ingredients"]),
+                 calories=index.first(f, index.iri(EX + "calorieIntake")))
+            for f in found
+        ]
+        # Like kg_queries.search_foods: images only, no related diseases
+        return list(kg_queries.group_foods(rows, self._food_image_rows(index, found), []).values())
+
+    def fetch_diseases(self):
+        index = self.index()
+        ids = self._ids(index, (
+            "Disease", "diseaseName", "symptoms", "sex", "mostCommonSubjectKind", "belongTo", "diseaseFamilyName",
+            "isDocumentedBy", "hasTreatmentProtocol", "documentUrl"
+        ))
+        diseases = sorted(index.subjects(index.iri(RDF_TYPE), ids["Disease"]), key=index.values.__getitem__)
+
+        property_rows = []
+        for d in diseases:
+            props = {
+                var: index.first(d, ids[prop]) for var, prop in
+                (("name", "diseaseName"), ("symptoms", "symptoms"), ("sex", "sex"), ("subjectKind", "mostCommonSubjectKind"))
+            }
+            # Every pattern in DISEASE_PROPERTIES_QUERY is required, so partial diseases are left out
+            for family in index.objects(d, ids["belongTo"]):
+                family_name = index.first(family, ids["diseaseFamilyName"])
+                if family_name is not None and None not in props.values():
+                    property_rows.append(_row(disease=index.values[d], family=index.values[family],
+                                              familyName=family_name, **props))
+
+        def url_rows(predicate, var):
+            return [
+                _row(disease=index.values[d], **{var: index.values[url]})
+                for d in diseases
+                for doc in index.objects(d, ids[predicate])
+                for url in index.objects(doc, ids["documentUrl"])
+            ]
+
+        return kg_queries.group_diseases(
+            property_rows, url_rows("isDocumentedBy", "docUrl"), url_rows("hasTreatmentProtocol", "treatmentUrl")
+        )
+
+    def stats(self):
+        index = self._index
+        return {
+            "backend": "local",
+            "loaded": index is not None,
+            "triples": index.triples if index else 0,
+            "terms": len(index.values) if index else 0,
+            "loaded_at": self.loaded_at,
+            "load_seconds": self.load_seconds
+        }
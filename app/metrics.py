@@ -0,0 +1,321 @@
+"""Latency, row-count and payload-size metrics, exposed in the Prometheus text format.
+
+Work on the request path is timed with `span(name, op)`: each SPARQL query
+and Solr call (timed in backends.py / async_backends.py), each grouping loop
+over bindings, the catalog build, and each JSON encode or compression. A span
+records its duration, and the rows and bytes it handled when set, in
+histograms labelled by span name and operation. The spans of the current
+request are also summed per name so the API can send them back in a
+Server-Timing header. A SPARQL query slower than SLOW_QUERY_MS is logged with
+its full text.
+
+Metrics are kept per process; `render()` returns them for a /metrics endpoint.
+With METRICS_DIR set (gunicorn.conf.py does it), each process also writes its
+values to its own file there every METRICS_FLUSH_INTERVAL seconds, and
+`render()` sums the files, so a scrape answered by any worker reports the
+whole server. Files of exited workers are kept: their counts stay part of the
+totals, as Prometheus expects of counters.
+"""
+import bisect
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from settings import METRICS_DIR, METRICS_FLUSH_INTERVAL, SLOW_QUERY_MS
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "fdkg_"
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+ROWS_BUCKETS = (0, 1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+BYTES_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_metrics = []
+# {span name: seconds} of the request being handled, or None outside a request
+_trace = contextvars.ContextVar("trace", default=None)
+# This process's file in METRICS_DIR and the pid it belongs to; a forked worker gets its own
+_process = {"pid": None, "path": None, "flusher": None}
+_process_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic count per label combination"""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = PREFIX + name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self):
+        """{label values: value} copy of every series"""
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self, values=None):
+        """Exposition lines of `values` (default: this process's own)"""
+        values = self.snapshot() if values is None else values
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram(Counter):
+    """Observations counted into fixed buckets, with their sum, per label combination"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=SECONDS_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # One count per bucket plus +Inf, then the sum
+                series = self._values[key] = [0] * (len(self.buckets) + 1) + [0]
+            series[slot] += 1
+            series[-1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {key: list(series) for key, series in self._values.items()}
+
+    def samples(self, values=None):
+        values = self.snapshot() if values is None else values
+        for key, series in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                le = f'le="{bound if bound == "+Inf" else _number(float(bound))}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, key, [le])} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {_number(float(series[-1]))}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}"
+
+    def totals(self):
+        """{label values: (count, sum)} of every series"""
+        with self._lock:
+            return {key: (sum(series[:-1]), series[-1]) for key, series in self._values.items()}
+
+
+def counter(name, help, labelnames=()):
+    metric = Counter(name, help, labelnames)
+    _metrics.append(metric)
+    return metric
+
+
+def histogram(name, help, labelnames=(), buckets=SECONDS_BUCKETS):
+    metric = Histogram(name, help, labelnames, buckets)
+    _metrics.append(metric)
+    return metric
+
+
+REQUEST_SECONDS = histogram("http_request_duration_seconds", "API request latency",
+                            ("endpoint", "method", "status"))
+SPAN_SECONDS = histogram("span_duration_seconds", "Time spent in a backend call, grouping loop or encoding step",
+                         ("span", "op", "outcome"))
+SPAN_ROWS = histogram("span_rows", "Rows (SPARQL bindings, records or documents) handled by a span",
+                      ("span", "op"), ROWS_BUCKETS)
+SPAN_BYTES = histogram("span_bytes", "Payload bytes received or produced by a span", ("span", "op"), BYTES_BUCKETS)
+SLOW_QUERIES = counter("slow_queries_total", f"Queries slower than SLOW_QUERY_MS ({SLOW_QUERY_MS} ms)", ("span", "op"))
+ERRORS = counter("errors_total", "Requests answered with a 500, by endpoint and exception type", ("endpoint", "type"))
+
+
+class Span:
+    """What a timed block handled; set `rows` and `bytes` inside the `with` block"""
+    __slots__ = ('name', 'op', 'statement', 'rows', 'bytes', 'seconds')
+
+    def __init__(self, name, op, statement=None):
+        self.name = name
+        self.op = op
+        self.statement = statement
+        self.rows = None
+        self.bytes = None
+        self.seconds = None
+
+
+@contextmanager
+def span(name, op="", statement=None):
+    """Time a block as `name`/`op`; `statement` (e.g. the SPARQL text) is logged if it is slow"""
+    record = Span(name, op, statement)
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield record
+        outcome = "ok"
+    finally:
+        record.seconds = time.perf_counter() - start
+        _finish(record, outcome)
+
+
+def _finish(record, outcome):
+    SPAN_SECONDS.observe(record.seconds, span=record.name, op=record.op, outcome=outcome)
+    if record.rows is not None:
+        SPAN_ROWS.observe(record.rows, span=record.name, op=record.op)
+    if record.bytes is not None:
+        SPAN_BYTES.observe(record.bytes, span=record.name, op=record.op)
+    trace = _trace.get()
+    if trace is not None:
+        trace[record.name] = trace.get(record.name, 0.0) + record.seconds
+    if record.statement is not None and SLOW_QUERY_MS and record.seconds * 1000 >= SLOW_QUERY_MS:
+        SLOW_QUERIES.inc(span=record.name, op=record.op)
+        logger.warning("Slow %s query %s: %.0f ms (%s, %s bytes)\n%s", record.name, record.op or "-",
+                       record.seconds * 1000, outcome, record.bytes, record.statement.strip())
+
+
+def begin_request():
+    """Start collecting the spans of a request; returns the start time for `end_request`"""
+    _trace.set({})
+    return time.perf_counter()
+
+
+def end_request(start, endpoint, method, status):
+    """Record a finished request and return its Server-Timing header value"""
+    seconds = time.perf_counter() - start
+    REQUEST_SECONDS.observe(seconds, endpoint=endpoint or "unmatched", method=method, status=status)
+    trace = _trace.get() or {}
+    _trace.set(None)
+    _start_flusher()
+    timings = [f"{name};dur={elapsed * 1000:.1f}" for name, elapsed in trace.items()]
+    return ", ".join(timings + [f"total;dur={seconds * 1000:.1f}"])
+
+
+def record_error(endpoint, error):
+    ERRORS.inc(endpoint=endpoint or "unmatched", type=type(error).__name__)
+    _start_flusher()
+
+
+def _process_path():
+    pid = os.getpid()
+    if _process["pid"] != pid or os.path.dirname(_process["path"]) != METRICS_DIR:
+        # The start time keeps a reused pid from overwriting an exited worker's counts
+        _process.update(pid=pid, path=os.path.join(METRICS_DIR, f"{pid}-{time.time_ns()}.json"), flusher=None)
+    return _process["path"]
+
+
+def flush():
+    """Write this process's values to its file in METRICS_DIR"""
+    if not METRICS_DIR:
+        return
+    path = _process_path()
+    state = {metric.name: [[list(key), value] for key, value in metric.snapshot().items()] for metric in _metrics}
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def _flush_loop():
+    while True:
+        time.sleep(METRICS_FLUSH_INTERVAL)
+        try:
+            flush()
+        except OSError as e:
+            logger.warning("Could not write metrics to %s: %s", METRICS_DIR, e)
+
+
+def _start_flusher():
+    """Start this process's flush thread on its first request (after the fork, in a worker)"""
+    if not METRICS_DIR or (_process["pid"] == os.getpid() and _process["flusher"]):
+        return
+    with _process_lock:
+        _process_path()
+        if _process["flusher"] is None:
+            os.makedirs(METRICS_DIR, exist_ok=True)
+            _process["flusher"] = threading.Thread(target=_flush_loop, name="metrics-flush", daemon=True)
+            _process["flusher"].start()
+
+
+def _collect():
+    """{metric name: {label values: value}} summed over the files of every process in METRICS_DIR"""
+    totals = {metric.name: {} for metric in _metrics}
+    for entry in os.scandir(METRICS_DIR):
+        if not entry.name.endswith(".json"):
+            continue
+        try:
+            with open(entry.path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            continue  # Removed since the scan
+        for name, series in state.items():
+            merged = totals.get(name)
+            if merged is None:
+                continue
+            for key, value in series:
+                key = tuple(key)
+                current = merged.get(key)
+                if current is None:
+                    merged[key] = value
+                elif isinstance(value, list):
+                    merged[key] = [a + b for a, b in zip(current, value)]
+                else:
+                    merged[key] = current + value
+    return totals
+
+
+def render():
+    """Every metric in the Prometheus text exposition format (version 0.0.4), summed over workers with METRICS_DIR"""
+    values = {}
+    if METRICS_DIR:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        flush()
+        values = _collect()
+    lines = []
+    for metric in _metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples(values.get(metric.name)))
+    return "\n".join(lines) + "\n"
+
+
+def summary():
+    """Per-span (name, op, calls, total seconds, rows, bytes) rows, largest total first, for batch jobs"""
+    rows = {}
+    for (name, op, _), (count, total) in SPAN_SECONDS.totals().items():
+        calls, seconds, _, _ = rows.get((name, op), (0, 0.0, 0, 0))
+        rows[(name, op)] = (calls + count, seconds + total, 0, 0)
+    for metric, slot in ((SPAN_ROWS, 2), (SPAN_BYTES, 3)):
+        for (name, op), (_, total) in metric.totals().items():
+            if (name, op) in rows:
+                values = list(rows[(name, op)])
+                values[slot] = int(total)
+                rows[(name, op)] = tuple(values)
+    return sorted(((name, op, *values) for (name, op), values in rows.items()), key=lambda row: -row[3])
+
+
+def reset():
+    """Forget every recorded value"""
+    for metric in _metrics:
+        metric.clear()
@@ -0,0 +1,66 @@
+"""Environment-driven configuration shared by the Flask (app.py) and async (async_app.py) APIs"""
+import os
+
+# Paths and environment variables
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+ASSETS_DIR = os.path.join(APP_DIR, "assets")
+FOODS_DIR = os.path.join(ASSETS_DIR, "images")
+DISEASES_DIR = os.path.join(ASSETS_DIR, "documents")
+SPARQL_URL = os.getenv("SPARQL_URL", "http://fuseki:3030/food_disease_kg/sparql")
+FUSEKI_DATA_URL = os.getenv("FUSEKI_DATA_URL", "http://fuseki:3030/food_disease_kg/data")
+# "sparql" queries Fuseki per request; "local" serves reads from an in-process copy (local_graph.py)
+GRAPH_BACKEND = os.getenv("GRAPH_BACKEND", "sparql")
+# Comma-separated RDF files for the local graph; empty means download it from FUSEKI_DATA_URL
+GRAPH_SOURCE = os.getenv("GRAPH_SOURCE", "")
+SOLR_URL = os.getenv("FOOD_SOLR_SELECT", "http://solr:8983/solr/food_collection/select")
+DISEASE_SOLR_URL = os.getenv("DISEASE_SOLR_SELECT", "http://solr:8983/solr/disease_collection/select")
+CACHE_TTL = int(os.getenv("CACHE_TTL", "300"))
+CACHE_VERSION_INTERVAL = int(os.getenv("CACHE_VERSION_INTERVAL", "10"))
+PRELOAD_CACHES = os.getenv("PRELOAD_CACHES", "1") == "1"
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+HEALTH_INTERVAL = float(os.getenv("HEALTH_INTERVAL", "15"))
+HEALTH_TIMEOUT = float(os.getenv("HEALTH_TIMEOUT", "2"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+SEARCH_LIMIT = int(os.getenv("SEARCH_LIMIT", "20"))
+# edismax field boosts: a hit on the food name outranks one in the recipe text
+SEARCH_QF = os.getenv("SEARCH_QF", "foodName^5 diseaseNames^3 ingredients^2 recipe^0.5")
+SEARCH_PF = os.getenv("SEARCH_PF", "foodName^10 ingredients^3")
+DISEASE_SEARCH_QF = os.getenv("DISEASE_SEARCH_QF", "diseaseName^5 symptoms^3 familyName^2 mostCommonSubjectKind sex")
+# Schemaless Solr copies each text field into an untokenized <field>_str used for faceting
+DISEASE_FACETS = {
+    "family": "familyName_str",
+    "sex": "sex_str",
+    "subjectKind": "mostCommonSubjectKind_str"
+}
+# Graph traversal (/api/traverse): default and maximum hops, neighbours taken per node,
+# nodes reached per traversal, and cached results per dataset version
+TRAVERSAL_DEPTH = int(os.getenv("TRAVERSAL_DEPTH", "2"))
+TRAVERSAL_MAX_DEPTH = int(os.getenv("TRAVERSAL_MAX_DEPTH", "4"))
+TRAVERSAL_FANOUT = int(os.getenv("TRAVERSAL_FANOUT", "100"))
+TRAVERSAL_MAX_NODES = int(os.getenv("TRAVERSAL_MAX_NODES", "5000"))
+TRAVERSAL_CACHE_SIZE = int(os.getenv("TRAVERSAL_CACHE_SIZE", "1024"))
+# Food facets (/api/foods/facets): calorie histogram bucket width and cached filter combinations
+CALORIE_BUCKET = int(os.getenv("CALORIE_BUCKET", "100"))
+FACET_CACHE_SIZE = int(os.getenv("FACET_CACHE_SIZE", "1024"))
+# Static assets (/images, /documents): Cache-Control max-age of unversioned URLs, and
+# optional offload of the body to the front server: "sendfile" (X-Sendfile) or "accel"
+# (nginx X-Accel-Redirect to ASSET_ACCEL_PREFIX + the path under app/assets)
+ASSET_MAX_AGE = int(os.getenv("ASSET_MAX_AGE", "86400"))
+ASSET_OFFLOAD = os.getenv("ASSET_OFFLOAD", "")
+ASSET_ACCEL_PREFIX = os.getenv("ASSET_ACCEL_PREFIX", "/protected-assets")
+# Response compression: bodies below COMPRESS_MIN_SIZE bytes are sent as is; cached
+# snapshots are compressed once at the SNAPSHOT_* levels, other JSON per request.
+# Snapshots are compressed on the request path while their build lock is held, so
+# the SNAPSHOT_* defaults stay cheap: brotli 11 takes ~1.4 s on 600 KB, brotli 5 ~10 ms
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+SNAPSHOT_GZIP_LEVEL = int(os.getenv("SNAPSHOT_GZIP_LEVEL", "6"))
+SNAPSHOT_BROTLI_QUALITY = int(os.getenv("SNAPSHOT_BROTLI_QUALITY", "5"))
+# Metrics (/metrics): SPARQL queries slower than this are logged with their text; 0 disables the log
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "500"))
+# With several worker processes, each one writes its metrics to a file in METRICS_DIR
+# every METRICS_FLUSH_INTERVAL seconds and /metrics sums the files; unset, metrics are
+# per process. gunicorn.conf.py sets and empties it for the gunicorn workers
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "1"))
@@ -0,0 +1,202 @@
+"""Backend-independent request parameters and response shapes.
+
+Pure functions shared by the Flask (app.py) and async (async_app.py) APIs so
+both return identical payloads.
+"""
+import base64
+import hmac
+
+from settings import ADMIN_TOKEN, DISEASE_FACETS, DISEASE_SEARCH_QF, SEARCH_PF, SEARCH_QF
+
+
+def is_admin(token):
+    """Whether an X-Admin-Token value matches ADMIN_TOKEN, compared in constant time; always False when unset"""
+    if not ADMIN_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8'))
+
+
+def parse_limit(value, default):
+    """A `limit` query value as an int, `default` when absent, or None when it is not an integer"""
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def encode_cursor(food_uri):
+    return base64.urlsafe_b64encode(food_uri.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    return base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8')
+
+
+def safe_string_field(field_value):
+    """Flatten a Solr field that may come back multi-valued into a string"""
+    if isinstance(field_value, list):
+        return ", ".join(str(item) for item in field_value if item)
+    return str(field_value) if field_value else ""
+
+
+def first_value(field_value, default=""):
+    if isinstance(field_value, list):
+        return field_value[0] if field_value else default
+    return field_value if field_value is not None else default
+
+
+def distinct_food_entry(doc):
+    """Shape a food_collection document into a food card entry"""
+    food_uri = first_value(doc.get("food_uri", ""))
+
+    is_raw_or_cooked = safe_string_field(doc.get("isRawOrCooked", ""))
+    food_location_area = safe_string_field(doc.get("foodLocationArea", ""))
+    eating_time = safe_string_field(doc.get("eatingTime", ""))
+    ingredients = safe_string_field(doc.get("ingredients", ""))
+    recipe = safe_string_field(doc.get("recipe", ""))
+
+    images = doc.get("images", [])
+    if isinstance(images, list):
+        images = images[:5]  # Limit to 5 images
+    else:
+        images = [images] if images else []
+    thumbnails = doc.get("thumbnails") or images
+    if isinstance(thumbnails, list):
+        thumbnails = thumbnails[:5]
+    else:
+        thumbnails = [thumbnails]
+
+    related_diseases = doc.get("diseaseNames", [])
+    if not isinstance(related_diseases, list):
+        related_diseases = [related_diseases] if related_diseases else []
+
+    calories = first_value(doc.get("calories", 0), 0)
+
+    # Create a categories list for better filtering
+    categories = []
+    if eating_time:
+        categories.append(f"Meal: {eating_time}")
+    if is_raw_or_cooked:
+        categories.append(f"Prep: {is_raw_or_cooked}")
+    if food_location_area:
+        categories.append(f"Origin: {food_location_area}")
+
+    return {
+        "name": safe_string_field(doc.get("foodName")) or food_uri.split('/')[-1] or "Unknown",
+        "images": images,
+        "thumbnails": thumbnails,
+        "calories": int(calories) if str(calories).isdigit() else 0,
+        "type": eating_time,
+        "tags": [tag for tag in [is_raw_or_cooked, food_location_area] if tag],
+        "categories": categories,
+        "ingredients": ingredients,
+        "recipe": recipe,
+        "relatedDiseases": related_diseases
+    }
+
+
+def food_search_params(query, limit):
+    return {
+        "q": query,
+        "defType": "edismax",
+        "qf": SEARCH_QF,
+        "pf": SEARCH_PF,
+        "fl": "id,food_uri,foodName,images,thumbnails,ingredients,calories,score",
+        "rows": limit,
+        "hl": "true",
+        "hl.fl": "foodName,ingredients,diseaseNames",
+        "hl.snippets": 1,
+        "hl.fragsize": 120,
+        "wt": "json"
+    }
+
+
+def food_search_results(solr_data):
+    """Shape a food_collection search response, attaching highlight snippets"""
+    highlighting = solr_data.get("highlighting", {})
+    results = []
+    for doc in solr_data["response"].get("docs", []):
+        food_uri = first_value(doc.get("food_uri", ""))
+        entry = distinct_food_entry(doc)
+        results.append({
+            'uri': food_uri,
+            'name': entry['name'],
+            'images': entry['images'],
+            'thumbnails': entry['thumbnails'],
+            'ingredients': entry['ingredients'],
+            'calories': entry['calories'],
+            'highlights': highlighting.get(doc.get("id", food_uri), {})
+        })
+    return results
+
+
+def solr_phrase(text):
+    """Quote `text` as a Solr phrase so it can be used as an exact-match filter"""
+    return '"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def disease_card(doc):
+    """Shape a disease_collection document like an /api/diseases record"""
+    documents = doc.get("documents", [])
+    treatments = doc.get("treatmentProtocols", [])
+    return {
+        'uri': safe_string_field(doc.get("disease_uri")),
+        'name': safe_string_field(doc.get("diseaseName")),
+        'symptoms': safe_string_field(doc.get("symptoms")),
+        'sex': safe_string_field(doc.get("sex")),
+        'mostCommonSubjectKind': safe_string_field(doc.get("mostCommonSubjectKind")),
+        'familyName': safe_string_field(doc.get("familyName")) or 'Unknown',
+        'documents': documents if isinstance(documents, list) else [documents],
+        'treatmentProtocols': treatments if isinstance(treatments, list) else [treatments]
+    }
+
+
+def facet_counts(solr_data):
+    """Turn Solr's flat [value, count, ...] facet lists into {facet: {value: count}}"""
+    fields = solr_data.get("facet_counts", {}).get("facet_fields", {})
+    counts = {}
+    for name, field in DISEASE_FACETS.items():
+        flat = fields.get(field, [])
+        counts[name] = {flat[i]: flat[i + 1] for i in range(0, len(flat) - 1, 2)}
+    return counts
+
+
+def disease_facet_params():
+    return {
+        "facet": "true",
+        "facet.field": list(DISEASE_FACETS.values()),
+        "facet.mincount": 1,
+        "facet.limit": -1
+    }
+
+
+def disease_facets_summary(solr_data):
+    return {"total": solr_data["response"].get("numFound", 0), "facets": facet_counts(solr_data)}
+
+
+def disease_search_params(query, filters, limit, with_facets):
+    params = {
+        "q": query or "*:*",
+        "defType": "edismax",
+        "qf": DISEASE_SEARCH_QF,
+        "fq": [f"{DISEASE_FACETS[name]}:{solr_phrase(value)}" for name, value in filters.items() if value],
+        "rows": limit,
+        "wt": "json"
+    }
+    if with_facets:
+        params.update(disease_facet_params())
+    return params
+
+
+def disease_search_results(solr_data, with_facets):
+    results = [disease_card(doc) for doc in solr_data["response"].get("docs", [])]
+    if not with_facets:
+        return results
+    return {
+        "data": results,
+        "total": solr_data["response"].get("numFound", 0),
+        "facets": facet_counts(solr_data)
+    }
@@ -0,0 +1,202 @@
+"""Bounded breadth-first traversal of the food / disease / family / ingredient graph.
+
+Nodes are (kind, position) pairs over a views.Catalog. Every hop between two
+kinds follows one of the catalog's CSR relations, wrapped as NumPy arrays so
+a whole frontier is expanded with a few vectorized operations rather than a
+Python loop per node. A traversal is bounded by depth, by the number of
+neighbours taken per node (fan-out) and by the total number of nodes
+reached, and its result is kept in a per-catalog LRU cache keyed by start
+node and pattern.
+"""
+import threading
+
+import numpy as np
+
+from cache import LruCache
+from documents import local_name
+from ingredients import normalize
+from settings import TRAVERSAL_CACHE_SIZE, TRAVERSAL_DEPTH, TRAVERSAL_FANOUT, TRAVERSAL_MAX_DEPTH, TRAVERSAL_MAX_NODES
+
+KINDS = ("food", "disease", "family", "ingredient")
+# (from kind, to kind) -> the Catalog relation followed by that hop
+RELATIONS = {
+    ("food", "disease"): "food_diseases",
+    ("disease", "food"): "disease_foods",
+    ("disease", "family"): "disease_families",
+    ("family", "disease"): "family_diseases",
+    ("food", "ingredient"): "food_ingredients",
+    ("ingredient", "food"): "ingredient_foods",
+}
+EMPTY = np.empty(0, dtype=np.int64)
+
+
+class Csr:
+    """NumPy views (no copy) of a views.Adjacency"""
+    __slots__ = ('offsets', 'targets')
+
+    def __init__(self, adjacency):
+        self.offsets = np.frombuffer(adjacency.offsets, dtype=adjacency.offsets.typecode).astype(np.int64, copy=False)
+        self.targets = np.frombuffer(adjacency.targets, dtype=adjacency.targets.typecode).astype(np.int64, copy=False)
+
+    def expand(self, frontier, fanout=0):
+        """Neighbours of every node in `frontier`, at most `fanout` per node, and whether any were cut off"""
+        starts = self.offsets[frontier]
+        degrees = self.offsets[frontier + 1] - starts
+        cut = bool(fanout) and bool((degrees > fanout).any())
+        if fanout:
+            degrees = np.minimum(degrees, fanout)
+        total = int(degrees.sum())
+        if not total:
+            return EMPTY, cut
+        # Edge k of the output belongs to row r: it sits at starts[r] + (k - first output index of r)
+        row_base = np.repeat(starts - (np.cumsum(degrees) - degrees), degrees)
+        return self.targets[row_base + np.arange(total)], cut
+
+
+def parse_options(args):
+    """Traversal options from request arguments; raises ValueError on bad input"""
+    path = [hop.strip() for hop in args.get('path', '').split(',') if hop.strip()] or None
+    depth = int(args.get('depth', len(path) if path else TRAVERSAL_DEPTH))
+    fanout = int(args.get('fanout', TRAVERSAL_FANOUT))
+    max_nodes = int(args.get('limit', TRAVERSAL_MAX_NODES))
+    if path and depth != len(path):
+        raise ValueError("'depth' must match the number of hops in 'path'")
+    if not 1 <= depth <= TRAVERSAL_MAX_DEPTH:
+        raise ValueError(f"'depth' must be between 1 and {TRAVERSAL_MAX_DEPTH}")
+    if fanout < 1 or max_nodes < 1:
+        raise ValueError("'fanout' and 'limit' must be positive integers")
+    return {"path": path, "depth": depth, "fanout": min(fanout, TRAVERSAL_FANOUT),
+            "max_nodes": min(max_nodes, TRAVERSAL_MAX_NODES)}
+
+
+class Traverser:
+    """Runs bounded traversals over one catalog and caches their results"""
+
+    def __init__(self, catalog, cache_size=TRAVERSAL_CACHE_SIZE):
+        self.catalog = catalog
+        self.sizes = {
+            "food": len(catalog.foods), "disease": len(catalog.diseases),
+            "family": len(catalog.families), "ingredient": len(catalog.ingredients)
+        }
+        self.ids = {
+            "food": catalog.food_ids, "disease": catalog.disease_ids,
+            "family": catalog.family_ids, "ingredient": catalog.ingredient_ids
+        }
+        self.relations = {pair: Csr(getattr(catalog, name)) for pair, name in RELATIONS.items()}
+        self.cache = LruCache(cache_size)
+
+    def position(self, kind, node_id):
+        """Position of a node given its id (URI local name, or the name of an ingredient), or None"""
+        if kind not in self.ids:
+            raise ValueError(f"Unknown node kind '{kind}', expected one of {', '.join(KINDS)}")
+        return self.ids[kind].get(normalize(node_id) if kind == "ingredient" else node_id)
+
+    def describe(self, kind, position):
+        if kind == "food":
+            food = self.catalog.foods[position]
+            uri, name = food.uri, food.name
+        elif kind == "disease":
+            disease = self.catalog.diseases[position]
+            uri, name = disease.uri, disease.name
+        elif kind == "family":
+            uri, name = self.catalog.families[position]
+        else:
+            name = self.catalog.ingredients[position]
+            return {"kind": kind, "id": name, "uri": None, "name": name}
+        return {"kind": kind, "id": local_name(uri), "uri": uri, "name": name}
+
+    def _step(self, frontier, targets, visited, fanout):
+        """Expand `frontier` ({kind: positions}) into the next level of unvisited nodes of the `targets` kinds"""
+        reached, cut = {}, False
+        for (source, target), csr in self.relations.items():
+            if source in frontier and target in targets:
+                neighbours, truncated = csr.expand(frontier[source], fanout)
+                cut = cut or truncated
+                if neighbours.size:
+                    reached.setdefault(target, []).append(neighbours)
+        level = {}
+        for kind, parts in reached.items():
+            nodes = np.unique(np.concatenate(parts))
+            nodes = nodes[~visited[kind][nodes]]
+            if nodes.size:
+                visited[kind][nodes] = True
+                level[kind] = nodes
+        return level, cut
+
+    def _run(self, kind, position, path, depth, fanout, max_nodes):
+        if path:
+            for source, target in zip([kind] + path, path):
+                if (source, target) not in RELATIONS:
+                    raise ValueError(f"No relation from {source} to {target}")
+        visited = {k: np.zeros(size, dtype=bool) for k, size in self.sizes.items()}
+        visited[kind][position] = True
+        frontier = {kind: np.array([position], dtype=np.int64)}
+        levels, reached, truncated = [], 0, False
+
+        for hop in range(depth):
+            targets = {path[hop]} if path else set(KINDS)
+            frontier, cut = self._step(frontier, targets, visited, fanout)
+            truncated = truncated or cut
+            if not frontier:
+                break
+            size = sum(nodes.size for nodes in frontier.values())
+            if reached + size > max_nodes:
+                # Keep the level in (kind, position) order up to the node budget
+                room, kept = max_nodes - reached, {}
+                for k in KINDS:
+                    if k in frontier and room > 0:
+                        kept[k] = frontier[k][:room]
+                        room -= kept[k].size
+                frontier, size, truncated = kept, max_nodes - reached, True
+            reached += size
+            levels.append(frontier)
+            if reached >= max_nodes:
+                break
+
+        # A pattern asks for the nodes at its end; a free traversal for everything reached
+        if not path:
+            shown, first = levels, 0
+        elif len(levels) == depth:
+            shown, first = levels[-1:], depth - 1
+        else:
+            shown, first = [], 0
+        return {
+            "start": self.describe(kind, position),
+            "path": path,
+            "depth": len(levels),
+            "truncated": truncated,
+            "levels": [{k: int(nodes.size) for k, nodes in level.items()} for level in levels],
+            "results": [
+                dict(self.describe(k, int(p)), depth=first + d + 1)
+                for d, level in enumerate(shown)
+                for k in KINDS if k in level
+                for p in level[k]
+            ]
+        }
+
+    def traverse(self, kind, position, path=None, depth=TRAVERSAL_DEPTH, fanout=TRAVERSAL_FANOUT,
+                 max_nodes=TRAVERSAL_MAX_NODES):
+        """Bounded BFS from a node, along `path` (a list of kinds) or over every relation up to `depth` hops"""
+        key = (kind, position, tuple(path) if path else None, depth, fanout, max_nodes)
+        result = self.cache.get(key)
+        if result is None:
+            result = self._run(kind, position, path, depth, fanout, max_nodes)
+            self.cache.put(key, result)
+        return result
+
+    def stats(self):
+        return {**self.cache.stats(), "nodes": self.sizes}
+
+
+_memo_lock = threading.Lock()
+
+
+def for_catalog(catalog):
+    """The Traverser of `catalog`, built on first use and dropped with the catalog"""
+    traverser = catalog.memo.get('traverser')
+    if traverser is None:
+        with _memo_lock:
+            traverser = catalog.memo.get('traverser')
+            if traverser is None:
+                traverser = catalog.memo['traverser'] = Traverser(catalog)
+    return traverser
@@ -0,0 +1,284 @@
+"""Materialized food and disease views, built once per dataset version.
+
+The grouped records from the graph backend are turned into compact, immutable
+FoodView/DiseaseView objects (app/documents.py) held in a Catalog, together
+with CSR adjacency arrays for the food <-> disease <-> family relations. Every payload the API
+and the Solr indexer produce for a food or disease (card, distinct entry,
+search result, Solr document) is derived from these objects, so the shapes
+can't drift apart and requests no longer regroup SPARQL bindings.
+"""
+import asyncio
+import bisect
+import threading
+import time
+from array import array
+
+import metrics
+from documents import DiseaseView, FoodView, local_name
+from ingredients import ingredient_names
+from shaping import decode_cursor, encode_cursor
+
+
+class Adjacency:
+    """Compressed sparse rows: the neighbours of row `i` are `targets[offsets[i]:offsets[i + 1]]`"""
+    __slots__ = ('offsets', 'targets')
+
+    def __init__(self, rows):
+        self.offsets = array('l', [0])
+        self.targets = array('l')
+        for row in rows:
+            self.targets.extend(row)
+            self.offsets.append(len(self.targets))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        return self.targets[self.offsets[row]:self.offsets[row + 1]]
+
+    def edges(self):
+        return len(self.targets)
+
+    def transpose(self, size):
+        """The reverse relation over `size` target rows, each row in ascending order"""
+        rows = [[] for _ in range(size)]
+        for source in range(len(self)):
+            for target in self[source]:
+                rows[target].append(source)
+        return Adjacency(rows)
+
+
+class Catalog:
+    """Every food and disease view of one dataset version, in URI order.
+
+    Foods, diseases and disease families are identified by their position in
+    `foods`, `diseases` and `families`; `*_ids` map a URI's local name to that
+    position. The relations between them are Adjacency (CSR) arrays over
+    those positions:
+
+        food_diseases      ex:isRelatedTo, restricted to diseases in the view
+        disease_foods      its reverse
+        disease_families   ex:belongTo
+        family_diseases    its reverse
+        family_foods       foods related to any disease of the family
+        food_ingredients   normalized ex:ingredients names, as positions in `ingredients`
+        ingredient_foods   its reverse: the ingredient -> food inverted index
+
+    `memo` holds structures derived from the catalog on first use (e.g. the
+    traversal engine), so they are dropped together with it.
+    """
+
+    def __init__(self, food_records, disease_records, version=None):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.foods = tuple(sorted((FoodView.from_record(r) for r in food_records), key=lambda f: f.uri))
+        self.diseases = tuple(sorted((DiseaseView.from_record(r) for r in disease_records), key=lambda d: d.uri))
+        self.families = tuple(sorted({(d.family, d.familyName) for d in self.diseases if d.family}))
+        self.food_uris = [food.uri for food in self.foods]
+        self.food_positions = {uri: i for i, uri in enumerate(self.food_uris)}
+        self.disease_positions = {disease.uri: j for j, disease in enumerate(self.diseases)}
+        family_positions = {uri: k for k, (uri, _) in enumerate(self.families)}
+
+        self.food_ids = {local_name(food.uri): i for i, food in enumerate(self.foods)}
+        self.disease_ids = {local_name(disease.uri): j for j, disease in enumerate(self.diseases)}
+        self.family_ids = {local_name(uri): k for k, (uri, _) in enumerate(self.families)}
+
+        self.food_diseases = Adjacency(
+            dict.fromkeys(self.disease_positions[uri] for uri, _ in food.related if uri in self.disease_positions)
+            for food in self.foods
+        )
+        self.disease_foods = self.food_diseases.transpose(len(self.diseases))
+        self.disease_families = Adjacency(
+            [family_positions[disease.family]] if disease.family else [] for disease in self.diseases
+        )
+        self.family_diseases = self.disease_families.transpose(len(self.families))
+        self.family_foods = Adjacency(
+            sorted({i for j in self.family_diseases[k] for i in self.disease_foods[j]})
+            for k in range(len(self.families))
+        )
+
+        food_ingredients = [ingredient_names(food.ingredients) for food in self.foods]
+        self.ingredients = tuple(sorted({name for names in food_ingredients for name in names}))
+        self.ingredient_ids = {name: n for n, name in enumerate(self.ingredients)}
+        self.food_ingredients = Adjacency(
+            [self.ingredient_ids[name] for name in names] for names in food_ingredients
+        )
+        self.ingredient_foods = self.food_ingredients.transpose(len(self.ingredients))
+        self.memo = {}
+
+    def food_cards(self):
+        return [food.card() for food in self.foods]
+
+    def disease_records(self):
+        return [disease.record() for disease in self.diseases]
+
+    def food_slice(self, limit, after=None, offset=None):
+        """Foods in URI order after the `after` URI, or from `offset`"""
+        start = bisect.bisect_right(self.food_uris, after) if after else 0
+        if offset:
+            start += max(int(offset), 0)
+        return self.foods[start:start + int(limit)]
+
+    def food_page(self, limit, after=None, offset=None):
+        page = self.food_slice(limit, after, offset)
+        return {
+            "data": [food.card() for food in page],
+            "limit": limit,
+            "nextCursor": encode_cursor(page[-1].uri) if len(page) == limit else None
+        }
+
+    def distinct_page(self, limit, cursor='*'):
+        """A /api/foods/distinct page; `cursor` is '*' for the first page, like Solr's cursorMark"""
+        after = None if cursor == '*' else decode_cursor(cursor)
+        start = bisect.bisect_right(self.food_uris, after) if after else 0
+        entries = self.memo.get('entries')
+        if entries is None:
+            # Built once per catalog; each entry's categories are fixed for the dataset version
+            entries = self.memo['entries'] = tuple(food.entry() for food in self.foods)
+        page = entries[start:start + int(limit)]
+        more = start + len(page) < len(self.foods)
+        return {
+            "data": list(page),
+            "total": len(self.foods),
+            "nextCursor": encode_cursor(self.foods[start + len(page) - 1].uri) if page and more else None,
+            "date": "June 3, 2025"
+        }
+
+    def foods_of_disease(self, disease_id):
+        """Foods related to a disease, or None when there is no such disease"""
+        j = self.disease_ids.get(disease_id)
+        if j is None:
+            return None
+        disease = self.diseases[j]
+        return {
+            "disease": {"uri": disease.uri, "name": disease.name, "familyName": disease.familyName},
+            "data": [self.foods[i].card() for i in self.disease_foods[j]],
+            "total": len(self.disease_foods[j])
+        }
+
+    def diseases_of_food(self, food_id):
+        """Diseases a food is related to, or None when there is no such food"""
+        i = self.food_ids.get(food_id)
+        if i is None:
+            return None
+        food = self.foods[i]
+        return {
+            "food": {"uri": food.uri, "name": food.name},
+            "data": [self.diseases[j].record() for j in self.food_diseases[i]],
+            "total": len(self.food_diseases[i])
+        }
+
+    def foods_of_family(self, family_id):
+        """Foods related to any disease of a family, or None when there is no such family"""
+        k = self.family_ids.get(family_id)
+        if k is None:
+            return None
+        uri, name = self.families[k]
+        return {
+            "family": {
+                "uri": uri,
+                "name": name,
+                "diseases": [{"uri": self.diseases[j].uri, "name": self.diseases[j].name} for j in self.family_diseases[k]]
+            },
+            "data": [self.foods[i].card() for i in self.family_foods[k]],
+            "total": len(self.family_foods[k])
+        }
+
+    def search(self, text, limit):
+        """Case-insensitive substring match on name, ingredients and disease names, ordered by name"""
+        term = text.lower()
+
+        def matches(food):
+            return (term in food.name.lower() or term in food.text('ingredients').lower()
+                    or any(term in name.lower() for _, name in food.related))
+
+        found = sorted((food for food in self.foods if matches(food)), key=lambda food: food.name)
+        return [food.search_result() for food in found[:int(limit)]]
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "foods": len(self.foods),
+            "diseases": len(self.diseases),
+            "families": len(self.families),
+            "ingredients": len(self.ingredients),
+            "links": self.food_diseases.edges(),
+            **{name: derived.stats() for name, derived in list(self.memo.items()) if hasattr(derived, 'stats')},
+            "age": round(time.monotonic() - self.built_at, 3)
+        }
+
+
+class ViewStore:
+    """Holds the current Catalog and rebuilds it when the dataset changes.
+
+    `loader()` returns (food records, disease records). The catalog is rebuilt
+    when the version reported by `version_fn` changes, when it is older than
+    `ttl` seconds, or after `invalidate()`. Rebuilds are single-flight and
+    requests keep the catalog they started with.
+    """
+
+    def __init__(self, loader, version_fn=None, ttl=0):
+        self.loader = loader
+        self.version_fn = version_fn
+        self.ttl = ttl
+        self._catalog = None
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.build_seconds = None
+
+    def _is_fresh(self, catalog, version):
+        if catalog is None or catalog.version != version:
+            return False
+        return not self.ttl or time.monotonic() - catalog.built_at <= self.ttl
+
+    def _build(self, foods, diseases, version, start):
+        with metrics.span("views", "catalog") as span:
+            catalog = Catalog(foods.values(), diseases.values(), version)
+            span.rows = len(foods) + len(diseases)
+        self.builds += 1
+        self.build_seconds = round(time.perf_counter() - start, 3)
+        self._catalog = catalog
+        return catalog
+
+    def get(self):
+        version = self.version_fn() if self.version_fn else None
+        catalog = self._catalog
+        if self._is_fresh(catalog, version):
+            return catalog
+        with self._lock:
+            catalog = self._catalog
+            if self._is_fresh(catalog, version):
+                return catalog
+            start = time.perf_counter()
+            return self._build(*self.loader(), version, start)
+
+    def invalidate(self):
+        self._catalog = None
+
+    def stats(self):
+        catalog = self._catalog
+        return {
+            "builds": self.builds,
+            "build_seconds": self.build_seconds,
+            "catalog": catalog.stats() if catalog else None
+        }
+
+
+class AsyncViewStore(ViewStore):
+    """ViewStore for asyncio handlers: `loader` and `version_fn` are coroutine functions"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._async_lock = asyncio.Lock()
+
+    async def get(self):
+        version = await self.version_fn() if self.version_fn else None
+        catalog = self._catalog
+        if self._is_fresh(catalog, version):
+            return catalog
+        async with self._async_lock:
+            catalog = self._catalog
+            if self._is_fresh(catalog, version):
+                return catalog
+            start = time.perf_counter()
+            return self._build(*await self.loader(), version, start)
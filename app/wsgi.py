@@ -0,0 +1,10 @@
+"""WSGI entry point for gunicorn: `gunicorn -c gunicorn.conf.py wsgi:app`"""
+from app import app, warm_caches
+from settings import PRELOAD_CACHES
+
+__all__ = ["app"]
+
+if PRELOAD_CACHES:
+    # With preload_app the snapshots are built once in the master and shared
+    # copy-on-write by every worker
+    warm_caches()
@@ -0,0 +1,129 @@
+"""Measure JSON encode time and bytes on the wire per API endpoint.
+
+Offline (default), the payloads of /api/foods, /api/diseases,
+/api/foods/distinct and /api/foods/facets are built from the repository's
+RDF files, with every food and disease copied --copies times under new URIs
+to get production-sized bodies. Each payload is encoded with:
+- json as Flask's default jsonify does (sorted keys, ASCII escapes)
+- json as the snapshot cache used to (ensure_ascii=False)
+- encoding.dumps (orjson when installed)
+Each body is then compressed with gzip and brotli:
+- at the per-request levels, used for dynamic responses
+- at the snapshot levels, paid once per dataset version
+
+With --url the same endpoints of a running API are fetched with each
+Accept-Encoding and the raw (still compressed) body sizes are reported.
+
+    python benchmarks/bench_encoding.py [--copies 40]
+    python benchmarks/bench_encoding.py --url http://localhost:5000
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT_DIR, "app"))
+from werkzeug.datastructures import MultiDict
+
+import encoding
+import facets
+import local_graph
+from settings import BROTLI_QUALITY, GZIP_LEVEL, SNAPSHOT_BROTLI_QUALITY, SNAPSHOT_GZIP_LEVEL
+from views import Catalog
+
+DEFAULT_FILES = [os.path.join(ROOT_DIR, "rdf_triple", "food_disease.ttl"),
+                 os.path.join(ROOT_DIR, "rdf_triple", "food_disease_data.ttl")]
+ENDPOINTS = ["/api/foods", "/api/diseases", "/api/foods/distinct?limit=500", "/api/foods/facets?limit=100"]
+
+
+def copied(records, copies):
+    """`copies` copies of every record, each under its own URI"""
+    return [dict(record, uri=f"{record['uri']}_{n}") for n in range(copies) for record in records]
+
+
+def payloads(copies):
+    graph = local_graph.LocalGraph(lambda: local_graph.read_files(DEFAULT_FILES))
+    foods = copied(list(graph.fetch_foods().values()), copies)
+    diseases = copied(list(graph.fetch_diseases().values()), copies)
+    catalog = Catalog(foods, diseases)
+    return catalog, {
+        "/api/foods": catalog.food_cards(),
+        "/api/diseases": catalog.disease_records(),
+        "/api/foods/distinct?limit=500": catalog.distinct_page(500),
+        "/api/foods/facets?limit=100": facets.for_catalog(catalog).search(MultiDict(), 100)
+    }
+
+
+def best_of(fn, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def run_offline(args):
+    catalog, bodies = payloads(args.copies)
+    print(f"{len(catalog.foods)} foods, {len(catalog.diseases)} diseases; "
+          f"encoder: {'orjson' if encoding.orjson else 'json'}, codings: {', '.join(encoding.CODINGS)}\n")
+    encoders = {
+        "jsonify(json)": lambda obj: json.dumps(obj, sort_keys=True, separators=(",", ":")).encode("utf-8"),
+        "snapshot(json)": lambda obj: json.dumps(obj, ensure_ascii=False).encode("utf-8"),
+        "encoding.dumps": encoding.dumps,
+    }
+    print(f"{'endpoint':32} " + " ".join(f"{name + ' ms':>18}" for name in encoders) + f" {'bytes':>10}")
+    encoded = {}
+    for path, obj in bodies.items():
+        times = []
+        for name, encoder in encoders.items():
+            elapsed, body = best_of(lambda: encoder(obj), args.repeat)
+            times.append(elapsed)
+            encoded[path] = body
+        print(f"{path:32} " + " ".join(f"{t:>18.2f}" for t in times) + f" {len(encoded[path]):>10}")
+
+    codecs = [(f"gzip-{GZIP_LEVEL}", lambda b: gzip.compress(b, compresslevel=GZIP_LEVEL, mtime=0)),
+              (f"gzip-{SNAPSHOT_GZIP_LEVEL}", lambda b: gzip.compress(b, compresslevel=SNAPSHOT_GZIP_LEVEL, mtime=0))]
+    if encoding.brotli is not None:
+        codecs += [(f"br-{BROTLI_QUALITY}", lambda b: encoding.brotli.compress(b, quality=BROTLI_QUALITY)),
+                   (f"br-{SNAPSHOT_BROTLI_QUALITY}", lambda b: encoding.brotli.compress(b, quality=SNAPSHOT_BROTLI_QUALITY))]
+    print(f"\n{'endpoint':32} {'identity':>10} " + " ".join(f"{name + ' bytes/ms':>20}" for name, _ in codecs))
+    for path, body in encoded.items():
+        cells = []
+        for _, codec in codecs:
+            elapsed, compressed = best_of(lambda: codec(body), max(1, args.repeat // 2))
+            cells.append(f"{len(compressed):>11} /{elapsed:>7.1f}")
+        print(f"{path:32} {len(body):>10} " + " ".join(f"{cell:>20}" for cell in cells))
+
+
+def run_live(args):
+    import requests
+
+    session = requests.Session()
+    print(f"\n{'endpoint':32} " + " ".join(f"{coding:>10}" for coding in ("identity", "gzip", "br")) + f" {'ms (br)':>9}")
+    for path in ENDPOINTS:
+        sizes = []
+        for coding in ("identity", "gzip", "br"):
+            start = time.perf_counter()
+            response = session.get(args.url.rstrip("/") + path, headers={"Accept-Encoding": coding}, stream=True)
+            body = response.raw.read(decode_content=False)
+            elapsed = (time.perf_counter() - start) * 1000
+            served = response.headers.get("Content-Encoding", "identity")
+            sizes.append(f"{len(body)}{'' if served == coding else '*'}")
+        print(f"{path:32} " + " ".join(f"{size:>10}" for size in sizes) + f" {elapsed:>9.1f}")
+    print("(* the server answered with a different coding)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--copies", type=int, default=40, help="copies of every food and disease")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--url", help="base URL of a running API to measure on the wire")
+    args = parser.parse_args()
+    if args.url:
+        run_live(args)
+    else:
+        run_offline(args)
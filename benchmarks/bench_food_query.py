@@ -0,0 +1,141 @@
+"""Compare the OPTIONAL-join food query with the per-relation query strategy.
+
+Offline mode (default) synthesizes the SPARQL JSON bindings each strategy
+returns for a catalogue of foods with a growing number of images and measures
+row counts and grouping time. With --endpoint both strategies are also run
+against a live Fuseki and the wall-clock latency includes the round trips.
+
+    python benchmarks/bench_food_query.py
+    python benchmarks/bench_food_query.py --endpoint http://localhost:3030/food_disease_kg/sparql
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+import kg_queries
+
+EX = kg_queries.EX
+
+CARTESIAN_QUERY = kg_queries.PREFIX + """
+SELECT ?food ?foodName ?imageUrl ?ingredients ?recipe ?calories ?eatingTime ?foodLocationArea ?isRawOrCooked ?disease ?diseaseName
+WHERE {
+    ?food a ex:Food ;
+          ex:foodName ?foodName .
+    OPTIONAL { ?imageObj ex:isImageOf ?food ; ex:imageUrl ?imageUrl . }
+    OPTIONAL { ?food ex:ingredients ?ingredients . }
+    OPTIONAL { ?food ex:recipe ?recipe . }
+    OPTIONAL { ?food ex:calorieIntake ?calories . }
+    OPTIONAL { ?food ex:eatingTime ?eatingTime . }
+    OPTIONAL { ?food ex:foodLocationArea ?foodLocationArea . }
+    OPTIONAL { ?food ex:isRawOrCooked ?isRawOrCooked . }
+    OPTIONAL { ?food ex:isRelatedTo ?disease . ?disease ex:diseaseName ?diseaseName . }
+}
+"""
+
+
+def lit(v):
+    return {'type': 'literal', 'value': str(v)}
+
+
+def uri(v):
+    return {'type': 'uri', 'value': v}
+
+
+def synthesize(foods, images, diseases):
+    """Build the bindings both strategies would return for a synthetic catalogue"""
+    cartesian, props, image_rows, disease_rows = [], [], [], []
+    for f in range(foods):
+        food = uri(f"{EX}food_{f}")
+        base = {
+            'food': food, 'foodName': lit(f"food {f}"), 'ingredients': lit("flour, sugar, egg"),
+            'recipe': lit("mix and bake " * 10), 'calories': lit(300 + f), 'eatingTime': lit("Snack"),
+            'foodLocationArea': lit("Global"), 'isRawOrCooked': lit("Cooked")
+        }
+        props.append(base)
+        image_urls = [lit(f"http://localhost:5000/images/food_{f}/{i}.jpg") for i in range(images)]
+        disease_pairs = [(uri(f"{EX}disease_{d}"), lit(f"disease {d}")) for d in range(diseases)]
+        image_rows.extend({'food': food, 'imageUrl': u} for u in image_urls)
+        disease_rows.extend({'food': food, 'disease': d, 'diseaseName': n} for d, n in disease_pairs)
+        for u in image_urls or [None]:
+            for d, n in disease_pairs or [(None, None)]:
+                row = dict(base)
+                if u:
+                    row['imageUrl'] = u
+                if d:
+                    row['disease'], row['diseaseName'] = d, n
+                cartesian.append(row)
+    return cartesian, (props, image_rows, disease_rows)
+
+
+def group_cartesian(bindings):
+    """The previous complete grouping loop (index_data): list membership scans"""
+    food_data = {}
+    for b in bindings:
+        food_uri = b['food']['value']
+        if food_uri not in food_data:
+            food_data[food_uri] = {'images': [], 'diseases': [], 'diseaseNames': []}
+            for field in kg_queries.FOOD_TEXT_FIELDS:
+                food_data[food_uri][field] = b.get(field, {}).get('value', '')
+        if 'imageUrl' in b and b['imageUrl']['value'] not in food_data[food_uri]['images']:
+            food_data[food_uri]['images'].append(b['imageUrl']['value'])
+        if 'disease' in b and b['disease']['value'] not in food_data[food_uri]['diseases']:
+            food_data[food_uri]['diseases'].append(b['disease']['value'])
+        if 'diseaseName' in b and b['diseaseName']['value'] not in food_data[food_uri]['diseaseNames']:
+            food_data[food_uri]['diseaseNames'].append(b['diseaseName']['value'])
+    return food_data
+
+
+def best_of(fn, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run_offline(args):
+    print(f"{'images':>7} {'rows(old)':>10} {'rows(new)':>10} {'group old ms':>13} {'group new ms':>13}")
+    for images in args.images:
+        cartesian, relations = synthesize(args.foods, images, args.diseases)
+        old_t, _ = best_of(lambda: group_cartesian(cartesian), args.repeat)
+        new_t, grouped = best_of(lambda: kg_queries.group_foods(*relations), args.repeat)
+        assert all(len(f['images']) == images for f in grouped.values())
+        print(f"{images:>7} {len(cartesian):>10} {sum(map(len, relations)):>10} {old_t * 1000:>13.2f} {new_t * 1000:>13.2f}")
+
+
+def run_live(args):
+    from backends import SparqlClient
+
+    select = SparqlClient(args.endpoint).select
+    rows = {}
+
+    def old():
+        bindings = select(CARTESIAN_QUERY)
+        rows['old'] = len(bindings)
+        return group_cartesian(bindings)
+
+    def new():
+        relations = [select(q) for q in (kg_queries.FOOD_PROPERTIES_QUERY, kg_queries.FOOD_IMAGES_QUERY, kg_queries.FOOD_DISEASES_QUERY)]
+        rows['new'] = sum(map(len, relations))
+        return kg_queries.group_foods(*relations)
+
+    old_t, _ = best_of(old, args.repeat)
+    new_t, _ = best_of(new, args.repeat)
+    print(f"live: rows {rows['old']} -> {rows['new']}, latency {old_t * 1000:.1f} ms -> {new_t * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--foods", type=int, default=50)
+    parser.add_argument("--diseases", type=int, default=3, help="related diseases per food")
+    parser.add_argument("--images", type=int, nargs="+", default=[1, 5, 10, 25, 50, 100], help="images per food")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--endpoint", help="Fuseki SPARQL endpoint for a live comparison")
+    args = parser.parse_args()
+    run_offline(args)
+    if args.endpoint:
+        run_live(args)
@@ -0,0 +1,152 @@
+"""Compare the generator's output paths on a synthetic dataset.
+
+Builds `--triples` triples shaped like the generated food data (foods with
+properties, disease links and images) and writes them with:
+
+  rdflib-turtle    every triple in one rdflib Graph, then serialize(format="turtle") (the original path)
+  stream-nt        NTriplesWriter, one line per triple as it is produced
+  stream-nt-gz     the same, gzip-compressed
+  stream-nt-sorted stream-nt followed by the external merge sort (canonical output)
+
+Each case runs in a fresh process and reports wall time, triples/sec, peak
+RSS and output size. rdflib is skipped when it isn't installed.
+
+    python benchmarks/bench_rdf_writer.py --triples 1000000 --output bench_output.txt
+"""
+import argparse
+import importlib.util
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "rdf_triple", "script"))
+import generate_food_disease_data as gen
+from ntriples_writer import NTriplesWriter, sort_ntriples
+
+TRIPLES_PER_FOOD = 5 + 3 + 4 * 10  # properties, disease links, 10 images
+
+
+def synthetic_triples(count):
+    """Yield `count` N-Triples lines for synthetic foods"""
+    produced, n = 0, 0
+    while True:
+        food = gen.iri(f"food_{n}")
+        lines = [
+            gen.rdf_type(food, "Food"),
+            gen.triple(food, gen.iri("foodName"), gen.literal(f"Food {n}")),
+            gen.triple(food, gen.iri("ingredients"), gen.literal(f"flour, sugar, ingredient {n}")),
+            gen.triple(food, gen.iri("recipe"), gen.literal("Mix everything.\nBake for 30 minutes.")),
+            gen.triple(food, gen.iri("calorieIntake"), gen.literal(100 + n % 500, "integer")),
+        ]
+        lines += [gen.triple(food, gen.iri("isRelatedTo"), gen.iri(f"disease_{(n + k) % 97}")) for k in range(3)]
+        for i in range(10):
+            image = gen.iri(f"image_{n}_{i}")
+            lines += [
+                gen.rdf_type(image, "FoodImage"),
+                gen.triple(image, gen.iri("isImageOf"), food),
+                gen.triple(image, gen.iri("imageUrl"), gen.literal(f"http://localhost:5000/images/food_{n}/{i}.jpg")),
+                gen.triple(image, gen.iri("fileName"), gen.literal(f"{i}.jpg")),
+            ]
+        for line in lines:
+            if produced == count:
+                return
+            yield line
+            produced += 1
+        n += 1
+
+
+def rdflib_turtle(count, path):
+    from rdflib import Graph, Namespace
+    g = Graph()
+    g.bind("ex", Namespace(gen.BASE))
+    # Parse each food's lines like the original script adds its triples: one in-memory store for everything
+    batch = []
+    for line in synthetic_triples(count):
+        batch.append(line)
+        if len(batch) == TRIPLES_PER_FOOD:
+            g.parse(data="\n".join(batch), format="nt")
+            batch = []
+    if batch:
+        g.parse(data="\n".join(batch), format="nt")
+    g.serialize(destination=path, format="turtle")
+    return path
+
+
+def stream_nt(count, path):
+    with NTriplesWriter(path) as writer:
+        writer.write_all(synthetic_triples(count))
+    return path
+
+
+def stream_nt_gz(count, path):
+    return stream_nt(count, path + ".gz")
+
+
+def stream_nt_sorted(count, path):
+    stream_nt(count, path + ".unsorted")
+    sort_ntriples(path + ".unsorted", path)
+    os.remove(path + ".unsorted")
+    return path
+
+
+CASES = {
+    "rdflib-turtle": rdflib_turtle,
+    "stream-nt": stream_nt,
+    "stream-nt-gz": stream_nt_gz,
+    "stream-nt-sorted": stream_nt_sorted,
+}
+
+
+def _child(name, count, path, queue):
+    start = time.perf_counter()
+    written = CASES[name](count, path)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is in KiB on Linux
+    queue.put({
+        "case": name,
+        "seconds": round(elapsed, 3),
+        "triples_per_s": round(count / elapsed) if elapsed else 0,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "output_mb": round(os.path.getsize(written) / 2**20, 1),
+    })
+
+
+def run_case(name, count, tmp_dir):
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_child, args=(name, count, os.path.join(tmp_dir, name + ".out"), queue))
+    process.start()
+    process.join()
+    if process.exitcode != 0:
+        return {"case": name, "error": f"exit code {process.exitcode}"}
+    return queue.get()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--triples", type=int, default=1_000_000)
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--output", help="append the results as a JSON line to this file")
+    args = parser.parse_args()
+
+    cases = list(args.cases)
+    # Checked without importing rdflib, which every forked case would inherit
+    if importlib.util.find_spec("rdflib") is None and "rdflib-turtle" in cases:
+        print("rdflib is not installed, skipping rdflib-turtle")
+        cases.remove("rdflib-turtle")
+
+    # Fork so each case starts from the same small parent and reports its own peak
+    multiprocessing.set_start_method("fork")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        results = []
+        for name in cases:
+            result = run_case(name, args.triples, tmp_dir)
+            print(json.dumps(result))
+            results.append(result)
+
+    if args.output:
+        with open(args.output, "a") as f:
+            f.write(json.dumps({"benchmark": "rdf_writer", "triples": args.triples, "results": results}) + "\n")
@@ -0,0 +1,477 @@
+"""Measure the API's query shapes on synthetic graphs of growing size.
+
+For each `--scales` entry (foods plus diseases, 10^3 to 10^6) a graph is
+generated with synthetic_kg.py, cached in --work-dir, and measured in a
+fresh process, so memory figures belong to that scale alone:
+
+- load: time and memory to load the graph into the in-memory stand-in for
+  Fuseki (local_graph.LocalGraph) and to build the materialized views
+- graph: the knowledge-graph reads behind the API (all foods, all diseases,
+  first, keyset and offset pages, text search, data version) through the
+  app's graph backend: the local stand-in, or a live Fuseki with --endpoint
+- query_txt: the queries of query.txt, on a SPARQL engine only. That is the
+  live Fuseki, or rdflib offline for scales up to --rdflib-max (rdflib is
+  slow), which also runs the graph reads with the real kg_queries SPARQL
+- api: the Flask routes through the test client, including query.txt's
+  filters as the routes that answer them. Solr-backed search falls back to
+  the views unless --solr points at a Solr holding the same data
+
+Each shape is called once cold, then up to --repeat times within --budget
+seconds. It reports latency percentiles (ms), throughput (calls/s of the
+timed loop), rows or bytes, and status. Each scale also records the RSS and
+peak RSS of its process and the per-span totals of app/metrics.py. Results
+are written to --output as one JSON document with sorted keys, so two runs
+diff cleanly. --baseline compares the p50 of every shape with an earlier
+results file and exits non-zero when one got slower than --tolerance
+(and by at least --min-ms).
+
+    python benchmarks/bench_scale.py --scales 1000 10000 --output bench_scale.json
+    python benchmarks/bench_scale.py --scales 1000 10000 --baseline bench_scale.json
+
+Against a live stack, use a dataset of its own. --load replaces its default
+graph with the synthetic one and, with --solr, reindexes both collections
+with data_indexation.py --full:
+
+    python benchmarks/bench_scale.py --scales 100000 --load \\
+        --endpoint http://localhost:3030/food_disease_kg/sparql --data-url http://localhost:3030/food_disease_kg/data \\
+        --solr http://localhost:8983/solr
+"""
+import argparse
+import datetime
+import gzip
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import traceback
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.join(BENCH_DIR, "..")
+APP_DIR = os.path.join(ROOT_DIR, "app")
+sys.path.insert(0, APP_DIR)
+from load_test import percentile
+import synthetic_kg
+
+# A closed port: without --solr, Solr calls fail at once and search falls back to the views
+NO_SOLR = "http://127.0.0.1:9/solr"
+LOAD_CHUNK_LINES = 50_000
+
+# query.txt, with the prefix declared in every query
+QUERY_TXT = {
+    "1_name_contains": """PREFIX ex: <{ex}>
+SELECT ?food ?foodName WHERE {{
+  ?food a ex:Food ;
+        ex:foodName ?foodName .
+  FILTER (CONTAINS(LCASE(?foodName), "cerelac"))
+}} LIMIT 5""",
+    "2_calories_over": """PREFIX ex: <{ex}>
+SELECT ?food ?calories
+WHERE {{
+  ?food a ex:Food ;
+        ex:calorieIntake ?calories .
+  FILTER(?calories > 280)
+}}
+ORDER BY DESC(?calories)""",
+    "3_location": """PREFIX ex: <{ex}>
+SELECT ?food ?location
+WHERE {{
+  ?food a ex:Food ;
+        ex:foodLocationArea ?location .
+  FILTER(str(?location) = "Egypt")
+}}""",
+    "4_food_optional_join": """PREFIX ex: <{ex}>
+SELECT ?food ?foodName ?imageUrl ?ingredients ?recipe ?calories ?eatingTime ?foodLocationArea ?isRawOrCooked ?disease ?diseaseName
+WHERE {{
+    ?food a ex:Food ;
+          ex:foodName ?foodName .
+    OPTIONAL {{ ?imageObj ex:isImageOf ?food ; ex:imageUrl ?imageUrl . }}
+    OPTIONAL {{ ?food ex:ingredients ?ingredients . }}
+    OPTIONAL {{ ?food ex:recipe ?recipe . }}
+    OPTIONAL {{ ?food ex:calorieIntake ?calories . }}
+    OPTIONAL {{ ?food ex:eatingTime ?eatingTime . }}
+    OPTIONAL {{ ?food ex:foodLocationArea ?foodLocationArea . }}
+    OPTIONAL {{ ?food ex:isRawOrCooked ?isRawOrCooked . }}
+    OPTIONAL {{ ?food ex:isRelatedTo ?disease . ?disease ex:diseaseName ?diseaseName . }}
+}}""",
+    "5_disease_optional_join": """PREFIX ex: <{ex}>
+SELECT ?disease ?name ?symptoms ?sex ?subjectKind ?family ?familyName ?doc ?docUrl ?treatment ?treatmentUrl
+WHERE {{
+    ?disease a ex:Disease ;
+             ex:diseaseName ?name ;
+             ex:symptoms ?symptoms ;
+             ex:sex ?sex ;
+             ex:mostCommonSubjectKind ?subjectKind ;
+             ex:belongTo ?family .
+    ?family ex:diseaseFamilyName ?familyName .
+    OPTIONAL {{ ?disease ex:isDocumentedBy ?doc . ?doc ex:documentUrl ?docUrl . }}
+    OPTIONAL {{ ?disease ex:hasTreatmentProtocol ?treatment . ?treatment ex:documentUrl ?treatmentUrl . }}
+}}""",
+}
+
+
+def graph_shapes(foods):
+    """{name: call(graph)} of the reads the API makes through its graph backend"""
+    middle = f"{synthetic_kg.gen.BASE}food_{foods // 2:07d}"
+    return {
+        "data_version": lambda graph: graph.data_version(),
+        "fetch_foods": lambda graph: graph.fetch_foods(),
+        "fetch_diseases": lambda graph: graph.fetch_diseases(),
+        "food_page_first": lambda graph: graph.fetch_food_page(50),
+        "food_page_keyset": lambda graph: graph.fetch_food_page(50, after=middle),
+        "food_page_offset": lambda graph: graph.fetch_food_page(50, offset=foods // 2),
+        "search_foods": lambda graph: graph.search_foods("cerelac", 20),
+    }
+
+
+def api_paths(foods, solr):
+    """{name: path} of the API routes to measure; query.txt's filters map onto search and facets"""
+    paths = {
+        "foods": "/api/foods",
+        "foods_ndjson": "/api/foods?format=ndjson",
+        "foods_page_first": "/api/foods?limit=50",
+        "foods_page_offset": f"/api/foods?limit=50&offset={foods // 2}",
+        "foods_distinct": "/api/foods/distinct?limit=10",
+        "diseases": "/api/diseases",
+        "food_diseases": f"/api/foods/food_{foods // 2:07d}/diseases",
+        "disease_foods": "/api/diseases/disease_000000/foods",
+        "family_foods": "/api/families/family_00000/foods",
+        "facets": "/api/foods/facets?limit=20",
+        "ingredients": "/api/ingredients",
+        "ingredient_foods": "/api/ingredients/foods?all=sugar&not=eggs",
+        "traverse_depth2": f"/api/traverse/food/food_{foods // 2:07d}?depth=2",
+        "traverse_path": "/api/traverse/disease/disease_000000?path=family,disease,food",
+        "query_txt_1_name_contains": "/api/search/foods?q=cerelac",
+        "query_txt_2_calories_over": "/api/foods/facets?minCalories=281&limit=20",
+        "query_txt_3_location": "/api/foods/facets?foodLocationArea=Egypt&limit=20",
+    }
+    if solr:
+        paths.update({
+            "search_diseases": "/api/search/diseases?q=cancer&facets=1",
+            "disease_facets": "/api/diseases/facets",
+        })
+    return paths
+
+
+def rss_mb():
+    """Current resident set size in MB (Linux), or None"""
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+def ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+def measure(call, repeat, budget):
+    """(result of the cold call, latency stats): one cold call, then up to `repeat` timed ones within `budget` s"""
+    start = time.perf_counter()
+    result = call()
+    cold = time.perf_counter() - start
+    samples = []
+    deadline = time.perf_counter() + budget
+    while len(samples) < repeat and (not samples or time.perf_counter() < deadline):
+        start = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - start)
+    ordered = sorted(samples)
+    return result, {
+        "cold_ms": ms(cold),
+        "calls": len(samples),
+        "p50_ms": ms(percentile(ordered, 50)),
+        "p90_ms": ms(percentile(ordered, 90)),
+        "p99_ms": ms(percentile(ordered, 99)),
+        "max_ms": ms(ordered[-1]),
+        "mean_ms": ms(sum(samples) / len(samples)),
+        "per_s": round(len(samples) / sum(samples), 1) if sum(samples) else None,
+    }
+
+
+def timed_block(fn):
+    """(result, {"seconds", "rss_delta_mb"}) of one call"""
+    before, start = rss_mb(), time.perf_counter()
+    result = fn()
+    stats = {"seconds": round(time.perf_counter() - start, 3)}
+    after = rss_mb()
+    if before is not None and after is not None:
+        stats["rss_delta_mb"] = round(after - before, 1)
+    return result, stats
+
+
+def run_graph_shapes(graph, foods, repeat, budget):
+    results = {}
+    for name, call in graph_shapes(foods).items():
+        result, stats = measure(lambda: call(graph), repeat, budget)
+        stats["rows"] = len(result) if isinstance(result, (list, dict)) else int(result is not None)
+        results[name] = stats
+    return results
+
+
+def run_query_txt(select, repeat, budget):
+    from kg_queries import EX
+    results = {}
+    for name, query in QUERY_TXT.items():
+        rows, stats = measure(lambda: select(query.format(ex=EX)), repeat, budget)
+        stats["rows"] = len(rows)
+        results[name] = stats
+    return results
+
+
+def run_api(client, paths, repeat, budget):
+    results = {}
+    for name, path in paths.items():
+        def call():
+            response = client.get(path)
+            body = response.get_data()  # Reads streamed bodies to the end
+            return response.status_code, len(body)
+        (status, size), stats = measure(call, repeat, budget)
+        stats.update({"path": path, "status": status, "bytes": size})
+        results[name] = stats
+    return results
+
+
+def measure_scale(job, queue):
+    """Child process: measure one generated graph and put the results on `queue`"""
+    try:
+        os.environ.update(job["env"])
+        import app as api
+        import local_graph
+        import metrics
+        from kg_queries import SparqlGraph
+        # Solr fallbacks are expected without --solr; failures show up as statuses instead
+        api.app.logger.setLevel(logging.ERROR)
+
+        result = {"memory": {"start_rss_mb": rss_mb()}}
+        foods, repeat, budget = job["foods"], job["repeat"], job["budget"]
+        if isinstance(api.graph, local_graph.LocalGraph):
+            _, result["load"] = timed_block(api.graph.index)
+            result["load"]["triples"] = api.graph.stats()["triples"]
+        _, result["views"] = timed_block(api.views.get)
+        result["graph"] = run_graph_shapes(api.graph, foods, repeat, budget)
+        if job["endpoint"]:
+            result["query_txt"] = run_query_txt(api.fuseki.select, repeat, budget)
+        result["api"] = run_api(api.app.test_client(), api_paths(foods, job["solr"]), repeat, budget)
+        result["memory"].update({"rss_mb": rss_mb(), "peak_rss_mb": peak_rss_mb()})
+        result["spans"] = [
+            {"span": name, "op": op, "calls": calls, "seconds": round(seconds, 3), "rows": rows, "bytes": size}
+            for name, op, calls, seconds, rows, size in metrics.summary()
+        ]
+
+        if job["rdflib"]:
+            # Last, so rdflib's memory doesn't count in the figures above
+            from compare_graph_backends import rdflib_select
+            select, result["rdflib"] = timed_block(lambda: rdflib_select([job["path"]]))
+            result["rdflib"]["graph"] = run_graph_shapes(SparqlGraph(select), foods, repeat, budget)
+            result["rdflib"]["query_txt"] = run_query_txt(select, repeat, budget)
+        queue.put(result)
+    except Exception:
+        queue.put({"error": traceback.format_exc()})
+
+
+def dataset(work_dir, scale, args):
+    """Generate the graph for `scale` unless it is already in `work_dir`; returns its description"""
+    path = os.path.join(work_dir, f"synthetic-{scale}-s{args.seed}-d{args.disease_ratio}-i{args.images}.nt"
+                        + (".gz" if args.gzip else ""))
+    described = path + ".json"
+    if os.path.exists(path) and os.path.exists(described):
+        with open(described) as f:
+            return json.load(f)
+    print(f"Generating {scale} entities into {path}")
+    info = synthetic_kg.write(path, scale, args.seed, args.disease_ratio, args.images)
+    with open(described, "w") as f:
+        json.dump(info, f)
+    return info
+
+
+def load_fuseki(path, data_url):
+    """Replace the default graph behind `data_url` with the file's triples; returns load stats"""
+    from backends import BackendClient
+    store = BackendClient("fuseki-load", read_timeout=600)
+    opener = gzip.open if path.endswith(".gz") else open
+    start, triples, method = time.perf_counter(), 0, "PUT"
+    with opener(path, "rt", encoding="utf-8") as f:
+        while True:
+            lines = [line for _, line in zip(range(LOAD_CHUNK_LINES), f)]
+            if not lines and method == "POST":
+                break
+            # The first chunk replaces the graph, the rest are appended
+            response = store.request(method, data_url, params={"default": ""}, data="".join(lines).encode("utf-8"),
+                                     headers={"Content-Type": "application/n-triples"})
+            if response.status_code not in (200, 201, 204):
+                raise RuntimeError(f"Graph Store {method} failed: {response.status_code} - {response.text[:200]}")
+            triples += len(lines)
+            method = "POST"
+    seconds = time.perf_counter() - start
+    return {"seconds": round(seconds, 3), "triples": triples, "triples_per_s": round(triples / seconds) if seconds else None}
+
+
+def index_solr(endpoint, solr, work_dir):
+    """Rebuild both Solr collections from `endpoint` with data_indexation.py --full"""
+    base = solr.rstrip("/")
+    env = dict(os.environ, SPARQL_URL=endpoint, INDEX_MANIFEST=os.path.join(work_dir, ".index_manifest.json"),
+               FOOD_SOLR_URL=f"{base}/food_collection/update", DISEASE_SOLR_URL=f"{base}/disease_collection/update",
+               FOOD_SOLR_SELECT=f"{base}/food_collection/select", DISEASE_SOLR_SELECT=f"{base}/disease_collection/select")
+    start = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(ROOT_DIR, "data_indexation.py"), "--full"], env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+    return {"seconds": round(time.perf_counter() - start, 3)}
+
+
+def run_scale(scale, args):
+    info = dataset(args.work_dir, scale, args)
+    result = {"dataset": {key: value for key, value in info.items() if key != "path"}}
+    if args.load:
+        print(f"Loading {info['triples']} triples into {args.data_url}")
+        result["fuseki_load"] = load_fuseki(info["path"], args.data_url)
+        if args.solr:
+            print("Reindexing Solr")
+            result["solr_index"] = index_solr(args.endpoint, args.solr, args.work_dir)
+
+    solr = (args.solr or NO_SOLR).rstrip("/")
+    job = {
+        "path": info["path"], "foods": info["foods"], "repeat": args.repeat, "budget": args.budget,
+        "endpoint": args.endpoint, "solr": args.solr, "rdflib": not args.endpoint and scale <= args.rdflib_max,
+        "env": {
+            "GRAPH_BACKEND": "sparql" if args.endpoint else "local",
+            "GRAPH_SOURCE": info["path"],
+            "SPARQL_URL": args.endpoint or "http://127.0.0.1:9/sparql",
+            "FOOD_SOLR_SELECT": f"{solr}/food_collection/select",
+            "DISEASE_SOLR_SELECT": f"{solr}/disease_collection/select",
+            # No expiry or retries mid-run, and no slow-query log for every large query
+            "CACHE_TTL": "0", "BACKEND_RETRIES": "0", "SLOW_QUERY_MS": "0",
+        },
+    }
+    print(f"Measuring {scale} entities ({info['foods']} foods, {info['diseases']} diseases, {info['triples']} triples)")
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    child = context.Process(target=measure_scale, args=(job, queue))
+    child.start()
+    measured = queue.get()
+    child.join()
+    if "error" in measured:
+        print(measured["error"], file=sys.stderr)
+    result.update(measured)
+    return result
+
+
+def print_scale(scale, result):
+    if "error" in result:
+        print(f"  {scale}: failed")
+        return
+    load = result.get("load", {})
+    print(f"  load {load.get('seconds', '-')} s, views {result['views']['seconds']} s, "
+          f"RSS {result['memory']['rss_mb']} MB (peak {result['memory']['peak_rss_mb']} MB)")
+    sections = [("graph", result["graph"]), ("query_txt", result.get("query_txt", {})), ("api", result["api"])]
+    if "rdflib" in result:
+        sections += [("rdflib", result["rdflib"]["graph"]), ("rdflib q", result["rdflib"]["query_txt"])]
+    print(f"  {'':10} {'shape':28} {'cold ms':>10} {'p50 ms':>10} {'p99 ms':>10} {'calls/s':>9} {'rows/bytes':>11}")
+    for section, shapes in sections:
+        for name, stats in shapes.items():
+            size = stats.get("rows", stats.get("bytes"))
+            print(f"  {section:10} {name:28} {stats['cold_ms']:>10} {stats['p50_ms']:>10} {stats['p99_ms']:>10} "
+                  f"{stats['per_s'] or '-':>9} {size:>11}")
+
+
+def p50s(results):
+    """{(scale, section, shape): p50 ms} of a results document"""
+    out = {}
+    for scale, result in results.get("scales", {}).items():
+        sections = {"graph": result.get("graph", {}), "query_txt": result.get("query_txt", {}), "api": result.get("api", {})}
+        if "rdflib" in result:
+            sections.update({"rdflib.graph": result["rdflib"]["graph"], "rdflib.query_txt": result["rdflib"]["query_txt"]})
+        for section, shapes in sections.items():
+            for name, stats in shapes.items():
+                out[(scale, section, name)] = stats["p50_ms"]
+    return out
+
+
+def compare(baseline, current, tolerance, min_ms):
+    """Print the p50 change of every shape measured in both runs; returns how many got slower than
+    `tolerance` and by at least `min_ms`, so sub-millisecond jitter is not reported"""
+    before, after = p50s(baseline), p50s(current)
+    slower = 0
+    print(f"\n{'scale':>8} {'section':18} {'shape':28} {'base ms':>10} {'now ms':>10} {'ratio':>7}")
+    for key in sorted(before.keys() & after.keys(), key=lambda k: (int(k[0]), k[1], k[2])):
+        ratio = after[key] / before[key] if before[key] else 1.0
+        flag = ""
+        if ratio > 1 + tolerance and after[key] - before[key] >= min_ms:
+            slower += 1
+            flag = "  slower"
+        print(f"{key[0]:>8} {key[1]:18} {key[2]:28} {before[key]:>10} {after[key]:>10} {ratio:>7.2f}{flag}")
+    return slower
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1_000, 10_000], help="foods plus diseases per graph")
+    parser.add_argument("--repeat", type=int, default=20, help="timed calls per shape after the cold one")
+    parser.add_argument("--budget", type=float, default=10, help="seconds of timed calls per shape, at least one")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--disease-ratio", type=float, default=0.1)
+    parser.add_argument("--images", type=int, default=4, help="mean images per food")
+    parser.add_argument("--gzip", action="store_true", help="keep the generated graphs gzip-compressed")
+    parser.add_argument("--work-dir", default=os.path.join(BENCH_DIR, ".synthetic"), help="cache of generated graphs")
+    parser.add_argument("--rdflib-max", type=int, default=1_000, help="largest scale run through rdflib's SPARQL engine")
+    parser.add_argument("--endpoint", help="SPARQL endpoint of a live Fuseki to use instead of the local stand-in")
+    parser.add_argument("--data-url", help="Graph Store endpoint of the same dataset, for --load")
+    parser.add_argument("--load", action="store_true", help="replace the live dataset with each synthetic graph first")
+    parser.add_argument("--solr", help="Solr base URL, e.g. http://localhost:8983/solr; with --load it is reindexed")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="earlier results file to compare p50 latencies with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="p50 increase reported as slower, e.g. 0.2 = 20%%")
+    parser.add_argument("--min-ms", type=float, default=1.0, help="smallest p50 increase reported as slower")
+    args = parser.parse_args()
+    if args.load and not (args.endpoint and args.data_url):
+        parser.error("--load needs --endpoint and --data-url")
+    os.makedirs(args.work_dir, exist_ok=True)
+
+    results = {
+        "benchmark": "scale",
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {
+            "repeat": args.repeat, "budget": args.budget, "seed": args.seed, "disease_ratio": args.disease_ratio,
+            "images": args.images, "graph": "sparql" if args.endpoint else "local", "endpoint": args.endpoint,
+            "solr": args.solr, "rdflib_max": args.rdflib_max,
+        },
+        "scales": {},
+    }
+    for scale in args.scales:
+        result = run_scale(scale, args)
+        results["scales"][str(scale)] = result
+        print_scale(scale, result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+        print(f"\nResults written to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = compare(json.load(f), results, args.tolerance, args.min_ms)
+        if slower:
+            print(f"\n{slower} shape(s) slower than the baseline by more than {args.tolerance:.0%}")
+            sys.exit(1)
@@ -0,0 +1,158 @@
+"""Check that GRAPH_BACKEND=local returns the same records as the SPARQL backend, and time both.
+
+The SPARQL side runs the real kg_queries queries, either against a live
+Fuseki (--endpoint) or, offline, through rdflib's SPARQL engine over the RDF
+files. The local side loads the same data into local_graph.LocalGraph (from
+Fuseki's Graph Store endpoint with --data-url, otherwise from the files).
+
+Multi-valued lists (images, related diseases, documents) are compared as
+sets because SPARQL doesn't order rows without ORDER BY; paging order, which
+is ORDER BY ?food, is compared exactly. Exits non-zero on any difference.
+
+    python benchmarks/compare_graph_backends.py
+    python benchmarks/compare_graph_backends.py --endpoint http://localhost:3030/food_disease_kg/sparql \\
+        --data-url http://localhost:3030/food_disease_kg/data
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT_DIR, "app"))
+import kg_queries
+import local_graph
+
+DEFAULT_FILES = [os.path.join(ROOT_DIR, "rdf_triple", "food_disease.ttl"),
+                 os.path.join(ROOT_DIR, "rdf_triple", "food_disease_data.ttl")]
+SEARCH_TERMS = ["cake", "rice", "cancer", "tomato", "zzz-no-match"]
+
+
+def rdflib_select(paths):
+    """A `select(query) -> bindings` callable evaluating SPARQL with rdflib over `paths`"""
+    from rdflib import Graph
+    graph = Graph()
+    for path in paths:
+        graph.parse(path)
+
+    def select(query):
+        result = graph.query(query)
+        return [
+            {str(var): {'value': str(row[var])} for var in result.vars if row[var] is not None}
+            for row in result
+        ]
+    return select
+
+
+def normalized(records):
+    """Records keyed by URI with their list fields sorted"""
+    out = {}
+    for record in records:
+        record = dict(record)
+        for key, items in record.items():
+            if isinstance(items, list):
+                record[key] = sorted(items, key=lambda item: json.dumps(item, sort_keys=True))
+        out[record['uri']] = record
+    return out
+
+
+def diff(label, expected, actual):
+    if expected == actual:
+        print(f"  ok    {label}")
+        return 0
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        missing, extra = expected.keys() - actual.keys(), actual.keys() - expected.keys()
+        changed = [k for k in expected.keys() & actual.keys() if expected[k] != actual[k]]
+        print(f"  FAIL  {label}: {len(missing)} missing, {len(extra)} extra, {len(changed)} different")
+        for key in changed[:3]:
+            print(f"        {key}\n          sparql: {expected[key]}\n          local:  {actual[key]}")
+    else:
+        print(f"  FAIL  {label}\n          sparql: {str(expected)[:300]}\n          local:  {str(actual)[:300]}")
+    return 1
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return round(statistics.median(samples) * 1000, 3)
+
+
+def compare(sparql, local, page_size):
+    failures = 0
+    failures += diff("data_version", sparql.data_version(), local.data_version())
+    failures += diff("fetch_foods", normalized(sparql.fetch_foods().values()), normalized(local.fetch_foods().values()))
+    failures += diff("fetch_diseases", normalized(sparql.fetch_diseases().values()),
+                     normalized(local.fetch_diseases().values()))
+
+    sparql_pages = [r['uri'] for r in sparql.iter_foods(page_size)]
+    local_pages = [r['uri'] for r in local.iter_foods(page_size)]
+    failures += diff(f"iter_foods order (page size {page_size})", sparql_pages, local_pages)
+    for offset in (0, page_size):
+        failures += diff(f"fetch_food_page offset={offset}",
+                         normalized(sparql.fetch_food_page(page_size, offset=offset)),
+                         normalized(local.fetch_food_page(page_size, offset=offset)))
+    if sparql_pages:
+        after = sparql_pages[min(len(sparql_pages), page_size) - 1]
+        failures += diff("fetch_food_page after cursor",
+                         normalized(sparql.fetch_food_page(page_size, after=after)),
+                         normalized(local.fetch_food_page(page_size, after=after)))
+
+    for term in SEARCH_TERMS:
+        # Ties on foodName may be cut differently by LIMIT, so compare without it
+        failures += diff(f"search_foods {term!r}", normalized(sparql.search_foods(term, 10_000)),
+                         normalized(local.search_foods(term, 10_000)))
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--endpoint", help="SPARQL endpoint; default: rdflib over --files")
+    parser.add_argument("--data-url", help="Graph Store endpoint to load the local graph from; default: --files")
+    parser.add_argument("--files", nargs="+", default=DEFAULT_FILES)
+    parser.add_argument("--page-size", type=int, default=25)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="append the timings as a JSON line to this file")
+    args = parser.parse_args()
+
+    if args.endpoint:
+        from backends import SparqlClient
+        select = SparqlClient(args.endpoint).select
+    else:
+        select = rdflib_select(args.files)
+    if args.data_url:
+        from backends import BackendClient
+        client = BackendClient("fuseki-data")
+        loader = lambda: local_graph.read_graph_store(client, args.data_url)  # noqa: E731
+    else:
+        loader = lambda: local_graph.read_files(args.files)  # noqa: E731
+
+    sparql = kg_queries.SparqlGraph(select)
+    local = local_graph.LocalGraph(loader)
+    start = time.perf_counter()
+    local.index()
+    print(f"Local graph: {local.stats()['triples']} triples loaded in {time.perf_counter() - start:.2f} s")
+
+    print("Equivalence:")
+    failures = compare(sparql, local, args.page_size)
+
+    print("Median latency (ms):")
+    timings = {}
+    for name, call in (
+        ("fetch_foods", lambda g: g.fetch_foods()),
+        ("fetch_diseases", lambda g: g.fetch_diseases()),
+        ("fetch_food_page", lambda g: g.fetch_food_page(50)),
+        ("search_foods", lambda g: g.search_foods("cake", 20)),
+    ):
+        timings[name] = {"sparql": timed(lambda: call(sparql), args.repeat), "local": timed(lambda: call(local), args.repeat)}
+        print(f"  {name:16} sparql {timings[name]['sparql']:>10}   local {timings[name]['local']:>8}")
+
+    if args.output:
+        with open(args.output, "a") as f:
+            f.write(json.dumps({"benchmark": "graph_backends", "sparql": args.endpoint or "rdflib",
+                                "failures": failures, "latency_ms": timings}) + "\n")
+    sys.exit(1 if failures else 0)
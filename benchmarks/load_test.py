@@ -0,0 +1,121 @@
+"""Closed-loop HTTP load generator for the Flask API.
+
+Runs `--concurrency` client threads, each with its own keep-alive session,
+issuing requests round-robin over the given paths for `--duration` seconds,
+then prints requests/sec and latency percentiles. Compare serving modes by
+running it against each, e.g.:
+
+    APP_SERVER=dev docker compose up -d flask
+    python benchmarks/load_test.py --label dev --output bench_output.txt
+    APP_SERVER=gunicorn docker compose up -d flask
+    python benchmarks/load_test.py --label gunicorn --output bench_output.txt
+
+`--mode async` drives the same loop from asyncio tasks over one httpx client,
+which can hold hundreds of concurrent connections; use it for high
+`--concurrency` runs where client threads would be the bottleneck, e.g. to
+compare p99 latency of APP_SERVER=gunicorn and APP_SERVER=async.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+DEFAULT_PATHS = ["/api/foods", "/api/diseases", "/api/health"]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def worker(base_url, paths, deadline, offset, timeout):
+    session = requests.Session()
+    latencies, errors = [], 0
+    for path in itertools.islice(itertools.cycle(paths), offset, None):
+        if time.perf_counter() >= deadline:
+            break
+        start = time.perf_counter()
+        try:
+            response = session.get(base_url + path, timeout=timeout)
+            if response.status_code >= 400:
+                errors += 1
+        except requests.RequestException:
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+    return latencies, errors
+
+
+async def async_worker(client, base_url, paths, deadline, offset):
+    import httpx
+    latencies, errors = [], 0
+    for path in itertools.islice(itertools.cycle(paths), offset, None):
+        if time.perf_counter() >= deadline:
+            break
+        start = time.perf_counter()
+        try:
+            response = await client.get(base_url + path)
+            if response.status_code >= 400:
+                errors += 1
+        except httpx.HTTPError:
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+    return latencies, errors
+
+
+async def run_async(base_url, paths, concurrency, deadline, timeout):
+    import httpx
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        return await asyncio.gather(*(
+            async_worker(client, base_url, paths, deadline, i) for i in range(concurrency)
+        ))
+
+
+def run(base_url, paths, concurrency, duration, timeout=30, mode="threads"):
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    if mode == "async":
+        results = asyncio.run(run_async(base_url, paths, concurrency, deadline, timeout))
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = [pool.submit(worker, base_url, paths, deadline, i, timeout) for i in range(concurrency)]
+            results = [f.result() for f in futures]
+    elapsed = time.perf_counter() - start
+    latencies = sorted(l for lat, _ in results for l in lat)
+    errors = sum(e for _, e in results)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            f"p{p}": round(percentile(latencies, p) * 1000, 2) for p in (50, 90, 95, 99)
+        } | {"max": round(latencies[-1] * 1000, 2) if latencies else 0.0}
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--paths", nargs="+", default=DEFAULT_PATHS)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--mode", choices=["threads", "async"], default="threads",
+                        help="client implementation: a thread per connection, or asyncio tasks (needs httpx)")
+    parser.add_argument("--label", default="", help="name recorded with the result, e.g. dev or gunicorn")
+    parser.add_argument("--output", help="append the result as a JSON line to this file")
+    args = parser.parse_args()
+
+    result = {"label": args.label, "url": args.url, "paths": args.paths,
+              "concurrency": args.concurrency, "mode": args.mode}
+    result.update(run(args.url, args.paths, args.concurrency, args.duration, mode=args.mode))
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "a") as f:
+            f.write(json.dumps(result) + "\n")
@@ -0,0 +1,175 @@
+"""Generate a synthetic knowledge graph in the food_disease.ttl ontology at a chosen scale.
+
+`--entities` foods and diseases (split by `--disease-ratio`) are written as
+N-Triples with the generator's own term helpers, so the shapes match
+food_disease_data.ttl:
+- foods have every text property, calories, 0-3 related diseases and about
+  `--images` FoodImages each, with thumbnail and srcset derivatives
+- diseases belong to one of diseases/25 families and have documents and
+  treatment protocols (DiseaseDocument / TreatmentProtocol)
+- a dataset version marker, as written by load_data.sh
+
+Names, ingredients, recipes and the other texts are drawn from the curated
+JSON files, so tokenization, facets and ingredient normalization see
+realistic values. Related diseases are skewed towards a few popular ones,
+like real data. Output is deterministic for a given --seed. Ids are
+zero-padded (food_0000042), so URI order is numeric order.
+
+    python benchmarks/synthetic_kg.py --entities 100000 --output synthetic.nt.gz
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT_DIR, "rdf_triple", "script"))
+sys.path.insert(0, os.path.join(ROOT_DIR, "app"))
+import generate_food_disease_data as gen
+from ingredients import split_list
+from ntriples_writer import NTriplesWriter
+
+IMAGE_SIZES = (("thumb", 320), ("medium", 640), ("large", 1280))
+FAMILY_SIZE = 25
+
+
+def vocabulary():
+    """Text pools from rdf_triple/json, with a fallback when the files are missing"""
+    try:
+        with open(gen.FOOD_DATA_FILE, encoding="utf-8") as f:
+            foods = json.load(f)
+        with open(gen.DISEASE_DATA_FILE, encoding="utf-8") as f:
+            diseases = json.load(f)
+    except (OSError, ValueError):
+        foods, diseases = {}, []
+
+    def pool(values, default):
+        values = sorted({value for value in values if value})
+        return values or default
+
+    return {
+        "names": pool(foods, ["cookie", "rice", "stew"]),
+        "ingredients": pool((part.strip() for info in foods.values() for part in split_list(info.get("ingredients") or "")),
+                            ["wheat flour", "sugar", "egg", "milk", "salt"]),
+        "recipes": pool((info.get("recipe") for info in foods.values()), ["Mix everything and cook for 20 minutes."]),
+        "locations": pool((info.get("foodLocationArea") for info in foods.values()), ["Global"]),
+        "eatingTimes": pool((info.get("eatingTime") for info in foods.values()), ["Breakfast", "Snack, Dessert"]),
+        "diseases": pool((d.get("diseaseName") for d in diseases), ["Breast Cancer", "Diabetes"]),
+        "families": pool((d.get("diseaseFamilyName") for d in diseases), ["Cancer", "Metabolic"]),
+        "symptoms": pool((s for d in diseases for s in d.get("symptoms") or []), ["fatigue", "pain", "fever"]),
+        "subjects": pool((d.get("mostCommonSubjectKind") for d in diseases), ["Adults"]),
+    }
+
+
+def sample(rng, pool, low, high):
+    """Between `low` and `high` distinct values of `pool`, comma-separated"""
+    return ", ".join(rng.sample(pool, min(len(pool), rng.randint(low, high))))
+
+
+def plan(entities, disease_ratio):
+    """(foods, diseases, families) for `entities` foods and diseases"""
+    diseases = max(1, round(entities * disease_ratio))
+    foods = max(1, entities - diseases)
+    return foods, diseases, max(1, -(-diseases // FAMILY_SIZE))
+
+
+def food_triples(n, rng, words, diseases, images):
+    food = gen.iri(f"food_{n:07d}")
+    name = f"{rng.choice(words['names'])} {n}"
+    lines = [
+        gen.rdf_type(food, "Food"),
+        gen.triple(food, gen.iri("foodName"), gen.literal(name)),
+        gen.triple(food, gen.iri("ingredients"), gen.literal(sample(rng, words["ingredients"], 3, 8))),
+        gen.triple(food, gen.iri("recipe"), gen.literal(rng.choice(words["recipes"]))),
+        gen.triple(food, gen.iri("calorieIntake"), gen.literal(rng.randrange(50, 900), "integer")),
+        gen.triple(food, gen.iri("eatingTime"), gen.literal(rng.choice(words["eatingTimes"]))),
+        gen.triple(food, gen.iri("foodLocationArea"), gen.literal(rng.choice(words["locations"]))),
+        gen.triple(food, gen.iri("isRawOrCooked"), gen.literal(rng.choice(("Raw", "Cooked")))),
+    ]
+    # Squaring the uniform draw skews links towards the first (popular) diseases
+    related = {int(diseases * rng.random() ** 2) for _ in range(rng.randint(0, 3))}
+    lines += [gen.triple(food, gen.iri("isRelatedTo"), gen.iri(f"disease_{d:06d}")) for d in sorted(related)]
+    for i in range(1, (rng.randint(1, 2 * images - 1) if images else 0) + 1):
+        image = gen.iri(f"image_{n:07d}_{i}")
+        url = f"{gen.BASE_URL}/images/food_{n:07d}/{i}.jpg"
+        lines += [
+            gen.rdf_type(image, "FoodImage"),
+            gen.triple(image, gen.iri("isImageOf"), food),
+            gen.triple(image, gen.iri("imageUrl"), gen.literal(url)),
+            gen.triple(image, gen.iri("fileName"), gen.literal(f"{i}.jpg")),
+            gen.triple(image, gen.iri("thumbnailUrl"), gen.literal(f"{url}?size=thumb")),
+            gen.triple(image, gen.iri("imageSrcset"),
+                       gen.literal(", ".join(f"{url}?size={size} {width}w" for size, width in IMAGE_SIZES))),
+        ]
+    return lines
+
+
+def disease_triples(n, rng, words, families):
+    disease = gen.iri(f"disease_{n:06d}")
+    lines = [
+        gen.rdf_type(disease, "Disease"),
+        gen.triple(disease, gen.iri("diseaseName"), gen.literal(f"{rng.choice(words['diseases'])} {n}")),
+        gen.triple(disease, gen.iri("belongTo"), gen.iri(f"family_{n % families:05d}")),
+        gen.triple(disease, gen.iri("symptoms"), gen.literal(sample(rng, words["symptoms"], 2, 4))),
+        gen.triple(disease, gen.iri("sex"), gen.literal(rng.choice(("Female", "Male", "Both")))),
+        gen.triple(disease, gen.iri("mostCommonSubjectKind"), gen.literal(rng.choice(words["subjects"]))),
+    ]
+    for kind, cls, predicate, count in (("doc", "DiseaseDocument", "isDocumentedBy", rng.randint(1, 3)),
+                                        ("treatment", "TreatmentProtocol", "hasTreatmentProtocol", rng.randint(0, 2))):
+        folder = "" if kind == "doc" else "treatment_protocol/"
+        for i in range(1, count + 1):
+            node = gen.iri(f"{kind}_{n:06d}_{i}")
+            lines += [
+                gen.rdf_type(node, cls),
+                gen.triple(node, gen.iri("documentUrl"),
+                           gen.literal(f"{gen.BASE_URL}/documents/disease_{n:06d}/{folder}{kind}_{i}.pdf")),
+                gen.triple(node, gen.iri("fileName"), gen.literal(f"{kind}_{i}.pdf")),
+                gen.triple(disease, gen.iri(predicate), node),
+            ]
+    return lines
+
+
+def family_triples(n, rng, words):
+    family = gen.iri(f"family_{n:05d}")
+    return [gen.rdf_type(family, "DiseaseFamily"),
+            gen.triple(family, gen.iri("diseaseFamilyName"), gen.literal(f"{rng.choice(words['families'])} {n}"))]
+
+
+def generate(entities, seed=0, disease_ratio=0.1, images=4):
+    """Yield the N-Triples lines of a synthetic graph with `entities` foods and diseases"""
+    rng = random.Random(seed)
+    words = vocabulary()
+    foods, diseases, families = plan(entities, disease_ratio)
+    yield gen.triple(gen.iri("dataset_meta"), gen.iri("dataVersion"),
+                     gen.literal(f"synthetic-{entities}-{seed}-{disease_ratio}-{images}"))
+    for n in range(families):
+        yield from family_triples(n, rng, words)
+    for n in range(diseases):
+        yield from disease_triples(n, rng, words, families)
+    for n in range(foods):
+        yield from food_triples(n, rng, words, diseases, images)
+
+
+def write(path, entities, seed=0, disease_ratio=0.1, images=4):
+    """Write the graph to `path` (.nt, or .nt.gz) and return what was written"""
+    foods, diseases, families = plan(entities, disease_ratio)
+    start = time.perf_counter()
+    with NTriplesWriter(path) as writer:
+        writer.write_all(generate(entities, seed, disease_ratio, images))
+    return {
+        "path": path, "entities": entities, "foods": foods, "diseases": diseases, "families": families,
+        "triples": writer.count, "bytes": os.path.getsize(path), "seconds": round(time.perf_counter() - start, 3)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entities", type=int, default=10_000, help="foods plus diseases")
+    parser.add_argument("--output", default="synthetic.nt", help=".nt or .nt.gz file")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--disease-ratio", type=float, default=0.1, help="share of the entities that are diseases")
+    parser.add_argument("--images", type=int, default=4, help="mean images per food")
+    args = parser.parse_args()
+    print(json.dumps(write(args.output, args.entities, args.seed, args.disease_ratio, args.images), indent=2))
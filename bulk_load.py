@@ -0,0 +1,243 @@
+"""Load the RDF files into Fuseki, either offline with TDB2's bulk loader or online in chunks.
+
+cold  Stop Fuseki, run `tdb2.tdbloader` from the Fuseki image directly against
+      the fuseki-data volume, then start Fuseki again. Fastest way to (re)build
+      the dataset; the API is unavailable while it runs.
+hot   Convert the files to N-Triples and send them to the running server in
+      chunks of LOAD_CHUNK_SIZE triples, each its own short write transaction,
+      so queries keep being answered during the load. Only the difference to
+      the previous hot load (kept in LOAD_STATE) is sent: removed triples go
+      out as DELETE DATA, new ones as Graph Store POSTs. Blank nodes get
+      canonical labels, so an unchanged ontology is not sent again. An empty
+      store gets every triple, whatever the state says. Without a state
+      (first load, --full, or after a cold load) a store that already holds
+      data gets every triple without blank nodes, since Fuseki would add a
+      second copy of each blank node.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "app"))
+from backends import BackendClient, SparqlClient
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+RDF_DIR = os.path.join(ROOT_DIR, "rdf_triple")
+DEFAULT_FILES = [os.path.join(RDF_DIR, "food_disease.ttl"), os.path.join(RDF_DIR, "food_disease_data.ttl")]
+
+# Configurable endpoints
+SPARQL_URL = os.getenv("SPARQL_URL", "http://localhost:3030/food_disease_kg/sparql")
+FUSEKI_DATA_URL = os.getenv("FUSEKI_DATA_URL", "http://localhost:3030/food_disease_kg/data")
+FUSEKI_UPDATE_URL = os.getenv("FUSEKI_UPDATE_URL", "http://localhost:3030/food_disease_kg/update")
+FUSEKI_PING_URL = os.getenv("FUSEKI_PING_URL", "http://localhost:3030/$/ping")
+
+# Hot loads
+LOAD_CHUNK_SIZE = int(os.getenv("LOAD_CHUNK_SIZE", "5000"))
+LOAD_STATE = os.getenv("LOAD_STATE", os.path.join(ROOT_DIR, ".bulk_load_state.nt"))
+
+# Cold loads: paths as seen inside the Fuseki container (see docker-compose.yml)
+COMPOSE = os.getenv("COMPOSE", "docker compose").split()
+FUSEKI_SERVICE = os.getenv("FUSEKI_SERVICE", "fuseki")
+TDB2_LOCATION = os.getenv("TDB2_LOCATION", "/fuseki/databases/food_disease_kg")
+CONTAINER_RDF_DIR = "/fuseki/data"
+TDB2_LOADER = os.getenv("TDB2_LOADER", "parallel")
+
+fuseki = SparqlClient(SPARQL_URL)
+store = BackendClient("fuseki-load")
+
+COUNT_QUERY = "SELECT (COUNT(*) AS ?n) WHERE { ?s ?p ?o }"
+ANY_TRIPLE_QUERY = "ASK { ?s ?p ?o }"
+
+
+def count_triples():
+    return int(fuseki.select(COUNT_QUERY)[0]['n']['value'])
+
+
+def store_is_empty():
+    return not fuseki.ask(ANY_TRIPLE_QUERY)
+
+
+def report(label, triples, elapsed):
+    rate = triples / elapsed if elapsed else 0.0
+    print(f"{label}: {triples} triples in {elapsed:.2f} s ({rate:,.0f} triples/s)")
+
+
+def ntriples_lines(path):
+    """N-Triples lines for an RDF file; .nt files are streamed as-is, others are parsed with rdflib"""
+    if path.endswith(".nt"):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    yield line
+        return
+    from rdflib import BNode, Graph
+    from rdflib.compare import to_canonical_graph
+    graph = Graph()
+    graph.parse(path)
+    if any(isinstance(term, BNode) for triple in graph for term in triple):
+        # rdflib labels blank nodes afresh on every parse; canonical labels keep
+        # unchanged structures (e.g. owl:unionOf lists) identical between loads
+        graph = to_canonical_graph(graph)
+    for line in graph.serialize(format="nt").splitlines():
+        if line.strip():
+            yield line.strip()
+
+
+def chunks(lines, size):
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def post_ntriples(chunk):
+    response = store.post(
+        FUSEKI_DATA_URL,
+        data="\n".join(chunk).encode("utf-8") + b"\n",
+        headers={"Content-Type": "application/n-triples"}
+    )
+    if response.status_code not in (200, 201, 204):
+        raise RuntimeError(f"{response.status_code} - {response.text}")
+
+
+def delete_ntriples(chunk):
+    response = store.post(FUSEKI_UPDATE_URL, data={"update": "DELETE DATA {\n" + "\n".join(chunk) + "\n}"})
+    if response.status_code not in (200, 204):
+        raise RuntimeError(f"{response.status_code} - {response.text}")
+
+
+def has_blank_node(line):
+    return line.startswith("_:") or " _:" in line
+
+
+def load_state():
+    """Triples sent by the previous hot load, or None when there was none"""
+    try:
+        with open(LOAD_STATE, encoding="utf-8") as f:
+            return set(line.rstrip("\n") for line in f if line.strip())
+    except FileNotFoundError:
+        return None
+
+
+def save_state(lines):
+    tmp = LOAD_STATE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for line in sorted(lines):
+            f.write(line + "\n")
+    os.replace(tmp, LOAD_STATE)
+
+
+def hot_load(files, full=False):
+    """Send the triples that changed since the last hot load to the running Fuseki"""
+    start = time.perf_counter()
+    current = set()
+    for path in files:
+        current.update(ntriples_lines(path))
+    previous = None if full else load_state()
+    parse_elapsed = time.perf_counter() - start
+    print(f"Parsed {len(current)} triples from {len(files)} file(s) in {parse_elapsed:.2f} s")
+
+    skipped = 0
+    if store_is_empty():
+        # E.g. the volume was recreated since the state was written
+        previous = set()
+    elif previous is None:
+        # Triples without blank nodes are idempotent to resend; blank-node
+        # triples would be stored again under new nodes, so assume they are there
+        previous = {line for line in current if has_blank_node(line)}
+        skipped = len(previous)
+
+    added = sorted(current - previous)
+    # DELETE DATA cannot name blank nodes; those triples are left in place
+    removed, kept = [], 0
+    for line in sorted(previous - current):
+        if has_blank_node(line):
+            kept += 1
+        else:
+            removed.append(line)
+
+    start = time.perf_counter()
+    for chunk in chunks(removed, LOAD_CHUNK_SIZE):
+        delete_ntriples(chunk)
+    for chunk in chunks(added, LOAD_CHUNK_SIZE):
+        post_ntriples(chunk)
+    elapsed = time.perf_counter() - start
+    save_state(current)
+
+    print(f"{len(added)} added, {len(removed)} removed, {len(current) - len(added)} unchanged")
+    if skipped:
+        print(f"No load state for a non-empty store: {skipped} blank-node triples were not sent, so they are "
+              f"not duplicated; if they are new, a cold load with --replace loads them")
+    if kept:
+        print(f"{kept} removed blank-node triples could not be deleted and are still in Fuseki; "
+              f"a cold load with --replace clears them")
+    report("Hot load", len(added) + len(removed), elapsed)
+
+
+def compose(*args, check=True):
+    print("$", " ".join(COMPOSE + list(args)))
+    return subprocess.run(COMPOSE + list(args), cwd=ROOT_DIR, check=check)
+
+
+def container_path(path):
+    """Path of an input file inside the Fuseki container, where rdf_triple/ is mounted read-only"""
+    relative = os.path.relpath(os.path.abspath(path), RDF_DIR)
+    if relative.startswith(".."):
+        raise ValueError(f"{path} is not under {RDF_DIR}, which is the only directory mounted into Fuseki")
+    return f"{CONTAINER_RDF_DIR}/{relative}"
+
+
+def wait_for_fuseki(timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if store.get(FUSEKI_PING_URL, timeout=2).status_code == 200:
+                return
+        except Exception:
+            pass
+        time.sleep(1)
+    raise RuntimeError(f"Fuseki did not come back within {timeout} s")
+
+
+def cold_load(files, replace=False):
+    """Rebuild the TDB2 database offline with tdb2.tdbloader, then restart Fuseki"""
+    inputs = [container_path(path) for path in files]
+    compose("stop", FUSEKI_SERVICE)
+    try:
+        if replace:
+            compose("run", "--rm", "--no-deps", FUSEKI_SERVICE, "sh", "-c", f"rm -rf {TDB2_LOCATION}/*")
+        start = time.perf_counter()
+        compose(
+            "run", "--rm", "--no-deps", FUSEKI_SERVICE,
+            "java", "-cp", "/opt/fuseki/fuseki-server.jar", "tdb2.tdbloader",
+            f"--loader={TDB2_LOADER}", "--loc", TDB2_LOCATION, *inputs
+        )
+        elapsed = time.perf_counter() - start
+    finally:
+        compose("start", FUSEKI_SERVICE)
+    wait_for_fuseki()
+    # The next hot load has to diff against what is actually in the store now
+    if os.path.exists(LOAD_STATE):
+        os.remove(LOAD_STATE)
+    report("Cold load", count_triples(), elapsed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("mode", choices=["cold", "hot"])
+    parser.add_argument("files", nargs="*", default=DEFAULT_FILES, help="RDF files to load (default: rdf_triple/*.ttl)")
+    parser.add_argument("--replace", action="store_true", help="cold: empty the database before loading")
+    parser.add_argument("--full", action="store_true", help="hot: ignore the previous load state and send every triple")
+    args = parser.parse_args()
+
+    if args.mode == "cold":
+        cold_load(args.files, args.replace)
+    else:
+        hot_load(args.files, args.full)
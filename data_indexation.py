@@ -1,204 +1,247 @@
-from SPARQLWrapper import SPARQLWrapper, JSON
-import requests
+import argparse
+import hashlib
 import json
 import os
+import sys
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Query shapes, grouping, document shapes and backend clients are shared with the Flask API;
+# none of these modules import Flask or NumPy, so the indexer runs with requests alone
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "app"))
+import kg_queries
+import metrics
+from backends import BackendClient, SparqlClient
+from documents import DiseaseView, FoodView, dumps
 
 # Configurable endpoints
 SPARQL_URL = os.getenv("SPARQL_URL", "http://localhost:3030/food_disease_kg/sparql")
-FOOD_SOLR_URL = os.getenv("FOOD_SOLR_URL", "http://localhost:8983/solr/food_collection/update?commit=true")
-DISEASE_SOLR_URL = os.getenv("DISEASE_SOLR_URL", "http://localhost:8983/solr/disease_collection/update?commit=true")
+FOOD_SOLR_URL = os.getenv("FOOD_SOLR_URL", "http://localhost:8983/solr/food_collection/update")
+DISEASE_SOLR_URL = os.getenv("DISEASE_SOLR_URL", "http://localhost:8983/solr/disease_collection/update")
 FOOD_SOLR_SELECT = os.getenv("FOOD_SOLR_SELECT", "http://localhost:8983/solr/food_collection/select")
 DISEASE_SOLR_SELECT = os.getenv("DISEASE_SOLR_SELECT", "http://localhost:8983/solr/disease_collection/select")
 
-def index_data():
+# Incremental indexing: hashes of what was last sent to Solr, keyed by food/disease URI
+INDEX_MANIFEST = os.getenv("INDEX_MANIFEST", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".index_manifest.json"))
+INDEX_BATCH_SIZE = int(os.getenv("INDEX_BATCH_SIZE", "500"))
+# Let Solr fold updates into a soft commit instead of a hard commit per request
+COMMIT_WITHIN_MS = int(os.getenv("SOLR_COMMIT_WITHIN_MS", "5000"))
+# Streaming extraction: entities per SPARQL page, and concurrent Solr uploads per collection
+INDEX_PAGE_SIZE = int(os.getenv("INDEX_PAGE_SIZE", "1000"))
+INDEX_WORKERS = int(os.getenv("INDEX_WORKERS", "4"))
+
+fuseki = SparqlClient(SPARQL_URL, query_name=kg_queries.query_name)
+solr = BackendClient("solr")
+
+manifest_lock = threading.Lock()
+
+def load_manifest():
+    """Read the indexing manifest, or start an empty one"""
+    try:
+        with open(INDEX_MANIFEST) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def save_manifest(manifest):
+    # The food and disease indexers share the manifest and run in parallel
+    with manifest_lock:
+        tmp = INDEX_MANIFEST + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp, INDEX_MANIFEST)
+
+def doc_hash(doc):
+    return hashlib.sha1(json.dumps(doc, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def count_docs(select_url):
+    response = solr.get(select_url, params={"q": "*:*", "rows": 0, "wt": "json"})
+    response.raise_for_status()
+    return response.json().get('response', {}).get('numFound', 0)
+
+def post_update(update_url, body):
+    with metrics.span("encode", "solr_update") as span:
+        data = dumps(body)
+        if isinstance(body, list):
+            span.rows = len(body)
+        span.bytes = len(data)
+    response = solr.post(update_url, params={"commitWithin": COMMIT_WITHIN_MS}, data=data,
+                         headers={"Content-Type": "application/json"})
+    if response.status_code != 200:
+        raise RuntimeError(f"{response.status_code} - {response.text}")
+
+class BatchUploader:
+    """Posts update batches to Solr from a thread pool.
+
+    At most `max_pending` batches are queued or in flight; `submit()` blocks on
+    the oldest one beyond that, so extraction never runs far ahead of Solr.
+    Each finished batch's `on_done` runs in the submitting thread.
+    """
+
+    def __init__(self, update_url, workers=INDEX_WORKERS, max_pending=None):
+        self.update_url = update_url
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="solr-upload")
+        self.max_pending = max_pending or workers * 2
+        self.pending = deque()
+
+    def submit(self, body, on_done):
+        while len(self.pending) >= self.max_pending:
+            self._finish_oldest()
+        self.pending.append((self.pool.submit(post_update, self.update_url, body), on_done))
+
+    def _finish_oldest(self):
+        future, on_done = self.pending.popleft()
+        future.result()
+        on_done()
+
+    def drain(self):
+        while self.pending:
+            self._finish_oldest()
+
+    def close(self):
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def sync_collection(label, update_url, select_url, docs, entries, full=False):
+    """Upsert changed docs and delete removed ones, updating `entries` ({uri: {"id", "hash"}}) in place.
+
+    `docs` yields (source URI, Solr document) pairs and is consumed as a
+    stream. Only documents whose hash differs from the manifest are sent, in
+    batches of INDEX_BATCH_SIZE posted by a BatchUploader.
+    """
+    if entries and not full and count_docs(select_url) == 0:
+        # The collection was recreated (e.g. a fresh Solr volume); the manifest no longer applies
+        print(f"  {label} collection is empty, ignoring manifest")
+        full = True
+    if full:
+        with manifest_lock:
+            entries.clear()
+        post_update(update_url, {"delete": {"query": "*:*"}})
+
+    seen, stale_ids = set(), []
+    counts = {"total": 0, "upserted": 0}
+
+    def changed_docs():
+        for uri, doc in docs:
+            counts["total"] += 1
+            seen.add(uri)
+            digest = doc_hash(doc)
+            entry = entries.get(uri)
+            if entry is None or entry["hash"] != digest:
+                if entry is not None and entry["id"] != doc["id"]:
+                    # Re-added under a new id; the old one has to go
+                    stale_ids.append(entry["id"])
+                yield uri, doc, digest
+
+    def record_upserts(batch):
+        def on_done():
+            with manifest_lock:
+                for uri, doc, digest in batch:
+                    entries[uri] = {"id": doc["id"], "hash": digest}
+            counts["upserted"] += len(batch)
+        return on_done
+
+    def record_deletes(uris):
+        def on_done():
+            with manifest_lock:
+                for uri in uris:
+                    entries.pop(uri, None)
+        return on_done
+
+    uploader = BatchUploader(update_url)
+    try:
+        for batch in batched(changed_docs(), INDEX_BATCH_SIZE):
+            uploader.submit([doc for _, doc, _ in batch], record_upserts(batch))
+        uploader.drain()
+
+        # An empty extraction more likely means Fuseki isn't loaded than that
+        # every entity was removed, so never empty a collection that way
+        removed = [uri for uri in entries if uri not in seen] if counts["total"] else []
+        stale_ids += [entries[uri]["id"] for uri in removed]
+        for ids in batched(stale_ids, INDEX_BATCH_SIZE):
+            uploader.submit({"delete": ids}, lambda: None)
+        uploader.drain()
+        record_deletes(removed)()
+    finally:
+        uploader.close()
+
+    print(f"  {label}: {counts['total']} documents, {counts['upserted']} upserted, {len(removed)} deleted, "
+          f"{counts['total'] - counts['upserted']} unchanged")
+    return counts['total'], counts['upserted'], len(removed)
+
+def soft_commit(update_url):
+    """Open a new searcher so the updates are visible right away"""
+    response = solr.post(update_url, params={"softCommit": "true"}, json={})
+    if response.status_code != 200:
+        print(f"Warning: soft commit failed: {response.status_code} - {response.text}")
+
+def index_data(manifest, full=False):
     """Index food data from SPARQL endpoint to Solr"""
     try:
-        sparql = SPARQLWrapper(SPARQL_URL)
-        sparql.setQuery("""
-            PREFIX ex: <http://www.semanticweb.org/gedeon/ontologies/2025/4/foods-diseases/>
-            SELECT ?food ?foodName ?imageUrl ?ingredients ?recipe ?calories ?eatingTime ?foodLocationArea ?isRawOrCooked ?disease ?diseaseName
-            WHERE {
-                ?food a ex:Food ;
-                      ex:foodName ?foodName .
-                OPTIONAL { 
-                    ?imageObj ex:isImageOf ?food ;
-                             ex:imageUrl ?imageUrl .
-                }
-                OPTIONAL { ?food ex:ingredients ?ingredients . }
-                OPTIONAL { ?food ex:recipe ?recipe . }
-                OPTIONAL { ?food ex:calorieIntake ?calories . }
-                OPTIONAL { ?food ex:eatingTime ?eatingTime . }
-                OPTIONAL { ?food ex:foodLocationArea ?foodLocationArea . }
-                OPTIONAL { ?food ex:isRawOrCooked ?isRawOrCooked . }
-                OPTIONAL { 
-                    ?food ex:isRelatedTo ?disease .
-                    ?disease ex:diseaseName ?diseaseName .
-                }
-            }
-        """)
-        sparql.setReturnFormat(JSON)
-        results = sparql.query().convert()
-        
-        # Group data by food URI
-        food_data = {}
-        for binding in results['results']['bindings']:
-            food_uri = binding['food']['value']
-            
-            if food_uri not in food_data:
-                food_data[food_uri] = {
-                    "id": food_uri,
-                    "food_uri": food_uri,
-                    "foodName": binding['foodName']['value'],
-                    "images": [],
-                    "diseases": [],
-                    "diseaseNames": []
-                }
-                
-                for field in ['ingredients', 'recipe', 'eatingTime', 'foodLocationArea', 'isRawOrCooked']:
-                    food_data[food_uri][field] = binding.get(field, {}).get('value', '')
-                
-                if 'calories' in binding:
-                    try:
-                        food_data[food_uri]['calories'] = int(binding['calories']['value'])
-                    except ValueError:
-                        food_data[food_uri]['calories'] = 0
-            
-            if 'imageUrl' in binding:
-                image_url = binding['imageUrl']['value']
-                if image_url not in food_data[food_uri]['images']:
-                    food_data[food_uri]['images'].append(image_url)
-            
-            if 'disease' in binding:
-                disease_uri = binding['disease']['value']
-                if disease_uri not in food_data[food_uri]['diseases']:
-                    food_data[food_uri]['diseases'].append(disease_uri)
-                    
-            if 'diseaseName' in binding:
-                disease_name = binding['diseaseName']['value']
-                if disease_name not in food_data[food_uri]['diseaseNames']:
-                    food_data[food_uri]['diseaseNames'].append(disease_name)
-        
-        docs = list(food_data.values())
-        
-        if docs:
-            clear_response = requests.post(
-                FOOD_SOLR_URL,
-                data='<delete><query>*:*</query></delete>',
-                headers={"Content-Type": "application/xml"}
-            )
-            if clear_response.status_code != 200:
-                print(f"Warning: Could not clear existing food data: {clear_response.status_code} - {clear_response.text}")
-                return
-            
-            response = requests.post(
-                FOOD_SOLR_URL, 
-                json=docs, 
-                headers={"Content-Type": "application/json"}
-            )
-            
-            if response.status_code == 200:
-                print(f"Successfully indexed {len(docs)} food documents in Solr")
-                print("\nSample indexed data:")
-                for i, doc in enumerate(docs[:3]):
-                    print(f"  {i+1}. {doc['foodName']} - {len(doc['images'])} images, {len(doc['diseases'])} related diseases")
-            else:
-                print(f"Error indexing food data: {response.status_code} - {response.text}")
-        else:
+        samples = []
+
+        def docs():
+            for food in kg_queries.iter_foods(fuseki.select, INDEX_PAGE_SIZE):
+                doc = FoodView.from_record(food).solr_doc()
+                if len(samples) < 3:
+                    samples.append(doc)
+                yield food['uri'], doc
+
+        with manifest_lock:
+            entries = manifest.setdefault("foods", {})
+        try:
+            total, _, _ = sync_collection("foods", FOOD_SOLR_URL, FOOD_SOLR_SELECT, docs(), entries, full)
+        finally:
+            # Keep what did reach Solr even if a later batch failed
+            save_manifest(manifest)
+        if not total:
             print("No food data found to index")
-            
+            return
+        soft_commit(FOOD_SOLR_URL)
+
+        print("\nSample indexed data:")
+        for i, doc in enumerate(samples):
+            print(f"  {i+1}. {doc['foodName']} - {len(doc['images'])} images, {len(doc['diseases'])} related diseases")
+
     except Exception as e:
-        print(f"Error indexing food data: {str(e)}")
+        print(f"Error indexing food data: {type(e).__name__}: {e}")
 
-def index_diseases():
+def index_diseases(manifest, full=False):
     """Index disease data separately for search functionality"""
     try:
-        sparql = SPARQLWrapper(SPARQL_URL)
-        sparql.setQuery("""
-            PREFIX ex: <http://www.semanticweb.org/gedeon/ontologies/2025/4/foods-diseases/>
-            SELECT ?disease ?diseaseName ?symptoms ?sex ?subjectKind ?familyName ?docUrl ?treatmentUrl
-            WHERE {
-                ?disease a ex:Disease ;
-                         ex:diseaseName ?diseaseName ;
-                         ex:symptoms ?symptoms ;
-                         ex:sex ?sex ;
-                         ex:mostCommonSubjectKind ?subjectKind ;
-                         ex:belongTo ?family .
-                ?family ex:diseaseFamilyName ?familyName .
-                OPTIONAL { 
-                    ?disease ex:isDocumentedBy ?doc . 
-                    ?doc ex:documentUrl ?docUrl . 
-                }
-                OPTIONAL { 
-                    ?disease ex:hasTreatmentProtocol ?treatment .
-                    ?treatment ex:documentUrl ?treatmentUrl .
-                }
-            }
-        """)
-        sparql.setReturnFormat(JSON)
-        results = sparql.query().convert()
-        
-        # Group data by disease URI
-        disease_data = {}
-        for binding in results['results']['bindings']:
-            disease_uri = binding['disease']['value']
-            
-            if disease_uri not in disease_data:
-                disease_data[disease_uri] = {
-                    "id": f"disease_{disease_uri.split('/')[-1]}",
-                    "type": "disease",
-                    "disease_uri": disease_uri,
-                    "diseaseName": binding['diseaseName']['value'],
-                    "symptoms": binding['symptoms']['value'],
-                    "sex": binding['sex']['value'],
-                    "mostCommonSubjectKind": binding['subjectKind']['value'],
-                    "familyName": binding['familyName']['value'],
-                    "documents": [],
-                    "treatmentProtocols": []
-                }
-            
-            if 'docUrl' in binding:
-                doc_url = binding['docUrl']['value']
-                if doc_url not in disease_data[disease_uri]['documents']:
-                    disease_data[disease_uri]['documents'].append(doc_url)
-                    
-            if 'treatmentUrl' in binding:
-                treatment_url = binding['treatmentUrl']['value']
-                if treatment_url not in disease_data[disease_uri]['treatmentProtocols']:
-                    disease_data[disease_uri]['treatmentProtocols'].append(treatment_url)
-        
-        disease_docs = list(disease_data.values())
-        
-        if disease_docs:
-            clear_response = requests.post(
-                DISEASE_SOLR_URL,
-                data='<delete><query>*:*</query></delete>',
-                headers={"Content-Type": "application/xml"}
-            )
-            if clear_response.status_code != 200:
-                print(f"Warning: Could not clear existing disease data: {clear_response.status_code} - {clear_response.text}")
-                return
-            
-            response = requests.post(
-                DISEASE_SOLR_URL, 
-                json=disease_docs, 
-                headers={"Content-Type": "application/json"}
-            )
-            
-            if response.status_code == 200:
-                print(f"Successfully indexed {len(disease_docs)} disease documents in Solr")
-            else:
-                print(f"Error indexing disease data: {response.status_code} - {response.text}")
-        else:
+        docs = (
+            (disease['uri'], DiseaseView.from_record(disease).solr_doc())
+            for disease in kg_queries.iter_diseases(fuseki.select, INDEX_PAGE_SIZE)
+        )
+        with manifest_lock:
+            entries = manifest.setdefault("diseases", {})
+        try:
+            total, _, _ = sync_collection("diseases", DISEASE_SOLR_URL, DISEASE_SOLR_SELECT, docs, entries, full)
+        finally:
+            save_manifest(manifest)
+        if not total:
             print("No disease data found to index")
-            
+            return
+        soft_commit(DISEASE_SOLR_URL)
+
     except Exception as e:
-        print(f"Error indexing disease data: {str(e)}")
+        print(f"Error indexing disease data: {type(e).__name__}: {e}")
 
 def verify_indexing():
     """Verify that data was indexed correctly"""
     try:
         # Check food collection
-        response = requests.get(FOOD_SOLR_SELECT, params={"q": "*:*", "rows": 0, "wt": "json"})
+        response = solr.get(FOOD_SOLR_SELECT, params={"q": "*:*", "rows": 0, "wt": "json"})
         if response.status_code == 200:
             data = response.json()
             num_found = data.get('response', {}).get('numFound', 0)
@@ -207,7 +250,7 @@ def verify_indexing():
             print(f"Error checking food collection: {response.status_code} - {response.text}")
         
         # Check disease collection
-        response = requests.get(DISEASE_SOLR_SELECT, params={"q": "*:*", "rows": 0, "wt": "json"})
+        response = solr.get(DISEASE_SOLR_SELECT, params={"q": "*:*", "rows": 0, "wt": "json"})
         if response.status_code == 200:
             data = response.json()
             num_found = data.get('response', {}).get('numFound', 0)
@@ -216,17 +259,36 @@ def verify_indexing():
             print(f"Error checking disease collection: {response.status_code} - {response.text}")
             
     except Exception as e:
-        print(f"Error verifying indexing: {str(e)}")
+        print(f"Error verifying indexing: {type(e).__name__}: {e}")
+
+def print_metrics():
+    """Where the indexing time went, per backend call, grouping loop and encoding step"""
+    print(f"\n{'span':10} {'op':24} {'calls':>7} {'seconds':>9} {'rows':>10} {'bytes':>12}")
+    for name, op, calls, seconds, rows, size in metrics.summary():
+        print(f"{name:10} {op:24} {calls:>7} {seconds:>9.2f} {rows:>10} {size:>12}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index the knowledge graph into Solr")
+    parser.add_argument("--full", action="store_true", help="ignore the manifest and reindex every document")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="also write the run's metrics in the Prometheus text format (e.g. for a textfile collector)")
+    args = parser.parse_args()
+    manifest = load_manifest()
+
     print("Starting data indexing process...")
-    print("1. Indexing food data...")
-    index_data()
-    
-    print("\n2. Indexing disease data...")
-    index_diseases()
+    print("1. Indexing food and disease data...")
+    # The two collections are independent, so extract and upload them side by side
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="indexer") as indexers:
+        for future in [indexers.submit(index_data, manifest, args.full),
+                       indexers.submit(index_diseases, manifest, args.full)]:
+            future.result()
     
-    print("\n3. Verifying indexing...")
+    print("\n2. Verifying indexing...")
     verify_indexing()
+
+    print_metrics()
+    if args.metrics:
+        with open(args.metrics, "w") as f:
+            f.write(metrics.render())
     
     print("\nIndexing process completed!")
\ No newline at end of file
@@ -6,21 +6,32 @@ echo "Setting up Knowledge Graph and Search Index..."
 echo "Waiting for services to start..."
 sleep 10
 
-Load ontology data into Fuseki
-echo "Loading ontology data..."
-curl -X POST \
-  --data-binary @rdf_triple/food_disease.ttl \
-  -H "Content-Type: text/turtle" \
-  http://localhost:3030/food_disease_kg/data
-
-echo "Loading instance data..."
-curl -X POST \
-  --data-binary @rdf_triple/food_disease_data.ttl \
-  -H "Content-Type: text/turtle" \
-  http://localhost:3030/food_disease_kg/data
+# Load ontology and instance data into Fuseki. LOAD_MODE=cold rebuilds the
+# TDB2 database offline with tdb2.tdbloader (Fuseki is restarted); the default
+# hot mode sends only the triples changed since the last load, in chunks.
+echo "Loading RDF data (${LOAD_MODE:-hot})..."
+if [ "${LOAD_MODE:-hot}" = cold ]; then
+  python3 bulk_load.py cold --replace
+else
+  python3 bulk_load.py hot
+fi
 
 # Index data in Solr
 echo "Indexing data in Solr..."
 python3 data_indexation.py
 
+# Stamp a new dataset version once both stores are loaded so the API drops its cached snapshots
+echo "Updating dataset version marker..."
+DATA_VERSION=$(date -u +%Y-%m-%dT%H:%M:%SZ)
+curl -X POST \
+  --data-urlencode "update=PREFIX ex: <http://www.semanticweb.org/gedeon/ontologies/2025/4/foods-diseases/>
+DELETE WHERE { ex:dataset_meta ex:dataVersion ?v } ;
+INSERT DATA { ex:dataset_meta ex:dataVersion \"${DATA_VERSION}\" }" \
+  http://localhost:3030/food_disease_kg/update
+
+if [ -n "$ADMIN_TOKEN" ]; then
+  echo "Invalidating API cache..."
+  curl -X DELETE -H "X-Admin-Token: ${ADMIN_TOKEN}" http://localhost:5000/api/admin/cache
+fi
+
 echo "Setup complete!"
\ No newline at end of file
@@ -2,7 +2,14 @@ import os
 import re
 import sys
 import json
-from rdflib import Graph, Namespace, Literal, RDF, XSD
+import hashlib
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from image_derivatives import manifest_mtime, read_manifest
+from ntriples_writer import NTriplesWriter, sort_ntriples
 
 # Dynamic path handling
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -11,190 +18,336 @@ DISEASES_DIR = os.path.join(SCRIPT_DIR, "../../data", "Diseases")
 FOOD_DATA_FILE = os.path.join(SCRIPT_DIR, "../json", "food_data.json")
 DISEASE_DATA_FILE = os.path.join(SCRIPT_DIR, "../json", "disease_data.json")
 OUTPUT = os.path.join(SCRIPT_DIR, "..", "food_disease_data.ttl")
+# Per-entity fingerprints and triples from the last run, for --incremental and --diff
+MANIFEST = os.path.join(SCRIPT_DIR, "..", ".generate_manifest.json")
 
 # Configuration
 BASE = "http://www.semanticweb.org/gedeon/ontologies/2025/4/foods-diseases/"
-ex = Namespace(BASE)
-g = Graph()
-g.bind("ex", ex)
+RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+XSD = "http://www.w3.org/2001/XMLSchema#"
 
 # Base URL for resources (configurable via environment variable)
 BASE_URL = os.getenv("BASE_URL", "http://localhost:5000")
 
-# Load food and disease data
-try:
-    with open(FOOD_DATA_FILE, 'r') as f:
-        food_data = json.load(f)
-except FileNotFoundError:
-    print(f"Error: {FOOD_DATA_FILE} not found")
-    food_data = {}
-    sys.exit(1)
-
-try:
-    with open(DISEASE_DATA_FILE, 'r') as f:
-        disease_data = json.load(f)
-except FileNotFoundError:
-    print(f"Error: {DISEASE_DATA_FILE} not found")
-    disease_data = []
-    sys.exit(1)
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
 
 # Function to normalize names for URIs
 def normalize_name(name):
     """Convert name to lowercase and replace spaces/special chars with underscores"""
     return re.sub(r'[^a-zA-Z0-9]', '_', name.lower()).strip('_')
 
-# Process Foods directory
-try:
-    if not os.path.exists(FOODS_DIR):
-        raise FileNotFoundError(f"Foods directory not found at {FOODS_DIR}")
+# N-Triples terms
+_NT_ESCAPES = {'\\': '\\\\', '"': '\\"', '\n': '\\n', '\r': '\\r'}
+
+def iri(local):
+    return f"<{BASE}{local}>"
+
+def literal(value, datatype="string"):
+    text = ''.join(_NT_ESCAPES.get(c, c) for c in str(value))
+    return f'"{text}"^^<{XSD}{datatype}>'
+
+def triple(s, p, o):
+    return f"{s} {p} {o} ."
+
+def rdf_type(s, cls):
+    return triple(s, f"<{RDF_TYPE}>", iri(cls))
+
+def food_triples(category, food_info):
+    """N-Triples for one food category: its properties, related diseases and images"""
+    food_uri = iri(f"food_{normalize_name(category)}")
+    lines = [rdf_type(food_uri, "Food"), triple(food_uri, iri("foodName"), literal(category))]
+
+    for prop_name in ("ingredients", "recipe", "foodLocationArea", "isRawOrCooked", "eatingTime"):
+        if food_info.get(prop_name):
+            lines.append(triple(food_uri, iri(prop_name), literal(food_info[prop_name])))
+
+    # Handle calories (integer)
+    if food_info.get("calories") is not None:
+        try:
+            lines.append(triple(food_uri, iri("calorieIntake"), literal(int(food_info["calories"]), "integer")))
+        except (ValueError, TypeError):
+            print(f"Warning: Invalid calorie value for {category}: {food_info['calories']}")
+
+    # Link to related diseases
+    if isinstance(food_info.get("relatedDiseases"), list):
+        for disease_name in food_info["relatedDiseases"]:
+            if disease_name and disease_name.strip():
+                lines.append(triple(food_uri, iri("isRelatedTo"), iri(f"disease_{normalize_name(disease_name)}")))
+
+    # Sorted so image numbering is stable between runs
+    cat_dir = os.path.join(FOODS_DIR, category)
+    image_files = sorted(f for f in os.listdir(cat_dir) if f.lower().endswith(IMAGE_EXTENSIONS))
+    derivatives = read_manifest(cat_dir)
+    for i, filename in enumerate(image_files, 1):
+        image_uri = iri(f"image_{normalize_name(category)}_{i}")
+        image_url = f"{BASE_URL}/images/{category}/{filename}"
+        lines += [
+            rdf_type(image_uri, "FoodImage"),
+            triple(image_uri, iri("isImageOf"), food_uri),
+            triple(image_uri, iri("imageUrl"), literal(image_url)),
+            triple(image_uri, iri("fileName"), literal(filename)),
+        ]
+        # Derivatives written by image_derivatives.py, smallest first
+        widths = sorted(derivatives.get(filename, {}).items(), key=lambda item: item[1])
+        if widths:
+            lines += [
+                triple(image_uri, iri("thumbnailUrl"), literal(f"{image_url}?size={widths[0][0]}")),
+                triple(image_uri, iri("imageSrcset"),
+                       literal(", ".join(f"{image_url}?size={size} {width}w" for size, width in widths))),
+            ]
+    return lines
+
+def disease_triples(disease_entry):
+    """N-Triples for one disease: its family, properties, documents and treatment protocols"""
+    disease_name = disease_entry["diseaseName"]
+    disease_uri = iri(f"disease_{normalize_name(disease_name)}")
+    family_name = disease_entry["diseaseFamilyName"]
+    family_uri = iri(f"family_{normalize_name(family_name)}")
+    lines = [
+        rdf_type(family_uri, "DiseaseFamily"),
+        triple(family_uri, iri("diseaseFamilyName"), literal(family_name)),
+        rdf_type(disease_uri, "Disease"),
+        triple(disease_uri, iri("diseaseName"), literal(disease_name)),
+        triple(disease_uri, iri("belongTo"), family_uri),
+    ]
 
-    for category in os.listdir(FOODS_DIR):
+    if isinstance(disease_entry.get("symptoms"), list):
+        lines.append(triple(disease_uri, iri("symptoms"), literal(", ".join(disease_entry["symptoms"]))))
+    for prop_name in ("sex", "mostCommonSubjectKind"):
+        if disease_entry.get(prop_name):
+            lines.append(triple(disease_uri, iri(prop_name), literal(disease_entry[prop_name])))
+
+    disease_dir_name = normalize_name(disease_name)
+    disease_dir = os.path.join(DISEASES_DIR, disease_dir_name)
+    if not os.path.isdir(disease_dir):
+        return lines
+
+    documents = sorted(
+        f for f in os.listdir(disease_dir)
+        if f.endswith(".pdf") and not os.path.isdir(os.path.join(disease_dir, f))
+    )
+    for i, filename in enumerate(documents, 1):
+        doc_uri = iri(f"doc_{disease_dir_name}_{i}")
+        lines += [
+            rdf_type(doc_uri, "DiseaseDocument"),
+            triple(doc_uri, iri("documentUrl"), literal(f"{BASE_URL}/documents/{disease_dir_name}/{filename}")),
+            triple(doc_uri, iri("fileName"), literal(filename)),
+            triple(disease_uri, iri("isDocumentedBy"), doc_uri),
+        ]
+
+    treatment_dir = os.path.join(disease_dir, "treatment_protocol")
+    if os.path.isdir(treatment_dir):
+        treatments = sorted(f for f in os.listdir(treatment_dir) if f.endswith(".pdf"))
+        for i, filename in enumerate(treatments, 1):
+            treatment_uri = iri(f"treatment_{disease_dir_name}_{i}")
+            lines += [
+                rdf_type(treatment_uri, "TreatmentProtocol"),
+                triple(treatment_uri, iri("documentUrl"),
+                       literal(f"{BASE_URL}/documents/{disease_dir_name}/treatment_protocol/{filename}")),
+                triple(treatment_uri, iri("fileName"), literal(filename)),
+                triple(disease_uri, iri("hasTreatmentProtocol"), treatment_uri),
+            ]
+    return lines
+
+def mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+def fingerprint(*parts):
+    """Hash of an entity's JSON entry and directory mtimes; changes whenever its triples may"""
+    payload = json.dumps([BASE_URL, *parts], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def entities(food_data, disease_data):
+    """Yield (key, fingerprint, builder, args) for every food and disease"""
+    for category in sorted(os.listdir(FOODS_DIR)):
         cat_dir = os.path.join(FOODS_DIR, category)
         if not os.path.isdir(cat_dir):
             continue
-
-        # Create single Food instance per category
-        food_uri = ex[f"food_{normalize_name(category)}"]
-        g.add((food_uri, RDF.type, ex.Food))
-        g.add((food_uri, ex.foodName, Literal(category, datatype=XSD.string)))
-
-        # Add food properties from JSON if available
-        if category in food_data:
-            food_info = food_data[category]
-            
-            # Add basic properties
-            for prop_name, rdf_prop in [
-                ("ingredients", ex.ingredients),
-                ("recipe", ex.recipe),
-                ("foodLocationArea", ex.foodLocationArea),
-                ("isRawOrCooked", ex.isRawOrCooked),
-                ("eatingTime", ex.eatingTime)
-            ]:
-                if prop_name in food_info and food_info[prop_name]:
-                    g.add((food_uri, rdf_prop, Literal(food_info[prop_name], datatype=XSD.string)))
-            
-            # Handle calories (integer)
-            if "calories" in food_info and food_info["calories"] is not None:
-                try:
-                    calories = int(food_info["calories"])
-                    g.add((food_uri, ex.calorieIntake, Literal(calories, datatype=XSD.integer)))
-                except (ValueError, TypeError):
-                    print(f"Warning: Invalid calorie value for {category}: {food_info['calories']}")
-
-            # Link to related diseases
-            if "relatedDiseases" in food_info and isinstance(food_info["relatedDiseases"], list):
-                for disease_name in food_info["relatedDiseases"]:
-                    if disease_name and disease_name.strip():
-                        disease_uri = ex[f"disease_{normalize_name(disease_name)}"]
-                        g.add((food_uri, ex.isRelatedTo, disease_uri))
-
-        # Process all images for this food
-        image_files = [f for f in os.listdir(cat_dir) 
-                      if f.lower().endswith(('.jpg', '.jpeg', '.png', '.webp'))]
-        
-        for i, filename in enumerate(image_files, 1):
-            # Create unique FoodImage instance
-            image_uri = ex[f"image_{normalize_name(category)}_{i}"]
-            g.add((image_uri, RDF.type, ex.FoodImage))
-            g.add((image_uri, ex.isImageOf, food_uri))
-            
-            # Add image URL using BASE_URL
-            image_url = f"{BASE_URL}/images/{category}/{filename}"
-            g.add((image_uri, ex.imageUrl, Literal(image_url, datatype=XSD.string)))
-            
-            # Add image filename for reference
-            g.add((image_uri, ex.fileName, Literal(filename, datatype=XSD.string)))
-
-        print(f"Processed food '{category}' with {len(image_files)} images")
-
-except FileNotFoundError as e:
-    print(f"Error: {e}")
-    sys.exit(1)
-except Exception as e:
-    print(f"Error processing foods: {e}")
-    sys.exit(1)
-
-# Process Diseases directory and data
-try:
-    if not os.path.exists(DISEASES_DIR):
-        raise FileNotFoundError(f"Diseases directory not found at {DISEASES_DIR}")
+        food_info = food_data.get(category, {})
+        digest = fingerprint(food_info, mtime(cat_dir), manifest_mtime(cat_dir))
+        yield f"food:{category}", digest, food_triples, (category, food_info)
 
     for disease_entry in disease_data:
-        disease_name = disease_entry["diseaseName"]
-        disease_uri = ex[f"disease_{normalize_name(disease_name)}"]
-        
-        # Create disease family
-        family_name = disease_entry["diseaseFamilyName"]
-        family_uri = ex[f"family_{normalize_name(family_name)}"]
-        g.add((family_uri, RDF.type, ex.DiseaseFamily))
-        g.add((family_uri, ex.diseaseFamilyName, Literal(family_name, datatype=XSD.string)))
-
-        # Create disease
-        g.add((disease_uri, RDF.type, ex.Disease))
-        g.add((disease_uri, ex.diseaseName, Literal(disease_name, datatype=XSD.string)))
-        g.add((disease_uri, ex.belongTo, family_uri))
-        
-        # Add disease properties
-        if "symptoms" in disease_entry and isinstance(disease_entry["symptoms"], list):
-            symptoms_str = ", ".join(disease_entry["symptoms"])
-            g.add((disease_uri, ex.symptoms, Literal(symptoms_str, datatype=XSD.string)))
-        
-        for prop_name, rdf_prop in [
-            ("sex", ex.sex),
-            ("mostCommonSubjectKind", ex.mostCommonSubjectKind)
-        ]:
-            if prop_name in disease_entry and disease_entry[prop_name]:
-                g.add((disease_uri, rdf_prop, Literal(disease_entry[prop_name], datatype=XSD.string)))
-
-        # Process disease documents
-        disease_dir_name = normalize_name(disease_name)
-        disease_dir = os.path.join(DISEASES_DIR, disease_dir_name)
-        
-        if os.path.isdir(disease_dir):
-            # Process general disease documents
-            doc_count = 0
-            for filename in os.listdir(disease_dir):
-                if filename.endswith(".pdf") and not os.path.isdir(os.path.join(disease_dir, filename)):
-                    doc_count += 1
-                    doc_uri = ex[f"doc_{normalize_name(disease_name)}_{doc_count}"]
-                    g.add((doc_uri, RDF.type, ex.DiseaseDocument))
-                    
-                    doc_url = f"{BASE_URL}/documents/{disease_dir_name}/{filename}"
-                    g.add((doc_uri, ex.documentUrl, Literal(doc_url, datatype=XSD.string)))
-                    g.add((doc_uri, ex.fileName, Literal(filename, datatype=XSD.string)))
-                    g.add((disease_uri, ex.isDocumentedBy, doc_uri))
-
-            # Process treatment protocols
-            treatment_dir = os.path.join(disease_dir, "treatment_protocol")
-            if os.path.isdir(treatment_dir):
-                treatment_count = 0
-                for filename in os.listdir(treatment_dir):
-                    if filename.endswith(".pdf"):
-                        treatment_count += 1
-                        treatment_uri = ex[f"treatment_{normalize_name(disease_name)}_{treatment_count}"]
-                        g.add((treatment_uri, RDF.type, ex.TreatmentProtocol))
-                        
-                        treatment_url = f"{BASE_URL}/documents/{disease_dir_name}/treatment_protocol/{filename}"
-                        g.add((treatment_uri, ex.documentUrl, Literal(treatment_url, datatype=XSD.string)))
-                        g.add((treatment_uri, ex.fileName, Literal(filename, datatype=XSD.string)))
-                        g.add((disease_uri, ex.hasTreatmentProtocol, treatment_uri))
-
-        print(f"Processed disease '{disease_name}'")
-
-except FileNotFoundError as e:
-    print(f"Error: {e}")
-    sys.exit(1)
-except Exception as e:
-    print(f"Error processing diseases: {e}")
-    sys.exit(1)
-
-# Serialize the graph
-try:
-    g.serialize(destination=OUTPUT, format='turtle')
-    total_triples = len(g)
-    print(f"\nSuccessfully wrote {total_triples} triples to {OUTPUT}")
-    print(f"Output file location: {os.path.abspath(OUTPUT)}")
-    print(f"Generated on: June 2, 2025")
-except Exception as e:
-    print(f"Error writing output: {e}")
-    sys.exit(1)
\ No newline at end of file
+        disease_dir = os.path.join(DISEASES_DIR, normalize_name(disease_entry["diseaseName"]))
+        key = f"disease:{disease_entry['diseaseName']}"
+        digest = fingerprint(disease_entry, mtime(disease_dir), mtime(os.path.join(disease_dir, "treatment_protocol")))
+        yield key, digest, disease_triples, (disease_entry,)
+
+def _build(job):
+    key, builder, args = job
+    return key, builder(*args)
+
+def _build_batch(batch):
+    return [_build(job) for job in batch]
+
+def build_all(pool, jobs, workers, batch_size=16):
+    """Yield (key, lines) for each job in order, with at most two batches per worker in flight.
+
+    Unlike pool.map, jobs are only taken from the iterator as results are
+    consumed, so a large entity set is never all queued (or all held) at once.
+    """
+    jobs = iter(jobs)
+    pending = deque()
+    for batch in iter(lambda: list(islice(jobs, batch_size)), []):
+        pending.append(pool.submit(_build_batch, batch))
+        if len(pending) >= 2 * workers:
+            yield from pending.popleft().result()
+    while pending:
+        yield from pending.popleft().result()
+
+def load_manifest():
+    try:
+        with open(MANIFEST) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def save_manifest(manifest):
+    tmp = MANIFEST + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp, MANIFEST)
+
+def all_triples(manifest):
+    return {line for entry in manifest.values() for line in entry["triples"]}
+
+def write_ntriples(lines, path, graph=None):
+    with NTriplesWriter(path, graph) as writer:
+        writer.write_all(sorted(lines))
+
+def write_turtle(lines, path):
+    """Serialize the whole graph with rdflib.
+
+    --incremental only saves rebuilding unchanged entities: the turtle output
+    is still parsed and written from every triple. --format nt writes without
+    rdflib and is the fast path for large or frequent runs.
+    """
+    from rdflib import Graph, Namespace
+    g = Graph()
+    g.bind("ex", Namespace(BASE))
+    g.parse(data="\n".join(lines), format="nt")
+    g.serialize(destination=path, format="turtle")
+
+def write_diff(added, removed, path):
+    """SPARQL Update turning the previous output into the new one; POST it to Fuseki's /update endpoint"""
+    with open(path, "w", encoding="utf-8") as f:
+        if removed:
+            f.write("DELETE DATA {\n" + "\n".join(sorted(removed)) + "\n} ;\n")
+        if added:
+            f.write("INSERT DATA {\n" + "\n".join(sorted(added)) + "\n}\n")
+
+def stream(food_data, disease_data, output, graph, canonical, workers):
+    """Write every entity's triples to `output` as soon as they are built; memory stays flat"""
+    jobs = ((key, builder, builder_args) for key, _, builder, builder_args in entities(food_data, disease_data))
+    target = output + ".unsorted" if canonical else output
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool, NTriplesWriter(target, graph) as writer:
+            for key, lines in build_all(pool, jobs, workers):
+                writer.write_all(lines)
+        count = writer.count
+        if canonical:
+            # Shared triples (e.g. disease families) are emitted once per entity; sorting dedupes them
+            count = sort_ntriples(target, output)
+            os.remove(target)
+    except Exception as e:
+        print(f"Error generating data: {e}")
+        sys.exit(1)
+    print(f"\nSuccessfully wrote {count} triples to {output}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the food/disease instance data")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only rebuild foods and diseases whose JSON entry or directory changed since the last run")
+    parser.add_argument("--format", choices=["turtle", "nt", "nq"], default="turtle",
+                        help="output syntax; nt and nq are written directly, without rdflib")
+    parser.add_argument("--graph", default=f"{BASE}data", help="graph IRI for --format nq")
+    parser.add_argument("--gzip", action="store_true", help="gzip nt/nq output (adds .gz to the default name)")
+    parser.add_argument("--stream", action="store_true",
+                        help="write nt/nq triples as each entity is processed instead of keeping them for the manifest")
+    parser.add_argument("--sort", action="store_true",
+                        help="with --stream, rewrite the output sorted and deduplicated (canonical form, for diffing)")
+    parser.add_argument("--output", help="output file (default: ../food_disease_data.ttl, .nt or .nq)")
+    parser.add_argument("--diff", help="also write the triples added/removed since the last run as a SPARQL Update to this file")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes scanning entity directories")
+    args = parser.parse_args()
+
+    if args.stream and args.format == "turtle":
+        parser.error("--stream needs --format nt or nq")
+    if args.stream and (args.incremental or args.diff):
+        parser.error("--stream keeps no per-entity triples, so it can't be combined with --incremental or --diff")
+    output = args.output or (OUTPUT if args.format == "turtle" else os.path.splitext(OUTPUT)[0] + "." + args.format)
+    if args.gzip and args.format != "turtle" and not output.endswith(".gz"):
+        output += ".gz"
+    graph = args.graph if args.format == "nq" else None
+
+    # Load food and disease data
+    try:
+        with open(FOOD_DATA_FILE, 'r') as f:
+            food_data = json.load(f)
+    except FileNotFoundError:
+        print(f"Error: {FOOD_DATA_FILE} not found")
+        sys.exit(1)
+
+    try:
+        with open(DISEASE_DATA_FILE, 'r') as f:
+            disease_data = json.load(f)
+    except FileNotFoundError:
+        print(f"Error: {DISEASE_DATA_FILE} not found")
+        sys.exit(1)
+
+    for directory in (FOODS_DIR, DISEASES_DIR):
+        if not os.path.exists(directory):
+            print(f"Error: directory not found at {directory}")
+            sys.exit(1)
+
+    if args.stream:
+        stream(food_data, disease_data, output, graph, args.sort, args.workers)
+        return
+
+    previous = load_manifest()
+    manifest, jobs = {}, []
+    for key, digest, builder, builder_args in entities(food_data, disease_data):
+        entry = previous.get(key)
+        if args.incremental and entry is not None and entry["fingerprint"] == digest:
+            manifest[key] = entry
+        else:
+            manifest[key] = {"fingerprint": digest, "triples": []}
+            jobs.append((key, builder, builder_args))
+
+    # Listing entity directories and building their triples is independent per entity
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            for key, lines in build_all(pool, jobs, args.workers):
+                manifest[key]["triples"] = lines
+                print(f"Processed {key}")
+    except Exception as e:
+        print(f"Error processing entities: {e}")
+        sys.exit(1)
+
+    removed_entities = [key for key in previous if key not in manifest]
+    print(f"{len(jobs)} entities rebuilt, {len(manifest) - len(jobs)} unchanged, {len(removed_entities)} removed")
+
+    # Serialize the graph
+    try:
+        lines = all_triples(manifest)
+        if args.diff:
+            old_lines = all_triples(previous)
+            added, removed = lines - old_lines, old_lines - lines
+            write_diff(added, removed, args.diff)
+            print(f"Wrote diff ({len(added)} added, {len(removed)} removed triples) to {args.diff}")
+        if args.format != "turtle":
+            write_ntriples(lines, output, graph)
+        else:
+            write_turtle(lines, output)
+        save_manifest(manifest)
+        print(f"\nSuccessfully wrote {len(lines)} triples to {output}")
+        print(f"Output file location: {os.path.abspath(output)}")
+    except Exception as e:
+        print(f"Error writing output: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""Pre-generate resized WebP and JPEG derivatives of the food images.
+
+For every original in data/Foods/<food>/, writes one WebP and one JPEG per
+size of app/images.py's IMAGE_SIZES under data/Foods/<food>/derived/, never
+upscaling: sizes wider than the original are skipped, except the smallest so
+every image has a thumbnail. Images are resized in a process pool, and an
+image whose derivatives are newer than it is left alone, so re-runs only
+touch new or changed files. Each derived/ directory gets a derivatives.json
+with the widths actually written; generate_food_disease_data.py reads it to
+record the thumbnail and srcset URLs in the knowledge graph, so run this
+stage first:
+
+    python rdf_triple/script/image_derivatives.py && python rdf_triple/script/generate_food_disease_data.py
+
+Needs Pillow (pip install Pillow).
+"""
+import os
+import sys
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+FOODS_DIR = os.path.join(SCRIPT_DIR, "../../data", "Foods")
+sys.path.insert(0, os.path.join(SCRIPT_DIR, "..", "..", "app"))
+
+from images import DERIVED_DIR, IMAGE_SIZES, derivative_name  # noqa: E402
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+MANIFEST_NAME = "derivatives.json"
+QUALITY = {"webp": 80, "jpeg": 82}
+# EXIF orientations that rotate the image by 90 degrees, swapping width and height
+_TRANSPOSED = (5, 6, 7, 8)
+
+
+def read_manifest(food_dir):
+    """{original filename: {size: width}} of the derivatives written for a food, {} if there are none"""
+    try:
+        with open(os.path.join(food_dir, DERIVED_DIR, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def manifest_mtime(food_dir):
+    try:
+        return os.stat(os.path.join(food_dir, DERIVED_DIR, MANIFEST_NAME)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def planned_widths(width):
+    """{size: output width} for an original `width` pixels wide"""
+    smallest = min(IMAGE_SIZES, key=IMAGE_SIZES.get)
+    return {size: min(max_width, width) for size, max_width in IMAGE_SIZES.items()
+            if max_width < width or size == smallest}
+
+
+def _is_fresh(path, source_mtime):
+    try:
+        return os.stat(path).st_mtime_ns >= source_mtime
+    except FileNotFoundError:
+        return False
+
+
+def _save(image, path, fmt):
+    tmp = path + ".tmp"
+    if fmt == "jpeg" and image.mode != "RGB":
+        from PIL import Image
+        if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+            # JPEG has no alpha channel: flatten onto white instead of black
+            rgba = image.convert("RGBA")
+            background = Image.new("RGB", rgba.size, (255, 255, 255))
+            background.paste(rgba, mask=rgba.getchannel("A"))
+            image = background
+        else:
+            image = image.convert("RGB")
+    image.save(tmp, format=fmt.upper(), quality=QUALITY[fmt], optimize=True)
+    os.replace(tmp, path)
+
+
+def build(job):
+    """Write the missing or stale derivatives of one original; returns (food dir, filename, widths, written, error)"""
+    food_dir, filename, force = job
+    try:
+        from PIL import Image, ImageOps
+        source = os.path.join(food_dir, filename)
+        source_mtime = os.stat(source).st_mtime_ns
+        with Image.open(source) as original:
+            width = original.height if original.getexif().get(0x0112, 1) in _TRANSPOSED else original.width
+            widths = planned_widths(width)
+            outputs = {
+                (size, fmt): os.path.join(food_dir, derivative_name(filename, size, fmt))
+                for size in widths for fmt in QUALITY
+            }
+            stale = {key: path for key, path in outputs.items() if force or not _is_fresh(path, source_mtime)}
+            if stale:
+                os.makedirs(os.path.join(food_dir, DERIVED_DIR), exist_ok=True)
+                # JPEGs can be decoded at a reduced scale when only smaller sizes are needed
+                scale = max(widths.values()) / width
+                original.draft("RGB", (round(original.width * scale), round(original.height * scale)))
+                image = ImageOps.exif_transpose(original)
+                for size in dict.fromkeys(size for size, _ in stale):
+                    target = (widths[size], max(1, round(image.height * widths[size] / image.width)))
+                    resized = image.resize(target, Image.LANCZOS) if target != image.size else image
+                    for (stale_size, fmt), path in stale.items():
+                        if stale_size == size:
+                            _save(resized, path, fmt)
+        return food_dir, filename, widths, len(stale), None
+    except Exception as e:
+        return food_dir, filename, {}, 0, str(e)
+
+
+def jobs(force):
+    """Every food directory, one job per original image, and warnings about colliding derivative names"""
+    food_dirs, work, warnings = [], [], []
+    for food in sorted(os.listdir(FOODS_DIR)):
+        food_dir = os.path.join(FOODS_DIR, food)
+        if not os.path.isdir(food_dir):
+            continue
+        food_dirs.append(food_dir)
+        stems = {}
+        for filename in sorted(os.listdir(food_dir)):
+            if not filename.lower().endswith(IMAGE_EXTENSIONS) or not os.path.isfile(os.path.join(food_dir, filename)):
+                continue
+            stem = os.path.splitext(filename)[0]
+            if stem in stems:
+                warnings.append(f"{food}/{filename}: derivatives would overwrite those of {stems[stem]}, skipped")
+                continue
+            stems[stem] = filename
+            work.append((food_dir, filename, force))
+    return food_dirs, work, warnings
+
+
+def write_manifests(results):
+    """Write each food's derivatives.json and remove derivatives that no original produces any more"""
+    removed = 0
+    for food_dir, widths_by_file in results.items():
+        derived_dir = os.path.join(food_dir, DERIVED_DIR)
+        if not os.path.isdir(derived_dir):
+            continue
+        expected = {
+            os.path.basename(derivative_name(filename, size, fmt))
+            for filename, widths in widths_by_file.items() for size in widths for fmt in QUALITY
+        }
+        for name in os.listdir(derived_dir):
+            if name != MANIFEST_NAME and name not in expected:
+                os.remove(os.path.join(derived_dir, name))
+                removed += 1
+        manifest = os.path.join(derived_dir, MANIFEST_NAME)
+        if read_manifest(food_dir) != widths_by_file:
+            # Only rewritten on change: its mtime is part of the generator's --incremental fingerprint
+            with open(manifest + ".tmp", "w") as f:
+                json.dump(widths_by_file, f, sort_keys=True)
+            os.replace(manifest + ".tmp", manifest)
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate resized WebP/JPEG derivatives of the food images")
+    parser.add_argument("--force", action="store_true", help="regenerate every derivative, even up-to-date ones")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processes resizing images")
+    args = parser.parse_args()
+
+    if not os.path.isdir(FOODS_DIR):
+        print(f"Error: directory not found at {FOODS_DIR}")
+        sys.exit(1)
+
+    food_dirs, work, warnings = jobs(args.force)
+    for warning in warnings:
+        print(f"Warning: {warning}")
+
+    results = {food_dir: {} for food_dir in food_dirs}
+    written, failed = 0, set()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for food_dir, filename, widths, count, error in pool.map(build, work, chunksize=8):
+            if error:
+                failed.add(food_dir)
+                print(f"Error: {os.path.basename(food_dir)}/{filename}: {error}")
+                continue
+            results[food_dir][filename] = widths
+            written += count
+
+    # A food with a failed image keeps its previous manifest and derivatives until the next run
+    removed = write_manifests({food_dir: widths for food_dir, widths in results.items() if food_dir not in failed})
+    print(f"{len(work)} images, {written} derivatives written, {removed} obsolete derivatives removed, "
+          f"{len(failed)} foods with failures")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Streaming N-Triples / N-Quads output for the generator scripts.
+
+Lines are written as they are produced, so memory does not grow with the
+graph. `sort_ntriples` produces the canonical form (sorted, duplicates
+removed) with an external merge sort for outputs that don't fit in memory.
+"""
+import gzip
+import heapq
+import os
+import tempfile
+from itertools import islice
+
+
+def open_text(path, mode):
+    """Open a UTF-8 text file, gzip-compressed when the name ends in .gz"""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8", compresslevel=6)
+    return open(path, mode, encoding="utf-8")
+
+
+class NTriplesWriter:
+    """Writes N-Triples lines to a file, or N-Quads when a graph IRI is given"""
+
+    def __init__(self, path, graph=None):
+        self.path = path
+        self.graph = graph
+        self.count = 0
+        self._file = None
+
+    def __enter__(self):
+        self._file = open_text(self.path, "w")
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, line):
+        if self.graph:
+            # "<s> <p> <o> ." -> "<s> <p> <o> <g> ."
+            line = f"{line[:-1].rstrip()} <{self.graph}> ."
+        self._file.write(line + "\n")
+        self.count += 1
+
+    def write_all(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _sorted_runs(lines, run_size, tmp_dir):
+    runs = []
+    while True:
+        run = sorted(set(islice(lines, run_size)))
+        if not run:
+            return runs
+        fd, path = tempfile.mkstemp(suffix=".nt", dir=tmp_dir)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.writelines(line + "\n" for line in run)
+        runs.append(path)
+
+
+def sort_ntriples(src, dst, run_size=500_000, tmp_dir=None):
+    """Write the lines of `src` to `dst` sorted and deduplicated, holding at most `run_size` lines in memory"""
+    runs = []
+    try:
+        with open_text(src, "r") as f:
+            runs = _sorted_runs((line.rstrip("\n") for line in f if line.strip()), run_size, tmp_dir)
+        files = [open(path, encoding="utf-8") for path in runs]
+        try:
+            count, previous = 0, None
+            with open_text(dst, "w") as out:
+                for line in heapq.merge(*files):
+                    if line != previous:
+                        out.write(line)
+                        count += 1
+                        previous = line
+        finally:
+            for f in files:
+                f.close()
+        return count
+    finally:
+        for path in runs:
+            os.remove(path)
@@ -0,0 +1,121 @@
+"""Shared fixtures: the Flask and Quart apps with their asset directories in a temporary folder.
+
+The apps are imported with unreachable backends, so only routes that don't
+query Fuseki or Solr are exercised here, apart from the Flask routes served
+from the small in-process graph of the `local_kg` fixture.
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "app"))
+os.environ.setdefault("SPARQL_URL", "http://127.0.0.1:9/sparql")
+os.environ.setdefault("FOOD_SOLR_SELECT", "http://127.0.0.1:9/solr/food_collection/select")
+os.environ.setdefault("DISEASE_SOLR_SELECT", "http://127.0.0.1:9/solr/disease_collection/select")
+
+import app as flask_app  # noqa: E402
+import async_app  # noqa: E402
+from cache import SnapshotCache  # noqa: E402
+from kg_queries import EX  # noqa: E402
+from local_graph import LocalGraph  # noqa: E402
+from views import ViewStore  # noqa: E402
+
+IMAGE = b"\xff\xd8\xff\xe0 not really a jpeg"
+DOCUMENT = b"%PDF-1.4 not really a pdf"
+
+
+@pytest.fixture
+def asset_dirs(tmp_path, monkeypatch):
+    """An image at /images/apple/1.jpg and a document at /documents/disease_1/doc_1.pdf"""
+    foods, diseases = tmp_path / "images", tmp_path / "documents"
+    (foods / "apple").mkdir(parents=True)
+    (foods / "apple" / "1.jpg").write_bytes(IMAGE)
+    (diseases / "disease_1").mkdir(parents=True)
+    (diseases / "disease_1" / "doc_1.pdf").write_bytes(DOCUMENT)
+    for module in (flask_app, async_app):
+        monkeypatch.setattr(module, "FOODS_DIR", str(foods))
+        monkeypatch.setattr(module, "DISEASES_DIR", str(diseases))
+    return tmp_path
+
+
+def ntriple(s, p, o):
+    """One N-Triples line; `o` is an ex: local name, or a literal when given as a str"""
+    obj = f'<{EX}{o[1:]}>' if o.startswith(':') else '"' + o.replace('"', '\\"') + '"'
+    return f"<{EX}{s}> <{EX}{p}> {obj} ."
+
+
+def food(name, label, calories, ingredients, diseases, images=(), **fields):
+    lines = [f"<{EX}{name}> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <{EX}Food> .",
+             ntriple(name, "foodName", label), ntriple(name, "calorieIntake", str(calories)),
+             ntriple(name, "ingredients", ingredients)]
+    lines += [ntriple(name, field, value) for field, value in fields.items()]
+    lines += [ntriple(name, "isRelatedTo", f":{disease}") for disease in diseases]
+    for n, url in enumerate(images):
+        lines += [ntriple(f"{name}_image_{n}", "isImageOf", f":{name}"), ntriple(f"{name}_image_{n}", "imageUrl", url)]
+    return lines
+
+
+def disease(name, label, family, family_label, documents=()):
+    lines = [f"<{EX}{name}> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <{EX}Disease> .",
+             ntriple(name, "diseaseName", label), ntriple(name, "symptoms", f"{label} symptoms"),
+             ntriple(name, "sex", "Both"), ntriple(name, "mostCommonSubjectKind", "Adult"),
+             ntriple(name, "belongTo", f":{family}"), ntriple(family, "diseaseFamilyName", family_label)]
+    for n, url in enumerate(documents):
+        lines += [ntriple(name, "isDocumentedBy", f":{name}_doc_{n}"), ntriple(f"{name}_doc_{n}", "documentUrl", url)]
+    return lines
+
+
+# Two foods, three diseases in two families; the apple has more images than a card shows
+KG = [
+    ntriple("dataset_meta", "dataVersion", "1"),
+    *food("apple", "Apple", 95, "Apples, sugar (cane)", ["diabetes"],
+          images=[f"/images/apple/{n}.jpg" for n in range(7, 0, -1)],
+          eatingTime="Breakfast", foodLocationArea="Europe", isRawOrCooked="Raw"),
+    *food("bread", "Bread", 250, "Wheat flour, eggs, salt", ["diabetes", "celiac"],
+          eatingTime="Breakfast, Lunch", foodLocationArea="Europe", isRawOrCooked="Cooked"),
+    *disease("celiac", "Celiac Disease", "digestive", "Digestive"),
+    *disease("diabetes", "Diabetes", "metabolic", "Metabolic", documents=["/documents/diabetes/doc_1.pdf"]),
+    *disease("gout", "Gout", "metabolic", "Metabolic"),
+]
+
+
+@pytest.fixture
+def local_kg(monkeypatch):
+    """The Flask app on GRAPH_BACKEND=local over KG, with empty snapshot and view caches"""
+    graph = LocalGraph(lambda: KG)
+    snapshot_cache = SnapshotCache(ttl=0, version_fn=flask_app.fetch_data_version, version_interval=0)
+    monkeypatch.setattr(flask_app, "graph", graph)
+    monkeypatch.setattr(flask_app, "snapshot_cache", snapshot_cache)
+    monkeypatch.setattr(flask_app, "views", ViewStore(flask_app.load_views, version_fn=snapshot_cache.current_version))
+    return graph
+
+
+class Reply:
+    """The parts of a Flask or Quart test response the tests compare"""
+
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+def flask_get(path, headers=None):
+    response = flask_app.app.test_client().get(path, headers=headers or {})
+    return Reply(response.status_code, response.headers, response.get_data())
+
+
+def quart_get(path, headers=None):
+    async def get():
+        response = await async_app.app.test_client().get(path, headers=headers or {})
+        return Reply(response.status_code, response.headers, await response.get_data())
+    return asyncio.run(get())
+
+
+@pytest.fixture(params=["flask", "quart"])
+def get(request):
+    """GET a path from each app in turn"""
+    return flask_get if request.param == "flask" else quart_get
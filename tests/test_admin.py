@@ -0,0 +1,24 @@
+import pytest
+
+import shaping
+
+
+@pytest.fixture
+def admin_token(monkeypatch):
+    monkeypatch.setattr(shaping, "ADMIN_TOKEN", "s3cret")
+    return "s3cret"
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Admin-Token": ""}, {"X-Admin-Token": "s3cre"}, {"X-Admin-Token": "s3cret!"},
+                                     {"X-Admin-Token": "sécret"}])
+def test_admin_cache_rejects_missing_or_wrong_tokens(admin_token, get, headers):
+    assert get("/api/admin/cache", headers).status == 403
+
+
+def test_admin_cache_accepts_the_token(admin_token, get):
+    assert get("/api/admin/cache", {"X-Admin-Token": admin_token}).status == 200
+
+
+def test_admin_cache_is_closed_without_a_configured_token(monkeypatch, get):
+    monkeypatch.setattr(shaping, "ADMIN_TOKEN", "")
+    assert get("/api/admin/cache", {"X-Admin-Token": ""}).status == 403
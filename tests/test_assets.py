@@ -0,0 +1,43 @@
+import pytest
+
+from conftest import flask_get, quart_get
+
+ASSETS = ["/images/apple/1.jpg", "/documents/disease_1/doc_1.pdf"]
+
+
+@pytest.mark.parametrize("path", ASSETS)
+def test_asset_responses_carry_max_age_and_no_expires(asset_dirs, get, path):
+    response = get(path)
+    assert response.status == 200
+    assert "Expires" not in response.headers
+    assert "max-age=" in response.headers["Cache-Control"]
+
+
+@pytest.mark.parametrize("path", ASSETS)
+def test_revalidation_and_versioned_responses_have_no_expires(asset_dirs, get, path):
+    etag = get(path).headers["ETag"]
+
+    not_modified = get(path, {"If-None-Match": etag})
+    assert not_modified.status == 304
+    assert "Expires" not in not_modified.headers
+
+    version = etag.strip('"')
+    versioned = get(f"{path}?v={version}")
+    assert versioned.status == 200
+    assert "immutable" in versioned.headers["Cache-Control"]
+    assert "Expires" not in versioned.headers
+
+
+@pytest.mark.parametrize("path, error", [
+    ("/images/apple/missing.jpg", "Image not found"),
+    ("/images/missing/1.jpg?size=thumb", "Image not found"),
+    ("/documents/disease_1/missing.pdf", "Document not found"),
+    ("/documents/../secret.pdf", "Document not found"),
+])
+def test_missing_assets_get_the_same_json_404_from_both_apps(asset_dirs, path, error):
+    replies = [flask_get(path), quart_get(path)]
+    for reply in replies:
+        assert reply.status == 404
+        assert reply.headers["Content-Type"].startswith("application/json")
+    assert replies[0].body == replies[1].body
+    assert error in replies[0].body.decode()
@@ -0,0 +1,90 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from async_backends import AsyncBackendClient
+from backends import BackendClient, CircuitBreaker
+
+
+@pytest.fixture
+def server():
+    """A local backend: /slow answers after 1 s, /unavailable with a 503; `hits` counts calls per path"""
+    hits = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits[self.path] = hits.get(self.path, 0) + 1
+            if self.path == "/slow":
+                time.sleep(1)
+            self.send_response(503 if self.path == "/unavailable" else 200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}", hits
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_read_timeouts_are_not_retried(server):
+    url, hits = server
+    client = BackendClient("test", read_timeout=0.2, retries=2, backoff=0)
+    start = time.perf_counter()
+    with pytest.raises(requests.exceptions.ConnectionError):
+        client.get(f"{url}/slow")
+    assert hits["/slow"] == 1
+    assert time.perf_counter() - start < 0.9
+
+
+def test_unavailable_responses_are_retried(server):
+    url, hits = server
+    client = BackendClient("test", read_timeout=1, retries=2, backoff=0)
+    assert client.get(f"{url}/unavailable").status_code == 503
+    assert hits["/unavailable"] == 3
+
+
+def test_an_abandoned_trial_lets_the_next_request_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_a_trial_that_never_reports_is_replaced_after_the_reset_timeout():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_a_cancelled_async_trial_does_not_keep_the_circuit_half_open(server):
+    url, hits = server
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    client = AsyncBackendClient("test", breaker=breaker)
+
+    async def cancel_trial():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(client.get(f"{url}/slow"), 0.1)
+        await client.aclose()
+
+    asyncio.run(cancel_trial())
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.allow()
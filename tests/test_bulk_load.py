@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+import bulk_load
+
+ONTOLOGY = os.path.join(bulk_load.RDF_DIR, "food_disease.ttl")
+
+
+@pytest.fixture
+def sent(tmp_path, monkeypatch):
+    """The triples each hot load POSTs and DELETEs, instead of sending them to an initially empty Fuseki"""
+    calls = {"post": [], "delete": []}
+    stored = []
+    monkeypatch.setattr(bulk_load, "LOAD_STATE", str(tmp_path / "state.nt"))
+    monkeypatch.setattr(bulk_load, "store_is_empty", lambda: not stored)
+
+    def post(chunk):
+        calls["post"].extend(chunk)
+        stored.extend(chunk)
+
+    monkeypatch.setattr(bulk_load, "post_ntriples", post)
+    monkeypatch.setattr(bulk_load, "delete_ntriples", lambda chunk: calls["delete"].extend(chunk))
+    return calls
+
+
+def test_blank_nodes_are_labelled_the_same_on_every_parse():
+    first = set(bulk_load.ntriples_lines(ONTOLOGY))
+    assert any("_:" in line for line in first)
+    assert set(bulk_load.ntriples_lines(ONTOLOGY)) == first
+
+
+def test_an_unchanged_ontology_is_not_sent_again(sent):
+    bulk_load.hot_load([ONTOLOGY])
+    assert sent["post"]
+    sent["post"].clear()
+
+    bulk_load.hot_load([ONTOLOGY])
+    assert sent == {"post": [], "delete": []}
+
+
+def test_an_empty_store_gets_every_triple_despite_the_state(sent, monkeypatch):
+    bulk_load.hot_load([ONTOLOGY])
+    first = list(sent["post"])
+    monkeypatch.setattr(bulk_load, "store_is_empty", lambda: True)
+    sent["post"].clear()
+
+    bulk_load.hot_load([ONTOLOGY])
+    assert sorted(sent["post"]) == sorted(first)
+
+
+def test_blank_nodes_are_not_resent_into_a_loaded_store_without_state(sent, monkeypatch):
+    monkeypatch.setattr(bulk_load, "store_is_empty", lambda: False)
+    bulk_load.hot_load([ONTOLOGY])
+    assert sent["post"]
+    assert not any(bulk_load.has_blank_node(line) for line in sent["post"])
@@ -0,0 +1,21 @@
+import subprocess
+import sys
+
+from conftest import ROOT_DIR
+
+# Refuses the API-only dependencies, as on a host with only the indexer's requirements
+BLOCK_API_DEPENDENCIES = """
+import sys
+
+class Block:
+    def find_spec(self, name, path=None, target=None):
+        if name.split(".")[0] in ("flask", "quart", "numpy"):
+            raise ImportError(f"{name} is not installed")
+
+sys.meta_path.insert(0, Block())
+import data_indexation
+"""
+
+
+def test_the_indexer_imports_without_flask_or_numpy():
+    subprocess.run([sys.executable, "-c", BLOCK_API_DEPENDENCIES], cwd=ROOT_DIR, check=True)
@@ -0,0 +1,31 @@
+import json
+import threading
+
+import pytest
+
+from conftest import async_app, flask_app
+from health import AsyncHealthProber, HealthProber
+
+
+@pytest.fixture
+def blocked_backends(monkeypatch):
+    """Fresh probers whose backend checks hang until the test ends"""
+    release = threading.Event()
+
+    def check():
+        release.wait(5)
+        return {"up": True}
+
+    async def async_check():
+        return check()
+
+    monkeypatch.setattr(flask_app, "prober", HealthProber({"fuseki": check}, interval=60))
+    monkeypatch.setattr(async_app, "prober", AsyncHealthProber({"fuseki": async_check}, interval=60))
+    yield
+    release.set()
+
+
+def test_health_reports_starting_before_the_first_probe(get, blocked_backends):
+    reply = get("/api/health")
+    assert reply.status == 503
+    assert json.loads(reply.body)["status"] == "starting"
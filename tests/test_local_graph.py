@@ -0,0 +1,39 @@
+from kg_queries import EX
+from local_graph import LocalGraph
+
+RDF_TYPE = "<http://www.w3.org/1999/02/22-rdf-syntax-ns#type>"
+
+
+def dataset(version):
+    """N-Triples of one food with two images, listed in reverse URL order, at dataset `version`"""
+    return [
+        f'<{EX}dataset_meta> <{EX}dataVersion> "{version}" .',
+        f'<{EX}apple> {RDF_TYPE} <{EX}Food> .',
+        f'<{EX}apple> <{EX}foodName> "Apple" .',
+        f'<{EX}image_b> <{EX}isImageOf> <{EX}apple> .',
+        f'<{EX}image_b> <{EX}imageUrl> "/images/apple/b.jpg" .',
+        f'<{EX}image_a> <{EX}isImageOf> <{EX}apple> .',
+        f'<{EX}image_a> <{EX}imageUrl> "/images/apple/a.jpg" .',
+    ]
+
+
+def test_images_are_in_url_order():
+    graph = LocalGraph(lambda: dataset("1"))
+    assert graph.fetch_foods()[f"{EX}apple"]["images"] == ["/images/apple/a.jpg", "/images/apple/b.jpg"]
+
+
+def test_a_new_store_version_reloads_the_copy():
+    store = {"version": "1", "loads": 0}
+
+    def loader():
+        store["loads"] += 1
+        return dataset(store["version"])
+
+    graph = LocalGraph(loader, version_fn=lambda: store["version"])
+    assert graph.data_version() == "1"
+    assert graph.data_version() == "1"
+    assert store["loads"] == 1
+
+    store["version"] = "2"
+    assert graph.data_version() == "2"
+    assert store["loads"] == 2
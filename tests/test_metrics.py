@@ -0,0 +1,68 @@
+import multiprocessing
+import re
+
+import pytest
+
+import metrics
+from conftest import flask_app
+
+COUNT = re.compile(r'fdkg_http_request_duration_seconds_count\{endpoint="metrics_endpoint",[^}]*\} (\S+)')
+
+
+@pytest.fixture
+def metrics_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    metrics.reset()
+    yield tmp_path
+    metrics.reset()
+
+
+def scraped_requests(body):
+    return sum(float(value) for value in COUNT.findall(body))
+
+
+def worker(requests):
+    """A forked gunicorn worker: forget the parent's values, serve `requests` scrapes, flush"""
+    metrics.reset()
+    client = flask_app.app.test_client()
+    for _ in range(requests):
+        client.get("/metrics")
+    metrics.flush()
+
+
+def test_metrics_are_summed_over_worker_processes(metrics_dir):
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=worker, args=(n,)) for n in (2, 3, 4)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+        assert process.exitcode == 0
+    assert len(list(metrics_dir.glob("*.json"))) == 3
+
+    # Whichever process answers; a scrape itself is recorded after its body is rendered
+    client = flask_app.app.test_client()
+    assert scraped_requests(client.get("/metrics").get_data(as_text=True)) == 2 + 3 + 4
+    assert scraped_requests(client.get("/metrics").get_data(as_text=True)) == 2 + 3 + 4 + 1
+
+
+def test_histograms_keep_their_buckets_when_summed(metrics_dir):
+    metrics.REQUEST_SECONDS.observe(0.002, endpoint="x", method="GET", status=200)
+    metrics.flush()
+    # Continue as a second process with its own file
+    metrics._process.update(pid=None)
+    metrics.reset()
+    metrics.REQUEST_SECONDS.observe(0.2, endpoint="x", method="GET", status=200)
+    body = metrics.render()
+    labels = 'endpoint="x",method="GET",status="200"'
+    assert f'fdkg_http_request_duration_seconds_bucket{{{labels},le="0.0025"}} 1' in body
+    assert f'fdkg_http_request_duration_seconds_bucket{{{labels},le="0.25"}} 2' in body
+    assert f'fdkg_http_request_duration_seconds_count{{{labels}}} 2' in body
+
+
+def test_without_a_directory_metrics_stay_per_process(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", "")
+    metrics.reset()
+    metrics.REQUEST_SECONDS.observe(0.01, endpoint="y", method="GET", status=200)
+    assert 'fdkg_http_request_duration_seconds_count{endpoint="y",method="GET",status="200"} 1' in metrics.render()
+    metrics.reset()
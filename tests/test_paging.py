@@ -0,0 +1,8 @@
+import pytest
+
+
+@pytest.mark.parametrize("limit", ["abc", "1.5", "", "0", "-3"])
+def test_invalid_limits_are_rejected(get, limit):
+    reply = get(f"/api/foods?limit={limit}")
+    assert reply.status == 400
+    assert b"'limit' must be a positive integer" in reply.body
@@ -0,0 +1,80 @@
+import gzip
+import json
+
+import pytest
+
+import encoding
+from cache import SnapshotCache
+from conftest import flask_app, flask_get
+
+
+@pytest.fixture
+def compressed(monkeypatch):
+    """Snapshots compressed whatever their size; the test graph's bodies are below COMPRESS_MIN_SIZE"""
+    monkeypatch.setattr(encoding, "COMPRESS_MIN_SIZE", 0)
+
+
+@pytest.mark.parametrize("path", ["/api/foods", "/api/diseases"])
+def test_a_matching_etag_gets_a_304(local_kg, path):
+    first = flask_get(path)
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "no-cache"
+
+    again = flask_get(path, {"If-None-Match": etag})
+    assert again.status == 304
+    assert again.body == b""
+    assert again.headers["ETag"] == etag
+    assert flask_get(path, {"If-None-Match": '"stale"'}).status == 200
+
+
+def test_each_content_coding_has_its_own_etag(local_kg, compressed):
+    plain = flask_get("/api/foods")
+    gzipped = flask_get("/api/foods", {"Accept-Encoding": "gzip"})
+    assert gzipped.headers["Content-Encoding"] == "gzip"
+    assert gzipped.headers["ETag"] == plain.headers["ETag"][:-1] + '-gzip"'
+    assert gzip.decompress(gzipped.body) == plain.body
+    assert flask_get("/api/foods", {"Accept-Encoding": "gzip", "If-None-Match": gzipped.headers["ETag"]}).status == 304
+    # The identity validator doesn't match the gzip representation
+    assert flask_get("/api/foods", {"Accept-Encoding": "gzip", "If-None-Match": plain.headers["ETag"]}).status == 200
+
+
+def test_a_new_data_version_rebuilds_the_snapshot(local_kg, monkeypatch):
+    etag = flask_get("/api/foods").headers["ETag"]
+    assert flask_get("/api/foods").headers["ETag"] == etag
+    assert flask_app.snapshot_cache.misses == 1
+
+    monkeypatch.setattr(local_kg, "data_version", lambda: "2")
+    # Rebuilt under the new version; the payload is the same, so clients keep their 304
+    assert flask_get("/api/foods", {"If-None-Match": etag}).status == 304
+    assert flask_app.snapshot_cache.misses == 2
+    assert flask_app.views.get().version == "2"
+
+
+def test_snapshots_are_built_once_per_version():
+    version = {"value": "1"}
+    builds = []
+
+    def build():
+        builds.append(version["value"])
+        return {"version": version["value"], "text": "café"}
+
+    cache = SnapshotCache(ttl=0, version_fn=lambda: version["value"], version_interval=0)
+    snapshot = cache.get("key", build)
+    assert json.loads(snapshot.body) == {"version": "1", "text": "café"}
+    assert "café".encode() in snapshot.body
+    assert cache.get("key", build) is snapshot
+
+    version["value"] = "2"
+    assert json.loads(cache.get("key", build).body)["version"] == "2"
+    cache.invalidate("key")
+    cache.get("key", build)
+    assert builds == ["1", "2", "2"]
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_dumps_matches_the_json_module():
+    payload = {"name": "Crème brûlée", "calories": 300, "tags": ["dessert"], "nested": {"b": 1, "a": None}}
+    assert json.loads(encoding.dumps(payload)) == payload
+    assert encoding.dumps(payload, sort_keys=True) == json.dumps(
+        payload, ensure_ascii=False, sort_keys=True, separators=(",", ":")
+    ).encode("utf-8")
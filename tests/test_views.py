@@ -0,0 +1,99 @@
+import json
+
+import pytest
+
+from conftest import flask_get
+from kg_queries import EX
+
+
+def get_json(path):
+    reply = flask_get(path)
+    assert reply.status == 200, reply.body
+    return json.loads(reply.body)
+
+
+def names(records):
+    return [record["name"] for record in records]
+
+
+def test_foods_are_cards_in_uri_order(local_kg):
+    apple, bread = get_json("/api/foods")
+    assert (apple["name"], bread["name"]) == ("Apple", "Bread")
+    assert apple["calories"] == 95
+    assert apple["relatedDiseases"] == [{"uri": f"{EX}diabetes", "name": "Diabetes"}]
+    # Seven images in the graph, listed last to first; a card shows the first five by URL
+    assert apple["images"] == [f"/images/apple/{n}.jpg" for n in range(1, 6)]
+    assert apple["thumbnails"] == apple["images"]
+    assert "recipe" not in apple
+
+
+def test_food_pages_follow_the_cursor(local_kg):
+    first = get_json("/api/foods?limit=1")
+    assert names(first["data"]) == ["Apple"]
+    second = get_json(f"/api/foods?limit=1&cursor={first['nextCursor']}")
+    assert names(second["data"]) == ["Bread"]
+    assert names(get_json("/api/foods?limit=1&offset=1")["data"]) == ["Bread"]
+
+
+def test_distinct_entries(local_kg):
+    page = get_json("/api/foods/distinct?limit=1")
+    assert page["total"] == 2
+    (apple,) = page["data"]
+    assert apple["categories"] == ["Meal: Breakfast", "Prep: Raw", "Origin: Europe"]
+    assert apple["relatedDiseases"] == ["Diabetes"]
+    assert names(get_json(f"/api/foods/distinct?limit=5&cursor={page['nextCursor']}")["data"]) == ["Bread"]
+
+
+def test_diseases_only_include_complete_records(local_kg):
+    diseases = get_json("/api/diseases")
+    assert names(diseases) == ["Celiac Disease", "Diabetes", "Gout"]
+    assert diseases[1]["familyName"] == "Metabolic"
+    assert diseases[1]["documents"] == ["/documents/diabetes/doc_1.pdf"]
+
+
+def test_relations(local_kg):
+    assert names(get_json("/api/diseases/diabetes/foods")["data"]) == ["Apple", "Bread"]
+    assert names(get_json("/api/diseases/gout/foods")["data"]) == []
+    assert names(get_json("/api/foods/bread/diseases")["data"]) == ["Diabetes", "Celiac Disease"]
+    family = get_json("/api/families/metabolic/foods")
+    assert names(family["family"]["diseases"]) == ["Diabetes", "Gout"]
+    assert family["total"] == 2
+
+
+@pytest.mark.parametrize("path", ["/api/diseases/flu/foods", "/api/foods/cake/diseases", "/api/families/viral/foods"])
+def test_unknown_relation_ids_are_404(local_kg, path):
+    assert flask_get(path).status == 404
+
+
+def test_search_falls_back_to_the_views_without_solr(local_kg):
+    assert names(get_json("/api/search/foods?q=flour")) == ["Bread"]
+    assert names(get_json("/api/search/foods?q=diabetes")) == ["Apple", "Bread"]
+
+
+def test_facets(local_kg):
+    result = get_json("/api/foods/facets?eatingTime=lunch")
+    assert names(result["data"]) == ["Bread"]
+    assert result["facets"]["eatingTime"] == {"Breakfast": 2, "Lunch": 1}
+    assert result["facets"]["isRawOrCooked"] == {"Cooked": 1}
+    assert names(get_json("/api/foods/facets?maxCalories=100")["data"]) == ["Apple"]
+    assert flask_get("/api/foods/facets?minCalories=lots").status == 400
+
+
+def test_ingredients_are_normalized(local_kg):
+    ingredients = get_json("/api/ingredients")
+    assert [item["name"] for item in ingredients["data"]] == ["apple", "egg", "salt", "sugar", "wheat flour"]
+    result = get_json("/api/ingredients/foods?all=Eggs")
+    assert names(result["data"]) == ["Bread"]
+    assert get_json("/api/ingredients/foods?any=apple,salt")["total"] == 2
+    assert get_json("/api/ingredients/foods?any=apple,salt&not=sugar")["total"] == 1
+    assert flask_get("/api/ingredients/foods").status == 400
+
+
+def test_traversal(local_kg):
+    result = get_json("/api/traverse/food/apple?path=disease,family")
+    assert [(node["kind"], node["id"]) for node in result["results"]] == [("family", "metabolic")]
+
+    result = get_json("/api/traverse/food/apple?depth=2")
+    assert result["levels"] == [{"disease": 1, "ingredient": 2}, {"family": 1, "food": 1}]
+    assert flask_get("/api/traverse/food/apple?path=family").status == 400
+    assert flask_get("/api/traverse/food/cake").status == 404